@@ -1,78 +1,112 @@
 import sys
 import os
+import re
 
 # Add the backend directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from flask import Flask, request, jsonify
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from datetime import datetime
-from compiler import PromptCompiler
-from schema import ImagePrompt, VideoPrompt, VoicePrompt, TextPrompt
-from registry import get_available_models_by_modality
-from rate_limiter import rate_limit, sanitize_payload
+from server_timing import start_timer
+from request_limits import (
+    DEFAULT_MAX_CONTENT_LENGTH,
+    BoundedJSONProvider,
+    JSONErrorRequest,
+    refuse_oversized_body,
+)
+from http_cache import (
+    cached_json,
+    conditional,
+    conditional_response,
+    drop_per_request_headers,
+    parse_generate_query,
+    shared_cacheable,
+)
 
 app = Flask(__name__)
-CORS(app)
-
-compiler = PromptCompiler()
-
-# Input validation limits
-MAX_TEXT_LENGTH = 2000
-MAX_DURATION_SECONDS = 60
-
-
-def validate_request_data(data):
-    """Validate incoming request data."""
-    if not data:
-        return "Request body is required", 400
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", DEFAULT_MAX_CONTENT_LENGTH))
+app.json = BoundedJSONProvider(app)
+app.request_class = JSONErrorRequest
+CORS(app, expose_headers=["Server-Timing", "X-Request-ID"])
+
+# Client-supplied X-Request-ID values kept as the request id; others are replaced
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,128}")
+
+# Compiled prompt cache, off by default: the built-in adapters compile
+# faster than a cache lookup, so it only pays for slow custom adapters
+COMPILE_CACHE_SIZE = int(os.getenv("COMPILE_CACHE_SIZE", 0))
+COMPILE_CACHE_TTL = int(os.getenv("COMPILE_CACHE_TTL", 3600))
+
+# The compiler, adapter registry, prompt schema classes and validation are
+# imported by the first request that needs them, not at import: each cold
+# start pays for them only if it serves a prompt or /api/models, never for
+# /api/health, CORS preflights or errors. backend/test_cold_start.py keeps
+# them out of the import.
+_compiler = None
+_prepare_request = None
+
+
+def _generation():
+    """
+    Import and set up prompt generation on first use.
+
+    Returns:
+        tuple: (PromptCompiler, validation.prepare_request)
+    """
+    global _compiler, _prepare_request
+    if _compiler is None:
+        from cache import CompileCache
+        from compiler import PromptCompiler
+        from validation import prepare_request
+
+        _prepare_request = prepare_request
+        _compiler = PromptCompiler(
+            cache=CompileCache(COMPILE_CACHE_SIZE, COMPILE_CACHE_TTL) if COMPILE_CACHE_SIZE > 0 else None
+        )
+    return _compiler, _prepare_request
 
-    modality = data.get("modality")
-    model = data.get("model")
-    payload = data.get("payload")
 
-    if not modality:
-        return "Missing required field: modality", 400
+# /models changes only on deploy. It is serialized on first use rather than
+# at import, which would load every adapter on each cold start; Vercel's
+# edge cache is purged on deploy, so it may keep the response for a day.
+MODELS_CACHE_CONTROL = "public, max-age=300, s-maxage=86400"
+_models_response = None
 
-    if modality not in ["text", "image", "video", "audio"]:
-        return f"Invalid modality: {modality}. Must be one of: text, image, video, audio", 400
+# Cache-Control of successful GET /api/generate responses. Browsers
+# revalidate by ETag; Vercel's edge keeps a result for s-maxage and serves
+# it stale while refetching, so repeats of a request never reach Python.
+GENERATE_CACHE_CONTROL = os.getenv(
+    "GENERATE_CACHE_CONTROL", "public, max-age=0, s-maxage=86400, stale-while-revalidate=604800"
+)
 
-    if not model:
-        return "Missing required field: model", 400
+# Maximum items per batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 500))
 
-    available_models = get_available_models_by_modality()
-    if model not in available_models.get(modality, []):
-        return (
-            f"Invalid model '{model}' for modality '{modality}'. "
-            f"Available models: {', '.join(available_models[modality])}",
-            400,
-        )
 
-    if not payload:
-        return "Missing required field: payload", 400
+@app.before_request
+def start_request():
+    """Assign a request id and start the request timer."""
+    request_id = request.headers.get("X-Request-ID", "")
+    g.request_id = request_id if REQUEST_ID_PATTERN.fullmatch(request_id) else os.urandom(8).hex()
+    start_timer()
 
-    if not isinstance(payload, dict):
-        return "Payload must be a dictionary", 400
 
-    # Validate text field lengths
-    for key, value in payload.items():
-        if isinstance(value, str) and len(value) > MAX_TEXT_LENGTH:
-            return f"Field '{key}' exceeds maximum length of {MAX_TEXT_LENGTH}", 400
+# Registered after start_request, so refused requests still get a request id
+app.before_request(refuse_oversized_body)
 
-    # Validate duration for video
-    if modality == "video" and "duration_seconds" in payload:
-        duration = payload.get("duration_seconds")
-        try:
-            duration = int(duration)
-            if duration < 1 or duration > MAX_DURATION_SECONDS:
-                return (
-                    f"duration_seconds must be between 1 and {MAX_DURATION_SECONDS}",
-                    400,
-                )
-        except (ValueError, TypeError):
-            return "duration_seconds must be a valid integer", 400
 
-    return None
+@app.after_request
+def finish_request(response):
+    """Add the request id and Server-Timing headers, unless shared caches may store the response."""
+    if shared_cacheable(response):
+        drop_per_request_headers(response)
+        return response
+    response.headers["X-Request-ID"] = g.request_id
+    response.headers["Server-Timing"] = g.timer.header()
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
 
 
 @app.route("/api/health", methods=["GET"])
@@ -83,57 +117,124 @@ def health_check():
 
 @app.route("/api/models", methods=["GET"])
 def get_models():
-    """Get available models grouped by modality."""
-    try:
-        models = get_available_models_by_modality()
-        return jsonify({"models": models})
-    except Exception as e:
-        return jsonify({"error": "Failed to fetch models"}), 500
+    """Get available models grouped by modality, with their capabilities."""
+    global _models_response
+    if _models_response is None:
+        from compiler import describe_models
+
+        _models_response = cached_json(describe_models())
+    return conditional_response(_models_response, MODELS_CACHE_CONTROL)
 
 
-@app.route("/api/generate", methods=["POST"])
+@app.route("/api/generate", methods=["GET", "POST"])
 def generate_prompt():
-    """Generate optimized prompt for specified model."""
+    """
+    Generate optimized prompt for specified model.
+
+    POST takes the request as a JSON body. GET takes it as the canonical
+    query string built by http_cache.canonical_generate_query (or the
+    frontend's canonicalGenerateUrl); its responses carry an ETag and may be
+    cached by shared caches, since compiling the same request always gives
+    the same prompt.
+    """
     try:
-        data = request.json
-
-        # Validate request
-        validation_error = validate_request_data(data)
-        if validation_error:
-            error_msg, status_code = validation_error
+        compiler, prepare_request = _generation()
+        timer = g.timer
+        timer.mark()
+        is_get = request.method == "GET"
+        if is_get:
+            data, error = parse_generate_query(request.args)
+            if error:
+                error_msg, status_code = error
+                return jsonify({"error": error_msg}), status_code
+        else:
+            data = request.json
+        timer.lap("parse")
+
+        # Validate, sanitize and build the prompt object in one pass
+        prompt, error = prepare_request(data)
+        timer.lap("prepare")
+        if error:
+            error_msg, status_code = error
             return jsonify({"error": error_msg}), status_code
 
         modality = data["modality"]
         model = data["model"]
-        payload = data["payload"]
-
-        # Sanitize payload to prevent injection
-        payload = sanitize_payload(payload, MAX_TEXT_LENGTH)
-
-        # Create appropriate prompt object
-        try:
-            if modality == "text":
-                prompt = TextPrompt(**payload)
-            elif modality == "image":
-                prompt = ImagePrompt(**payload)
-            elif modality == "video":
-                prompt = VideoPrompt(**payload)
-            elif modality == "audio":
-                prompt = VoicePrompt(**payload)
-        except TypeError as e:
-            return jsonify({"error": f"Invalid payload: {str(e)}"}), 400
 
         # Compile prompt
         result = compiler.compile(prompt, model)
+        timer.lap("compile")
 
-        return jsonify({"prompt": result, "model": model, "modality": modality})
+        response = jsonify({"prompt": result, "model": model, "modality": modality})
+        if is_get:
+            response = conditional(response, GENERATE_CACHE_CONTROL)
+        timer.lap("serialize")
+        return response
 
+    except HTTPException:
+        # Malformed or oversized bodies, answered by the error handlers
+        raise
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
 
+@app.route("/api/generate/batch", methods=["POST"])
+def generate_batch():
+    """Generate prompts for a batch of {modality, model, payload} items."""
+    try:
+        compiler, prepare_request = _generation()
+        data = request.json
+        items = data.get("items") if isinstance(data, dict) else data
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Request body must contain a non-empty list of items"}), 400
+
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch exceeds maximum size of {MAX_BATCH_SIZE} items"}), 400
+
+        # Validate and sanitize every item, keeping errors by position
+        results = [None] * len(items)
+        valid_items = []
+        positions = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {"error": "Item must be an object"}
+                continue
+
+            prompt, error = prepare_request(item)
+            if error:
+                results[index] = {"error": error[0]}
+                continue
+
+            valid_items.append({"modality": item["modality"], "model": item["model"], "prompt": prompt})
+            positions.append(index)
+
+        for index, result in zip(positions, compiler.compile_many(valid_items)):
+            results[index] = result
+
+        errors = sum(1 for result in results if "error" in result)
+        return jsonify({"results": results, "count": len(results), "errors": errors})
+
+    except HTTPException:
+        raise
+    except Exception:
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@app.errorhandler(400)
+def bad_request(e):
+    """Handle 400 errors, e.g. a body that is not JSON or is nested too deeply."""
+    return jsonify({"error": e.description}), 400
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    """Handle 413 errors from bodies over MAX_CONTENT_LENGTH."""
+    return jsonify({"error": e.description}), 413
+
+
 # For Vercel serverless function
 def handler(request):
     with app.request_context(request.environ):
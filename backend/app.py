@@ -1,88 +1,235 @@
+import hmac
 import os
 import logging
+import re
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from compiler import PromptCompiler
-from schema import ImagePrompt, VideoPrompt, VoicePrompt, TextPrompt
-from registry import get_available_models_by_modality
-from rate_limiter import rate_limit, sanitize_payload
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("prompt_generator.log"),
-        logging.StreamHandler(),
-    ],
+from werkzeug.exceptions import HTTPException
+from cache import CompileCache
+from compiler import PromptCompiler, describe_models
+import rate_limiter
+from rate_limiter import rate_limit, register_policy
+from validation import prepare_request
+from logging_config import setup_logging
+from server_timing import start_timer
+from metrics import CONTENT_TYPE, MetricsRegistry
+from request_limits import (
+    DEFAULT_MAX_CONTENT_LENGTH,
+    BoundedJSONProvider,
+    JSONErrorRequest,
+    refuse_oversized_body,
 )
+from http_cache import (
+    cached_json,
+    conditional,
+    conditional_response,
+    drop_per_request_headers,
+    parse_generate_query,
+    shared_cacheable,
+)
+
+# Configure logging: records are queued and written by a background thread
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("access")
 
 app = Flask(__name__)
 
-# Configure CORS - restrict in production
+# Refuse bodies over MAX_CONTENT_LENGTH bytes before reading them, and JSON
+# nested too deeply before decoding it
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", DEFAULT_MAX_CONTENT_LENGTH))
+app.json = BoundedJSONProvider(app)
+app.request_class = JSONErrorRequest
+
+# Configure CORS - restrict in production. Browsers only let the frontend
+# read response headers that are listed in expose_headers.
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
-CORS(app, origins=allowed_origins)
+CORS(
+    app,
+    origins=allowed_origins,
+    expose_headers=["Server-Timing", "X-Request-ID", "X-RateLimit-Limit", "X-RateLimit-Remaining", "Retry-After"],
+)
 
-compiler = PromptCompiler()
+# Send per-phase timings in a Server-Timing header (set to false to hide them)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() == "true"
+TIMING_ALLOW_ORIGIN = ", ".join(allowed_origins)
 
-# Input validation limits
-MAX_TEXT_LENGTH = 2000
-MAX_DURATION_SECONDS = 60
+# Client-supplied X-Request-ID values kept as the request id; others are replaced
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,128}")
 
+# Compiled prompt cache, off by default: the built-in adapters compile
+# faster than a cache lookup, so it only pays for slow custom adapters
+COMPILE_CACHE_SIZE = int(os.getenv("COMPILE_CACHE_SIZE", 0))
+COMPILE_CACHE_TTL = int(os.getenv("COMPILE_CACHE_TTL", 3600))
 
-def validate_request_data(data):
-    """Validate incoming request data."""
-    if not data:
-        return "Request body is required", 400
+compiler = PromptCompiler(
+    cache=CompileCache(COMPILE_CACHE_SIZE, COMPILE_CACHE_TTL) if COMPILE_CACHE_SIZE > 0 else None
+)
 
-    modality = data.get("modality")
-    model = data.get("model")
-    payload = data.get("payload")
+# /models changes only on deploy: serialize it once, with every adapter's
+# capabilities, and let clients revalidate it by ETag
+MODELS_RESPONSE = cached_json(describe_models())
+MODELS_CACHE_CONTROL = "public, max-age=300"
 
-    if not modality:
-        return "Missing required field: modality", 400
+# Cache-Control of successful GET /generate responses. Browsers revalidate
+# by ETag; shared caches keep a result for s-maxage and may serve it stale
+# while refetching. Results change only when a deploy changes an adapter.
+GENERATE_CACHE_CONTROL = os.getenv(
+    "GENERATE_CACHE_CONTROL", "public, max-age=0, s-maxage=86400, stale-while-revalidate=604800"
+)
 
-    if modality not in ["text", "image", "video", "audio"]:
-        return f"Invalid modality: {modality}. Must be one of: text, image, video, audio", 400
+# Maximum items per batch request
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 500))
+
+# Rate limit policies: single prompts per IP per minute, batch items per IP
+# per minute, and an optional hourly quota per X-API-Key stacked on both
+register_policy("generate", int(os.getenv("RATE_LIMIT", 60)), 60)
+register_policy("batch-items", int(os.getenv("RATE_LIMIT_BATCH_ITEMS", 1000)), 60)
+GENERATE_POLICIES = ["generate"]
+BATCH_POLICIES = ["batch-items"]
+if os.getenv("RATE_LIMIT_API_KEY_HOURLY"):
+    register_policy("api-key", int(os.getenv("RATE_LIMIT_API_KEY_HOURLY")), 3600, key="api_key")
+    GENERATE_POLICIES.append("api-key")
+    BATCH_POLICIES.append("api-key")
+
+# Token required in the X-Admin-Token header by /admin endpoints (unset disables them)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Prometheus metrics served at /metrics (set METRICS_ENABLED=false to hide them)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter(
+    "prompt_generator_requests_total", "HTTP requests handled.", ("endpoint", "method", "status")
+)
+REQUEST_LATENCY = metrics.histogram(
+    "prompt_generator_request_duration_seconds",
+    "Time to handle a request, by model and modality for /generate.",
+    ("endpoint", "model", "modality", "status"),
+)
+IN_FLIGHT = metrics.gauge("prompt_generator_requests_in_flight", "Requests being handled.")
+RATE_LIMIT_REJECTIONS = metrics.counter(
+    "prompt_generator_rate_limit_rejections_total", "Requests rejected by rate limiting.", ("endpoint",)
+)
+VALIDATION_FAILURES = metrics.counter(
+    "prompt_generator_validation_failures_total", "Prompts (or batch items) that failed validation.", ("endpoint",)
+)
 
-    if not model:
-        return "Missing required field: model", 400
 
-    available_models = get_available_models_by_modality()
-    if model not in available_models.get(modality, []):
-        return (
-            f"Invalid model '{model}' for modality '{modality}'. "
-            f"Available models: {', '.join(available_models[modality])}",
-            400,
-        )
+def _rate_limit_stats(gauge):
+    """Collect limiter stats by policy: live_keys as a gauge, or the other (counter) stats."""
 
-    if not payload:
-        return "Missing required field: payload", 400
+    def collect():
+        samples = {}
+        for policy, stats in rate_limiter.limiter_stats().items():
+            for name, value in stats.items():
+                if name == "evictions":
+                    continue  # Sum of the idle and capacity evictions reported separately
+                if (name == "live_keys") == gauge:
+                    samples[(policy,) if gauge else (policy, name)] = value
+        return samples
 
-    if not isinstance(payload, dict):
-        return "Payload must be a dictionary", 400
+    return collect
 
-    # Validate text field lengths
-    for key, value in payload.items():
-        if isinstance(value, str) and len(value) > MAX_TEXT_LENGTH:
-            return f"Field '{key}' exceeds maximum length of {MAX_TEXT_LENGTH}", 400
 
-    # Validate duration for video
-    if modality == "video" and "duration_seconds" in payload:
-        duration = payload.get("duration_seconds")
-        try:
-            duration = int(duration)
-            if duration < 1 or duration > MAX_DURATION_SECONDS:
-                return (
-                    f"duration_seconds must be between 1 and {MAX_DURATION_SECONDS}",
-                    400,
-                )
-        except (ValueError, TypeError):
-            return "duration_seconds must be a valid integer", 400
+metrics.collected(
+    "prompt_generator_rate_limit_live_keys",
+    "Clients tracked by each rate limit policy.",
+    "gauge",
+    ("policy",),
+    _rate_limit_stats(gauge=True),
+)
+metrics.collected(
+    "prompt_generator_rate_limit_events_total",
+    "Rate limiter key evictions, overflows and storage errors.",
+    "counter",
+    ("policy", "event"),
+    _rate_limit_stats(gauge=False),
+)
+if compiler.cache is not None:
+    for stat, kind in [("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("size", "gauge")]:
+        metrics.collected(
+            f"prompt_generator_compile_cache_{stat}" + ("_total" if kind == "counter" else ""),
+            f"Compiled prompt cache {stat}.",
+            kind,
+            (),
+            lambda stat=stat: {(): compiler.cache.stats()[stat]},
+        )
 
-    return None
+
+def batch_cost():
+    """Rate limit cost of a batch request: its number of items."""
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if isinstance(items, list) and items:
+        return min(len(items), MAX_BATCH_SIZE)
+    return 1
+
+
+@app.before_request
+def start_request():
+    """Assign a request id and start the request timer."""
+    request_id = request.headers.get("X-Request-ID", "")
+    g.request_id = request_id if REQUEST_ID_PATTERN.fullmatch(request_id) else os.urandom(8).hex()
+    g.log_fields = {}
+    start_timer()
+    IN_FLIGHT.inc()
+
+
+# Registered after start_request, so refused requests still get a request id
+app.before_request(refuse_oversized_body)
+
+
+@app.after_request
+def finish_request(response):
+    """
+    Add the request id and timing headers and write the access log record.
+
+    Responses shared caches may store get neither, nor the rate limit
+    headers: a cache would replay them to every later client.
+    """
+    request_id, timer = g.request_id, g.timer
+    if shared_cacheable(response):
+        drop_per_request_headers(response)
+    else:
+        response.headers["X-Request-ID"] = request_id
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = timer.header()
+            response.headers["Timing-Allow-Origin"] = TIMING_ALLOW_ORIGIN
+
+    latency = timer.elapsed()
+    status = response.status_code
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    fields = g.log_fields
+    REQUESTS.inc(endpoint, request.method, status)
+    REQUEST_LATENCY.observe(latency, endpoint, fields.get("model", ""), fields.get("modality", ""), status)
+    if status == 429:
+        RATE_LIMIT_REJECTIONS.inc(endpoint)
+
+    if access_logger.isEnabledFor(logging.INFO):
+        latency_ms = round(latency * 1000, 3)
+        access_logger.info(
+            "%s %s %s %.1fms",
+            request.method,
+            request.path,
+            response.status_code,
+            latency_ms,
+            extra={
+                "request_id": request_id,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "latency_ms": latency_ms,
+                **fields,
+            },
+        )
+    return response
+
+
+@app.teardown_request
+def end_request(exc):
+    """Count the request out of the in-flight gauge, even if it failed."""
+    IN_FLIGHT.dec()
 
 
 @app.route("/health", methods=["GET"])
@@ -93,66 +240,148 @@ def health_check():
 
 @app.route("/models", methods=["GET"])
 def get_models():
-    """Get available models grouped by modality."""
-    try:
-        models = get_available_models_by_modality()
-        return jsonify({"models": models})
-    except Exception as e:
-        logger.error(f"Error fetching models: {str(e)}")
-        return jsonify({"error": "Failed to fetch models"}), 500
+    """Get available models grouped by modality, with their capabilities."""
+    return conditional_response(MODELS_RESPONSE, MODELS_CACHE_CONTROL)
 
 
-@app.route("/generate", methods=["POST"])
-@rate_limit(max_requests=int(os.getenv("RATE_LIMIT", 60)), window_seconds=60)
+@app.route("/generate", methods=["GET", "POST"])
+@rate_limit(policies=GENERATE_POLICIES)
 def generate_prompt():
-    """Generate optimized prompt for specified model."""
+    """
+    Generate optimized prompt for specified model.
+
+    POST takes the request as a JSON body. GET takes it as the canonical
+    query string built by http_cache.canonical_generate_query (or the
+    frontend's canonicalGenerateUrl); its responses carry an ETag and may be
+    cached by shared caches, since compiling the same request always gives
+    the same prompt.
+    """
     try:
-        data = request.json
-
-        # Validate request
-        validation_error = validate_request_data(data)
-        if validation_error:
-            error_msg, status_code = validation_error
-            logger.warning(f"Validation error: {error_msg}")
+        timer = g.timer
+        timer.mark()
+        is_get = request.method == "GET"
+        if is_get:
+            data, error = parse_generate_query(request.args)
+            if error:
+                error_msg, status_code = error
+                return jsonify({"error": error_msg}), status_code
+        else:
+            data = request.json
+        timer.lap("parse")
+
+        # Validate, sanitize and build the prompt object in one pass
+        prompt, error = prepare_request(data)
+        timer.lap("prepare")
+        if error:
+            error_msg, status_code = error
+            logger.warning("Validation error: %s", error_msg)
+            VALIDATION_FAILURES.inc("/generate")
             return jsonify({"error": error_msg}), status_code
 
         modality = data["modality"]
         model = data["model"]
-        payload = data["payload"]
-
-        # Sanitize payload to prevent injection
-        payload = sanitize_payload(payload, MAX_TEXT_LENGTH)
-
-        logger.info(f"Generating prompt for modality={modality}, model={model}")
-
-        # Create appropriate prompt object
-        try:
-            if modality == "text":
-                prompt = TextPrompt(**payload)
-            elif modality == "image":
-                prompt = ImagePrompt(**payload)
-            elif modality == "video":
-                prompt = VideoPrompt(**payload)
-            elif modality == "audio":
-                prompt = VoicePrompt(**payload)
-        except TypeError as e:
-            logger.error(f"Invalid payload structure: {str(e)}")
-            return jsonify({"error": f"Invalid payload: {str(e)}"}), 400
+        g.log_fields = {"modality": modality, "model": model}
 
         # Compile prompt
         result = compiler.compile(prompt, model)
+        timer.lap("compile")
 
-        logger.info(f"Successfully generated prompt for {model}")
-        return jsonify({"prompt": result, "model": model, "modality": modality})
+        response = jsonify({"prompt": result, "model": model, "modality": modality})
+        if is_get:
+            response = conditional(response, GENERATE_CACHE_CONTROL)
+        timer.lap("serialize")
+        return response
 
+    except HTTPException:
+        # Malformed or oversized bodies, answered by the error handlers
+        raise
     except ValueError as e:
-        logger.error(f"Value error: {str(e)}")
+        logger.error("Value error: %s", e)
         return jsonify({"error": str(e)}), 400
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        logger.error("Unexpected error: %s", e, exc_info=True)
+        return jsonify({"error": "Internal server error"}), 500
+
+
+@app.route("/generate/batch", methods=["POST"])
+@rate_limit(policies=BATCH_POLICIES, cost=batch_cost)
+def generate_batch():
+    """Generate prompts for a batch of {modality, model, payload} items."""
+    try:
+        data = request.json
+        items = data.get("items") if isinstance(data, dict) else data
+
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "Request body must contain a non-empty list of items"}), 400
+
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch exceeds maximum size of {MAX_BATCH_SIZE} items"}), 400
+
+        # Validate and sanitize every item, keeping errors by position
+        results = [None] * len(items)
+        valid_items = []
+        positions = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = {"error": "Item must be an object"}
+                continue
+
+            prompt, error = prepare_request(item)
+            if error:
+                results[index] = {"error": error[0]}
+                continue
+
+            valid_items.append({"modality": item["modality"], "model": item["model"], "prompt": prompt})
+            positions.append(index)
+
+        for index, result in zip(positions, compiler.compile_many(valid_items)):
+            results[index] = result
+
+        errors = sum(1 for result in results if "error" in result)
+        if len(valid_items) < len(items):
+            VALIDATION_FAILURES.inc("/generate/batch", amount=len(items) - len(valid_items))
+        g.log_fields = {"items": len(items), "errors": errors}
+        return jsonify({"results": results, "count": len(results), "errors": errors})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Unexpected error: %s", e, exc_info=True)
         return jsonify({"error": "Internal server error"}), 500
 
 
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Metrics of this worker in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Endpoint not found"}), 404
+    return Response(metrics.render(), mimetype=None, content_type=CONTENT_TYPE)
+
+
+@app.route("/admin/heavy-hitters", methods=["GET"])
+def heavy_hitters():
+    """Top clients of this worker by requests and by rate limit rejections."""
+    if not ADMIN_TOKEN or rate_limiter.heavy_hitters is None:
+        return jsonify({"error": "Endpoint not found"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+
+    limit = request.args.get("limit", 20, type=int)
+    return jsonify(rate_limiter.heavy_hitters.snapshot(max(limit, 0)))
+
+
+@app.errorhandler(400)
+def bad_request(e):
+    """Handle 400 errors, e.g. a body that is not JSON or is nested too deeply."""
+    return jsonify({"error": e.description}), 400
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    """Handle 413 errors from bodies over MAX_CONTENT_LENGTH."""
+    return jsonify({"error": e.description}), 413
+
+
 @app.errorhandler(404)
 def not_found(e):
     """Handle 404 errors."""
@@ -168,7 +397,7 @@ def method_not_allowed(e):
 @app.errorhandler(500)
 def internal_error(e):
     """Handle 500 errors."""
-    logger.error(f"Internal server error: {str(e)}")
+    logger.error("Internal server error: %s", e)
     return jsonify({"error": "Internal server error"}), 500
 
 
@@ -177,6 +406,6 @@ if __name__ == "__main__":
     port = int(os.getenv("FLASK_PORT", 5000))
     debug = os.getenv("FLASK_DEBUG", "False").lower() == "true"
 
-    logger.info(f"Starting Flask server on {host}:{port}")
+    logger.info("Starting Flask server on %s:%s", host, port)
     app.run(host=host, port=port, debug=debug, use_reloader=False)
 
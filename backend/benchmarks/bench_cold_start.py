@@ -0,0 +1,171 @@
+"""
+Cold-start benchmark for the serverless entry point (api/index.py).
+
+Spawns fresh interpreters, as a new serverless instance does, and measures
+the time from the start of ``import index`` to the first response of the WSGI
+app: importing Flask and the app, then serving one request. Scenarios:
+
+    generate: POST /api/generate, importing the compiler and one adapter
+    health: GET /api/health, which should not import the compiler at all
+    eager: POST /api/generate after creating every adapter, as the
+        registry did at import before it became lazy
+
+With ``--importtime`` the slowest imports made by index are listed from
+``python -X importtime`` (which slows the interpreter down; timings above
+are taken without it).
+
+Usage:
+    python benchmarks/bench_cold_start.py --runs 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "api")
+
+GENERATE_BODY = {"modality": "text", "model": "gpt-4", "payload": {"modality": "text", "goal": "g", "subject": "s"}}
+
+SCENARIOS = {
+    "generate": ("", "POST", "/api/generate", GENERATE_BODY),
+    "health": ("", "GET", "/api/health", None),
+    "eager": ("import registry; registry.ADAPTER_REGISTRY.load_all()", "POST", "/api/generate", GENERATE_BODY),
+}
+
+# Child prints JSON: microseconds to import index and to the first response,
+# the response status, and the backend modules loaded by then
+CHILD = """
+import time
+_t0 = time.perf_counter()
+import io, json, sys
+import index
+_t1 = time.perf_counter()
+{setup}
+body = {body!r}
+environ = {{
+    "REQUEST_METHOD": {method!r}, "PATH_INFO": {path!r}, "QUERY_STRING": "",
+    "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+    "wsgi.url_scheme": "http", "wsgi.input": io.BytesIO(body), "wsgi.errors": sys.stderr,
+    "CONTENT_TYPE": "application/json", "CONTENT_LENGTH": str(len(body)),
+}}
+status = []
+b"".join(index.app(environ, lambda line, headers, exc_info=None: status.append(line)))
+_t2 = time.perf_counter()
+print(json.dumps({{
+    "import_us": int((_t1 - _t0) * 1e6),
+    "response_us": int((_t2 - _t0) * 1e6),
+    "status": int(status[0].split()[0]),
+    "modules": sorted(name for name in {modules!r} if name in sys.modules),
+}}))
+"""
+
+# Backend modules whose import cold starts should only pay for when needed
+TRACKED_MODULES = ("compiler", "registry", "schema", "validation", "cache", "rate_limiter")
+
+
+def run_once(scenario, importtime=False):
+    """
+    Serve one request from a fresh interpreter.
+
+    Args:
+        scenario: Name in SCENARIOS
+        importtime: Run with ``-X importtime`` and return its report
+
+    Returns:
+        tuple: (result dict from the child, importtime stderr or None)
+    """
+    setup, method, path, body = SCENARIOS[scenario]
+    code = CHILD.format(
+        setup=setup,
+        body=json.dumps(body).encode() if body is not None else b"",
+        method=method,
+        path=path,
+        modules=TRACKED_MODULES,
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([API_DIR, BACKEND_DIR]), LOG_FILE="")
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    completed = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.splitlines()[-1])
+    return result, completed.stderr if importtime else None
+
+
+def measure(scenario, runs):
+    """
+    Cold-start timings of a scenario over several fresh interpreters.
+
+    Args:
+        scenario: Name in SCENARIOS
+        runs: Interpreter launches
+
+    Returns:
+        dict: Minimum and median import and first-response times in
+        milliseconds, and the last run's child result
+    """
+    results = [run_once(scenario)[0] for _ in range(runs)]
+    imports = [result["import_us"] / 1000 for result in results]
+    responses = [result["response_us"] / 1000 for result in results]
+    return {
+        "import_min_ms": min(imports),
+        "import_median_ms": statistics.median(imports),
+        "response_min_ms": min(responses),
+        "response_median_ms": statistics.median(responses),
+        "last": results[-1],
+    }
+
+
+def parse_importtime(stderr):
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        dict: Name of each module imported directly by index to its
+        cumulative import time in microseconds
+    """
+    timings = {}
+    children = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        # Children are reported before their parent, so collect depth-1
+        # entries until the top-level module that imported them shows up
+        if depth == 1:
+            children[name.strip()] = int(cumulative_us)
+        elif depth == 0:
+            if name.strip() == "index":
+                timings = children
+            children = {}
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for api/index.py")
+    parser.add_argument("--runs", type=int, default=15, help="Interpreter launches per scenario")
+    parser.add_argument("--importtime", action="store_true", help="List the slowest imports made by index")
+    parser.add_argument("--top", type=int, default=8, help="Imports to list with --importtime")
+    args = parser.parse_args()
+
+    for name in SCENARIOS:
+        timings = measure(name, args.runs)
+        print(
+            f"{name:>8}: import index {timings['import_median_ms']:7.2f} ms, "
+            f"first response {timings['response_median_ms']:7.2f} ms "
+            f"(median of {args.runs}; min {timings['response_min_ms']:.2f} ms), "
+            f"status {timings['last']['status']}"
+        )
+        print(f"          backend modules loaded: {', '.join(timings['last']['modules']) or 'none'}")
+
+    if args.importtime:
+        _, stderr = run_once("generate", importtime=True)
+        print("\nSlowest imports made by index (-X importtime):")
+        for module, us in sorted(parse_importtime(stderr).items(), key=lambda item: -item[1])[: args.top]:
+            print(f"  {module:<30} {us / 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Rate limiter algorithm benchmark.
+
+Compares the sliding log (a deque of timestamps per key) with the
+constant-state sliding window counter and GCRA:
+
+* time per decorator check: the previous decorator called is_allowed and
+  then get_remaining, pruning the deque twice; it now makes one check call
+* memory per key once every key has made a number of requests in the window
+
+Usage:
+    python benchmarks/bench_rate_limiter.py --keys 10000
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import RATE_LIMIT_ALGORITHMS, RateLimiter  # noqa: E402
+
+
+def key_names(count):
+    return [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(count)]
+
+
+def fill(limiter, names, requests_per_key):
+    for _ in range(requests_per_key):
+        for name in names:
+            limiter.check(name)
+
+
+def bytes_per_key(limiter_class, limit, names, requests_per_key):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    limiter = limiter_class(limit, 60)
+    fill(limiter, names, requests_per_key)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del limiter
+    return (after - before) / len(names)
+
+
+def ns_per_call(func, names, repeat=5):
+    count = len(names)
+    position = [0]
+
+    def step():
+        index = position[0]
+        position[0] = index + 1 if index + 1 < count else 0
+        func(names[index])
+
+    timer = timeit.Timer(step)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter algorithm benchmark")
+    parser.add_argument("--keys", type=int, default=10_000, help="Distinct client keys")
+    parser.add_argument("--limits", default="60,1000,10000", help="Comma-separated max_requests values")
+    parser.add_argument("--requests-per-key", type=int, default=50, help="Requests per key before measuring")
+    args = parser.parse_args()
+
+    names = key_names(args.keys)
+    limits = [int(value) for value in args.limits.split(",")]
+
+    print(f"{args.keys} keys, {args.requests_per_key} requests per key in the window\n")
+    print(f"{'algorithm':<22} {'limit':>7} {'bytes/key':>10} {'ns/check':>10}")
+
+    for limit in limits:
+        # The previous decorator: is_allowed, then get_remaining
+        legacy = RateLimiter(limit, 60)
+        fill(legacy, names, args.requests_per_key)
+
+        def two_calls(name, limiter=legacy):
+            limiter.is_allowed(name)
+            limiter.get_remaining(name)
+
+        legacy_bytes = bytes_per_key(RateLimiter, limit, names, args.requests_per_key)
+        print(f"{'sliding-log (2 calls)':<22} {limit:>7} {legacy_bytes:10.0f} {ns_per_call(two_calls, names):10.0f}")
+
+        for algorithm, limiter_class in RATE_LIMIT_ALGORITHMS.items():
+            limiter = limiter_class(limit, 60)
+            fill(limiter, names, args.requests_per_key)
+            memory = bytes_per_key(limiter_class, limit, names, args.requests_per_key)
+            print(f"{algorithm:<22} {limit:>7} {memory:10.0f} {ns_per_call(limiter.check, names):10.0f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
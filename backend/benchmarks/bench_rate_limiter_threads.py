@@ -0,0 +1,87 @@
+"""
+Rate limiter throughput under threads.
+
+Measures checks per second at 1 to 32 threads for:
+
+* global lock: one plain limiter behind a single lock
+* sharded: ShardedRateLimiter, one lock per shard chosen by key hash
+
+On a GIL build of CPython only one thread runs Python code at a time, so
+neither variant scales with threads; what the curve shows is how much each
+loses to lock contention and hand-offs as threads are added. On a
+free-threaded build the sharded limiter is the one that can scale.
+
+Usage:
+    python benchmarks/bench_rate_limiter_threads.py --threads 1,2,4,8,16,32
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limiter import ShardedRateLimiter, create_rate_limiter  # noqa: E402
+
+
+class GlobalLockRateLimiter:
+    """A single limiter serialized behind one lock, for comparison."""
+
+    def __init__(self, max_requests, window_seconds, algorithm):
+        self.lock = threading.Lock()
+        self.limiter = create_rate_limiter(max_requests, window_seconds, algorithm)
+
+    def check(self, key):
+        with self.lock:
+            return self.limiter.check(key)
+
+
+def checks_per_second(limiter, threads, checks_per_thread, keys):
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        check = limiter.check
+        count = len(keys)
+        barrier.wait()
+        for i in range(checks_per_thread):
+            check(keys[(offset + i * 7) % count])
+
+    workers = [threading.Thread(target=worker, args=(i * 997,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * checks_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter throughput under threads")
+    parser.add_argument("--threads", default="1,2,4,8,16,32", help="Comma-separated thread counts")
+    parser.add_argument("--algorithm", default="sliding-log", help="Rate limiting algorithm")
+    parser.add_argument("--shards", type=int, default=16, help="Shards for the sharded limiter")
+    parser.add_argument("--keys", type=int, default=10_000, help="Distinct client keys")
+    parser.add_argument("--checks", type=int, default=200_000, help="Total checks per measurement")
+    args = parser.parse_args()
+
+    keys = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(args.keys)]
+    thread_counts = [int(value) for value in args.threads.split(",")]
+
+    print(f"{args.algorithm}, {args.keys} keys, {args.shards} shards, GIL enabled: {getattr(sys, '_is_gil_enabled', lambda: True)()}\n")
+    print(f"{'threads':>7} {'global lock/s':>14} {'sharded/s':>14} {'ratio':>7}")
+
+    for threads in thread_counts:
+        per_thread = max(1, args.checks // threads)
+        # A high limit keeps every check on the allowed path
+        single = GlobalLockRateLimiter(10**9, 60, args.algorithm)
+        sharded = ShardedRateLimiter(10**9, 60, args.algorithm, shards=args.shards)
+        single_rate = checks_per_second(single, threads, per_thread, keys)
+        sharded_rate = checks_per_second(sharded, threads, per_thread, keys)
+        print(f"{threads:>7} {single_rate:14,.0f} {sharded_rate:14,.0f} {sharded_rate / single_rate:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
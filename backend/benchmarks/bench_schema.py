@@ -0,0 +1,116 @@
+"""
+Memory and construction benchmark for the prompt dataclasses.
+
+Compares the slotted classes in schema.py with regular dataclasses of the
+same fields (the previous definitions), for valid payloads and for
+payloads with an unknown key.
+
+Usage:
+    python benchmarks/bench_schema.py --count 100000
+"""
+
+import argparse
+import dataclasses
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import ImagePrompt, TextPrompt, VideoPrompt, VoicePrompt  # noqa: E402
+
+PAYLOADS = {
+    ImagePrompt: {
+        "modality": "image",
+        "goal": "product shot",
+        "subject": "a ceramic mug",
+        "style": "studio",
+        "lighting": "softbox",
+        "aspect_ratio": "1:1",
+    },
+    VideoPrompt: {
+        "modality": "video",
+        "goal": "establishing shot",
+        "subject": "harbor",
+        "scene": "dawn fog",
+        "action": "boats leaving",
+        "duration_seconds": 8,
+    },
+    VoicePrompt: {
+        "modality": "audio",
+        "goal": "narration",
+        "subject": "museum tour",
+        "accent": "British",
+        "emotion": "warm",
+    },
+    TextPrompt: {
+        "modality": "text",
+        "goal": "summarize",
+        "subject": "a paper",
+        "tone": "formal",
+        "format": "markdown",
+    },
+}
+
+
+def unslotted(cls):
+    """Regular dataclass with the same fields and defaults as cls."""
+    spec = []
+    for f in dataclasses.fields(cls):
+        if f.default is dataclasses.MISSING:
+            spec.append((f.name, f.type))
+        else:
+            spec.append((f.name, f.type, dataclasses.field(default=f.default)))
+    return dataclasses.make_dataclass(f"Plain{cls.__name__}", spec)
+
+
+def bytes_per_object(factory, count):
+    """Average traced allocation per object when count objects are kept alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding the objects costs one pointer per object
+    per_object = (after - before) / count - 8
+    del objects
+    return per_object
+
+
+def build_with_exception(cls, payload):
+    """Build path of PromptCompiler.build_prompt: bad keys raise TypeError."""
+    try:
+        return cls(**payload)
+    except TypeError:
+        return None
+
+
+def per_second(statement, number):
+    best = min(timeit.repeat(statement, number=number, repeat=5))
+    return number / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt dataclass memory and construction benchmark")
+    parser.add_argument("--count", type=int, default=100_000, help="Objects per measurement")
+    args = parser.parse_args()
+
+    print("Bytes per object, then constructions per second for valid and invalid (unknown key) payloads")
+    print(f"{'class':<12} {'plain B':>8} {'slots B':>8} {'plain **kw/s':>13} {'slots **kw/s':>13} {'bad raise/s':>12}")
+    for cls, payload in PAYLOADS.items():
+        plain = unslotted(cls)
+        plain_bytes = bytes_per_object(lambda: plain(**payload), args.count)
+        slots_bytes = bytes_per_object(lambda: cls(**payload), args.count)
+        plain_rate = per_second(lambda: plain(**payload), args.count)
+        slots_rate = per_second(lambda: cls(**payload), args.count)
+        bad = dict(payload, unexpected="x")
+        raise_rate = per_second(lambda: build_with_exception(cls, bad), args.count)
+        print(
+            f"{cls.__name__:<12} {plain_bytes:8.0f} {slots_bytes:8.0f} "
+            f"{plain_rate:13,.0f} {slots_rate:13,.0f} {raise_rate:12,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Throughput of the pre-fork server (server.py) as workers are added.
+
+Starts the server with 1, 2, 4, ... workers up to the CPU count, drives it
+from client processes that each send POST /generate requests back to back
+for a fixed time, and reports requests per second, the speedup over one
+worker and the scaling efficiency (speedup / workers). On Linux it also
+reports each worker's private memory, to show what copy-on-write sharing
+of the warmed-up master leaves per worker.
+
+The clients run on the same machine and need CPU too, so efficiency is
+only meaningful while workers + client processes fit in the available
+cores; on a single core every row measures the same CPU.
+
+Usage:
+    python benchmarks/bench_server_scaling.py --duration 5
+    python benchmarks/bench_server_scaling.py --workers 1 2 4 8 --clients-per-worker 2
+"""
+
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER = os.path.join(BACKEND_DIR, "server.py")
+
+BODY = json.dumps(
+    {
+        "modality": "image",
+        "model": "midjourney",
+        "payload": {"modality": "image", "goal": "poster", "subject": "a lighthouse at dusk", "style": "watercolor"},
+    }
+).encode()
+
+
+def client(address, deadline):
+    """
+    Send requests until deadline, one connection per request.
+
+    Returns:
+        tuple: (successful requests, failed requests)
+    """
+    host, port = address.rsplit(":", 1)
+    ok = failed = 0
+    while time.time() < deadline:
+        connection = http.client.HTTPConnection(host, int(port), timeout=10)
+        try:
+            connection.request("POST", "/generate", BODY, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                ok += 1
+            else:
+                failed += 1
+        except OSError:
+            failed += 1
+        finally:
+            connection.close()
+    return ok, failed
+
+
+def private_memory_kb(pid):
+    """Private (unshared) memory of a process in KiB, or None off Linux."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return sum(int(fields[name].split()[0]) for name in ("Private_Clean", "Private_Dirty") if name in fields)
+
+
+def start_server(workers, ready_file):
+    """Start server.py on a free port and wait until it is ready."""
+    env = dict(os.environ, LOG_FILE="", LOG_LEVEL="WARNING", RATE_LIMIT="1000000000")
+    process = subprocess.Popen(
+        [sys.executable, SERVER, "--bind", "127.0.0.1:0", "--workers", str(workers), "--ready-file", ready_file],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while not os.path.exists(ready_file):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("server did not become ready")
+        time.sleep(0.02)
+    with open(ready_file) as f:
+        return process, json.load(f)
+
+
+def measure(workers, clients, duration, warmup):
+    """
+    Throughput of a server with the given number of workers.
+
+    Returns:
+        dict: Requests per second, failures and mean private memory per worker
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        process, state = start_server(workers, os.path.join(directory, "ready.json"))
+        try:
+            with ProcessPoolExecutor(clients) as pool:
+                # Warm connections, workers' caches and the client processes
+                list(pool.map(client, [state["address"]] * clients, [time.time() + warmup] * clients))
+                deadline = time.time() + duration
+                results = list(pool.map(client, [state["address"]] * clients, [deadline] * clients))
+            memory = [private_memory_kb(pid) for pid in state["workers"]]
+        finally:
+            process.terminate()
+            process.wait()
+
+    ok = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    known = [kb for kb in memory if kb is not None]
+    return {
+        "rps": ok / duration,
+        "failed": failed,
+        "private_kb": sum(known) / len(known) if known else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork server throughput by worker count")
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    default_workers = sorted({1, *(2 ** i for i in range(1, cpus.bit_length()) if 2 ** i <= cpus), cpus})
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers, help="Worker counts to try")
+    parser.add_argument("--clients-per-worker", type=int, default=2, help="Client processes per worker")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds measured per worker count")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Seconds of unmeasured load first")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"{cpus} CPUs available; clients share them with the server")
+    print(f"{'workers':>7} {'clients':>7} {'req/s':>9} {'speedup':>8} {'efficiency':>10} {'private MiB':>12} {'failed':>7}")
+    results = []
+    base = None
+    for workers in args.workers:
+        clients = workers * args.clients_per_worker
+        result = measure(workers, clients, args.duration, args.warmup)
+        base = base or result["rps"]
+        speedup = result["rps"] / base
+        memory = f"{result['private_kb'] / 1024:12.1f}" if result["private_kb"] is not None else f"{'n/a':>12}"
+        print(
+            f"{workers:>7} {clients:>7} {result['rps']:9.0f} {speedup:8.2f} {speedup / workers:10.0%} "
+            f"{memory} {result['failed']:>7}"
+        )
+        results.append({"workers": workers, "clients": clients, "speedup": speedup, **result})
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"cpus": cpus, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
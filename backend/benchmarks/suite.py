@@ -0,0 +1,308 @@
+"""
+Benchmark suite for the request hot path.
+
+Measures per-adapter compile latency for every registered model, compiles
+with the compiled prompt cache off and on a hit and a miss, the full
+/generate request through the Flask test client, sanitize_payload on large
+payloads, the fused prepare_request pass and RateLimiter.is_allowed over
+many keys. Results are written as JSON and compared with the checked-in
+baseline; the run exits with status 1 when any case is slower than the
+baseline by more than the threshold.
+
+Baselines are machine-specific: record one on your machine before making a
+change, then compare against it.
+
+Usage:
+    python benchmarks/suite.py --update-baseline          # record baseline.json
+    python benchmarks/suite.py --threshold 0.15           # compare, fail on >15% slowdowns
+    python benchmarks/suite.py --filter adapter.          # run matching cases only
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import timeit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+# Keep the app's rate limit out of the way of the request benchmarks
+os.environ.setdefault("RATE_LIMIT", str(10**9))
+os.environ.setdefault("RATE_LIMIT_BATCH_ITEMS", str(10**9))
+
+from compiler import PROMPT_CLASSES  # noqa: E402
+from rate_limiter import RateLimiter, sanitize_payload  # noqa: E402
+from registry import ADAPTER_REGISTRY, ADAPTER_SPECS  # noqa: E402
+from validation import prepare_request  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCHMARK_DIR, "results.json")
+
+# A fully populated payload per modality
+PAYLOADS = {
+    "image": {
+        "modality": "image",
+        "goal": "product photography",
+        "subject": "a ceramic coffee mug on a walnut table",
+        "style": "photorealistic",
+        "constraints": ["centered composition", "shallow depth of field"],
+        "negative_constraints": ["text", "watermark"],
+        "quality_level": "high",
+        "environment": "sunlit kitchen",
+        "lighting": "soft morning light",
+        "camera": "85mm f/1.8",
+        "mood": "calm",
+        "aspect_ratio": "4:5",
+    },
+    "video": {
+        "modality": "video",
+        "goal": "establishing shot",
+        "subject": "a fishing harbor",
+        "style": "cinematic",
+        "constraints": ["no people in frame"],
+        "negative_constraints": ["shaky camera"],
+        "quality_level": "high",
+        "scene": "harbor at dawn with light fog",
+        "action": "boats slowly leave the dock",
+        "camera_motion": "slow aerial push-in",
+        "lighting": "golden hour",
+        "duration_seconds": 8,
+        "realism_level": "photorealistic",
+    },
+    "audio": {
+        "modality": "audio",
+        "goal": "museum audio guide",
+        "subject": "Welcome to the east wing, home to our impressionist collection.",
+        "style": "narration",
+        "constraints": ["under 30 seconds"],
+        "quality_level": "studio",
+        "voice_gender": "female",
+        "age_range": "middle-aged",
+        "accent": "British",
+        "emotion": "warm",
+        "pace": "measured",
+        "use_case": "audio guide",
+    },
+    "text": {
+        "modality": "text",
+        "goal": "summarize the findings",
+        "subject": "a paper on sparse attention",
+        "style": "academic",
+        "constraints": ["under 200 words", "cite section numbers"],
+        "negative_constraints": ["speculation"],
+        "quality_level": "expert",
+        "task_type": "analysis",
+        "tone": "formal",
+        "format": "markdown",
+        "length": "short",
+        "context": "The reader is a machine learning engineer.",
+    },
+}
+
+
+def adapter_cases():
+    """One case per registered model compiling a fully populated prompt."""
+    cases = {}
+    for model, spec in ADAPTER_SPECS.items():
+        adapter = ADAPTER_REGISTRY[model]
+        prompt = PROMPT_CLASSES[spec.modality](**PAYLOADS[spec.modality])
+        cases[f"adapter.compile.{model}"] = lambda adapter=adapter, prompt=prompt: adapter.compile(prompt)
+    return cases
+
+
+def compile_cache_cases():
+    """PromptCompiler.compile without a cache, and with one on a hit and a miss."""
+    from cache import CompileCache
+    from compiler import PromptCompiler
+
+    prompt = PROMPT_CLASSES["image"](**PAYLOADS["image"])
+    uncached = PromptCompiler()
+    hit = PromptCompiler(cache=CompileCache())
+    hit.compile(prompt, "dalle")
+    # A cache too small to keep anything: every call misses and stores
+    miss = PromptCompiler(cache=CompileCache(max_entries=0))
+    return {
+        "compile.cache.off": lambda: uncached.compile(prompt, "dalle"),
+        "compile.cache.hit": lambda: hit.compile(prompt, "dalle"),
+        "compile.cache.miss": lambda: miss.compile(prompt, "dalle"),
+    }
+
+
+def request_cases():
+    """Full POST /generate requests through the Flask test client."""
+    from app import app, log_listener
+
+    # Keep logging in the measurement but send console output nowhere
+    for handler in log_listener.handlers:
+        if isinstance(handler, logging.StreamHandler) and not isinstance(handler, logging.FileHandler):
+            handler.setStream(open(os.devnull, "w"))
+
+    app.config["TESTING"] = True
+    client = app.test_client()
+    models = {"image": "dalle", "video": "sora", "audio": "elevenlabs", "text": "gpt-4"}
+
+    cases = {}
+    for modality, model in models.items():
+        body = json.dumps({"modality": modality, "model": model, "payload": PAYLOADS[modality]})
+
+        def post(body=body):
+            response = client.post("/generate", data=body, content_type="application/json")
+            assert response.status_code == 200, response.data
+
+        cases[f"request.generate.{modality}"] = post
+    return cases
+
+
+def sanitize_cases():
+    """sanitize_payload on payloads with long strings and lists."""
+    long_text = ("A quiet harbor at dawn,  fishing boats\tand gulls. " * 60)[:2000]
+    large = {f"field_{i}": long_text for i in range(20)}
+    large["constraints"] = [long_text] * 50
+    typical = PAYLOADS["text"]
+    return {
+        "sanitize.payload.typical": lambda: sanitize_payload(typical, 2000),
+        "sanitize.payload.large": lambda: sanitize_payload(large, 2000),
+    }
+
+
+def prepare_cases():
+    """The fused validate, sanitize and build pass, per modality."""
+    models = {"image": "dalle", "video": "sora", "audio": "elevenlabs", "text": "gpt-4"}
+    cases = {}
+    for modality, model in models.items():
+        data = {"modality": modality, "model": model, "payload": PAYLOADS[modality]}
+        cases[f"prepare.request.{modality}"] = lambda data=data: prepare_request(data)
+    return cases
+
+
+def rate_limiter_cases(keys=10_000):
+    """RateLimiter.check, the decorator's per-policy call, cycling through many client keys."""
+    limiter = RateLimiter(max_requests=10**9, window_seconds=60)
+    names = [f"10.0.{i // 256}.{i % 256}" for i in range(keys)]
+    position = [0]
+
+    def check():
+        index = position[0]
+        position[0] = (index + 1) % keys
+        limiter.check(names[index])
+
+    # Fill every key once so the case measures steady state
+    for _ in range(keys):
+        check()
+    return {f"rate_limiter.check.{keys}_keys": check}
+
+
+CASE_GROUPS = (adapter_cases, compile_cache_cases, request_cases, sanitize_cases, prepare_cases, rate_limiter_cases)
+
+
+def measure(func, repeat):
+    """
+    Time a callable.
+
+    Returns:
+        float: Best nanoseconds per call over repeat rounds of about 0.2 s
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number * 1e9
+
+
+def run(filter_text=None, repeat=5):
+    """
+    Run all cases whose names contain filter_text.
+
+    Returns:
+        dict: Case name to nanoseconds per call
+    """
+    results = {}
+    for group in CASE_GROUPS:
+        for name, func in group().items():
+            if filter_text and filter_text not in name:
+                continue
+            results[name] = round(measure(func, repeat))
+            print(f"  {name:<45} {results[name]:12,.0f} ns", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results: Case name to ns per call
+        baseline: Case name to ns per call
+        threshold: Allowed relative slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        list: Names of cases slower than baseline * (1 + threshold)
+    """
+    regressions = []
+    print(f"\n{'case':<45} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<45} {'-':>12} {current:12,.0f} {'new':>8}")
+            continue
+        change = current / previous - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<45} {previous:12,.0f} {current:12,.0f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hot path benchmark suite")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--output", default=RESULTS_PATH, help="Where to write this run's results")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per case (best is kept)")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this text")
+    parser.add_argument("--update-baseline", action="store_true", help="Write results to the baseline file")
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.repeat)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "unit": "ns_per_call",
+        "results": results,
+    }
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.update_baseline:
+        if args.filter and os.path.exists(args.baseline):
+            # Merge a partial run into the existing baseline
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+            merged["results"].update(results)
+            report = dict(merged, python=report["python"], machine=report["machine"])
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline first")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""
+Offline bulk compiler for JSONL corpora.
+
+Reads one {"modality", "model", "payload"} request per line, compiles the
+prompts in a process pool and writes results in input order. Input is
+streamed in chunks, so memory use does not depend on file size.
+
+Usage:
+    python -m backend.bulk requests.jsonl -o prompts.jsonl -e errors.jsonl \\
+        --workers 8 --chunk-size 1000
+
+    # Continue a crashed run from its last checkpoint
+    python -m backend.bulk requests.jsonl -o prompts.jsonl -e errors.jsonl --resume
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from multiprocessing import Pool
+
+# Backend modules use flat imports; make them importable as `python -m backend.bulk`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from compiler import PromptCompiler  # noqa: E402
+from registry import ADAPTER_REGISTRY  # noqa: E402
+from validation import prepare_request  # noqa: E402
+
+# Per-process compiler, created once per worker by _init_worker
+_compiler = None
+
+
+class ResumeError(ValueError):
+    """A resume or start-line request that would overwrite existing output."""
+
+
+def _init_worker():
+    global _compiler
+    _compiler = PromptCompiler()
+
+
+def compile_line(compiler, line_number, line):
+    """
+    Compile one JSONL request line.
+
+    Any failure, including an unexpected exception from an adapter, becomes
+    an error record for this line rather than aborting the run.
+
+    Args:
+        compiler: PromptCompiler instance
+        line_number: 1-based line number in the input file
+        line: Raw bytes of the request line, decoded here so that invalid
+            UTF-8 fails only this line
+
+    Returns:
+        tuple: (ok, JSON text of the result or error record)
+    """
+    record = {"line": line_number}
+    try:
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError as e:
+            record["error"] = f"Invalid UTF-8: {str(e)}"
+            return False, json.dumps(record)
+
+        try:
+            item = json.loads(text)
+        except ValueError as e:
+            record["error"] = f"Invalid JSON: {str(e)}"
+            return False, json.dumps(record)
+
+        if not isinstance(item, dict):
+            record["error"] = "Item must be an object"
+            return False, json.dumps(record)
+
+        if "id" in item:
+            record["id"] = item["id"]
+
+        prompt, error = prepare_request(item)
+        if error:
+            record["error"] = error[0]
+            return False, json.dumps(record, ensure_ascii=False)
+
+        result = compiler.compile_many(
+            [{"modality": item["modality"], "model": item["model"], "prompt": prompt}]
+        )[0]
+        record.update(result)
+        return "error" not in result, json.dumps(record, ensure_ascii=False)
+    except Exception as e:
+        record["error"] = f"Could not compile line: {type(e).__name__}: {e}"
+        return False, json.dumps(record, ensure_ascii=False)
+
+
+def compile_chunk(chunk):
+    """Compile a list of (line number, raw line) pairs in a worker process."""
+    return [(line_number,) + compile_line(_compiler, line_number, line) for line_number, line in chunk]
+
+
+def read_chunks(path, chunk_size, start_line=0, start_offset=None):
+    """
+    Stream (line number, raw line) chunks from a JSONL file.
+
+    Args:
+        path: Input file path
+        chunk_size: Lines per chunk
+        start_line: Number of leading lines to skip
+        start_offset: Byte offset where line start_line + 1 begins, e.g.
+            from a checkpoint; the file is read from there instead of
+            skipping lines one by one
+
+    Yields:
+        tuple: (chunk, (line number, byte offset)). chunk holds up to
+        chunk_size (line number, bytes) pairs, blank lines skipped; the
+        position is just past the chunk's last line. A last, possibly
+        empty, chunk ends at the end of the file.
+    """
+    with open(path, "rb") as f:
+        if start_offset is None:
+            line_number, offset = 0, 0
+        else:
+            f.seek(start_offset)
+            line_number, offset = start_line, start_offset
+        chunk = []
+        for raw in f:
+            line_number += 1
+            offset += len(raw)
+            if line_number <= start_line or not raw.strip():
+                continue
+            chunk.append((line_number, raw))
+            if len(chunk) == chunk_size:
+                yield chunk, (line_number, offset)
+                chunk = []
+        if line_number > start_line:
+            yield chunk, (line_number, offset)
+
+
+def _checkpoint_path(output_path):
+    return f"{output_path}.checkpoint"
+
+
+def load_checkpoint(output_path):
+    """
+    Read the checkpoint of a previous run.
+
+    Returns:
+        dict: {"line", "input_offset", "output_offset", "error_offset"}, or
+        None if missing; input_offset is absent from older checkpoints
+    """
+    try:
+        with open(_checkpoint_path(output_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_checkpoint(output_path, line, input_offset, out_file, err_file):
+    out_file.flush()
+    err_file.flush()
+    checkpoint = {
+        "line": line,
+        "input_offset": input_offset,
+        "output_offset": out_file.tell(),
+        "error_offset": err_file.tell(),
+    }
+    temporary = _checkpoint_path(output_path) + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, _checkpoint_path(output_path))
+
+
+def _open_output(path, offset):
+    """Open an output file for appending after truncating it to offset."""
+    f = open(path, "a+b")
+    f.truncate(offset)
+    f.seek(offset)
+    return f
+
+
+def run(
+    input_path,
+    output_path,
+    error_path,
+    workers=None,
+    chunk_size=1000,
+    start_line=0,
+    resume=False,
+    checkpoint_every=10,
+):
+    """
+    Compile every request in a JSONL file.
+
+    Args:
+        input_path: JSONL file of {"modality", "model", "payload"} requests
+        output_path: JSONL file for compiled prompts, in input order
+        error_path: JSONL file for per-line errors
+        workers: Worker processes (default: CPU count); 1 runs in-process
+        chunk_size: Lines sent to a worker at a time
+        start_line: Skip this many input lines and append to the outputs
+        resume: Continue from the checkpoint left by a previous run
+        checkpoint_every: Chunks between checkpoints
+
+    Returns:
+        dict: Counts of compiled and failed lines and the last line handled
+
+    Raises:
+        ValueError: If chunk_size is less than 1
+        ResumeError: If resume is set without a checkpoint or start_line
+            while output exists, which a fresh run would overwrite
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    workers = workers or os.cpu_count() or 1
+    input_offset = output_offset = error_offset = None
+
+    if resume:
+        checkpoint = load_checkpoint(output_path)
+        if checkpoint:
+            start_line = checkpoint["line"]
+            input_offset = checkpoint.get("input_offset")
+            output_offset = checkpoint["output_offset"]
+            error_offset = checkpoint["error_offset"]
+        elif not start_line and any(os.path.exists(path) and os.path.getsize(path) for path in (output_path, error_path)):
+            raise ResumeError(
+                f"Nothing to resume: no checkpoint at {_checkpoint_path(output_path)}; "
+                "pass --start-line to append to the existing output, or remove it to start over"
+            )
+
+    if output_offset is None:
+        # A fresh run (start_line 0) starts from empty outputs
+        output_offset = os.path.getsize(output_path) if start_line and os.path.exists(output_path) else 0
+        error_offset = os.path.getsize(error_path) if start_line and os.path.exists(error_path) else 0
+
+    stats = {"compiled": 0, "failed": 0, "line": start_line}
+    chunks = read_chunks(input_path, chunk_size, start_line, input_offset)
+
+    out_file = _open_output(output_path, output_offset)
+    err_file = _open_output(error_path, error_offset)
+    try:
+        if workers == 1:
+            _init_worker()
+            results = ((compile_chunk(chunk), position) for chunk, position in chunks)
+            input_offset = _write_results(results, stats, input_offset, output_path, out_file, err_file, checkpoint_every)
+        else:
+            # Warm adapters before forking so workers share them copy-on-write
+            ADAPTER_REGISTRY.load_all()
+            with Pool(workers, initializer=_init_worker) as pool:
+                results = _ordered_results(pool, chunks, max_pending=workers * 2)
+                input_offset = _write_results(
+                    results, stats, input_offset, output_path, out_file, err_file, checkpoint_every
+                )
+        _write_checkpoint(output_path, stats["line"], input_offset, out_file, err_file)
+    finally:
+        out_file.close()
+        err_file.close()
+
+    return stats
+
+
+def _ordered_results(pool, chunks, max_pending):
+    """
+    Yield chunk results in submission order with bounded read-ahead.
+
+    Unlike Pool.imap, at most max_pending chunks are read and queued at a
+    time, so large inputs are never buffered in memory.
+    """
+    pending = deque()
+    for chunk, position in chunks:
+        pending.append((pool.apply_async(compile_chunk, (chunk,)), position))
+        if len(pending) >= max_pending:
+            result, position = pending.popleft()
+            yield result.get(), position
+    while pending:
+        result, position = pending.popleft()
+        yield result.get(), position
+
+
+def _write_results(results, stats, input_offset, output_path, out_file, err_file, checkpoint_every):
+    """Write (chunk results, input position) pairs; return the input offset reached."""
+    for index, (chunk_results, (line, input_offset)) in enumerate(results, start=1):
+        for _, ok, text in chunk_results:
+            if ok:
+                out_file.write(text.encode("utf-8") + b"\n")
+                stats["compiled"] += 1
+            else:
+                err_file.write(text.encode("utf-8") + b"\n")
+                stats["failed"] += 1
+        stats["line"] = line
+        if index % checkpoint_every == 0:
+            _write_checkpoint(output_path, line, input_offset, out_file, err_file)
+    return input_offset
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.bulk", description="Compile prompts from a JSONL file"
+    )
+    parser.add_argument("input", help="JSONL file with one {modality, model, payload} per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file for compiled prompts")
+    parser.add_argument("-e", "--errors", required=True, help="JSONL file for per-line errors")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=1000, help="Lines per worker task")
+    parser.add_argument("--start-line", type=int, default=0, help="Skip this many input lines and append")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    try:
+        stats = run(
+            args.input,
+            args.output,
+            args.errors,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            start_line=args.start_line,
+            resume=args.resume,
+        )
+    except ResumeError as e:
+        parser.error(str(e))
+    print(
+        f"Compiled {stats['compiled']} prompts, {stats['failed']} errors "
+        f"(last line {stats['line']})",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Bounded in-memory cache for compiled prompts.
+Entries are evicted least-recently-used first and expire after a TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import fields
+from operator import attrgetter
+
+# Prompt class -> getter returning its field values in declaration order
+_FIELD_GETTERS = {}
+
+
+def prompt_cache_key(prompt, model_name):
+    """
+    Build a cache key for a prompt and target model.
+
+    The key is a tuple of the model name, the prompt class and its field
+    values, with lists turned into tuples, so equal prompts always share a
+    key. Building it costs far less than hashing a serialized copy, which
+    took longer than compiling the prompt.
+
+    Args:
+        prompt: Prompt dataclass instance
+        model_name: Name of the target model
+
+    Returns:
+        tuple: Key identifying the compiled output
+    """
+    cls = type(prompt)
+    getter = _FIELD_GETTERS.get(cls)
+    if getter is None:
+        getter = _FIELD_GETTERS[cls] = attrgetter(*(f.name for f in fields(cls)))
+    return (model_name, cls, *[tuple(value) if type(value) is list else value for value in getter(prompt)])
+
+
+class CompileCache:
+    """
+    LRU cache with TTL expiry.
+    Tracks hit, miss and eviction counters.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        """
+        Initialize cache.
+
+        Args:
+            max_entries: Maximum number of cached entries
+            ttl_seconds: Seconds an entry stays valid after it is stored
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Look up a cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return cache counters and current size."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,9 +1,127 @@
-from registry import ADAPTER_REGISTRY
+import logging
+
+from cache import prompt_cache_key
+from registry import ADAPTER_REGISTRY, MODEL_MODALITY, get_available_models_by_modality, get_model_capabilities
+from schema import ImagePrompt, VideoPrompt, VoicePrompt, TextPrompt, field_sets
+
+# Prompt dataclass used for each modality
+PROMPT_CLASSES = {
+    "text": TextPrompt,
+    "image": ImagePrompt,
+    "video": VideoPrompt,
+    "audio": VoicePrompt,
+}
+
+logger = logging.getLogger(__name__)
+
+
+def describe_models():
+    """
+    Build the /models document: models by modality, each model's
+    capabilities and the payload fields each modality accepts.
+
+    Returns:
+        dict: {"models", "capabilities", "fields"}
+    """
+    fields = {}
+    for modality, prompt_class in PROMPT_CLASSES.items():
+        names, required = field_sets(prompt_class)
+        fields[modality] = {
+            "required": sorted(required),
+            "optional": sorted(names - required),
+        }
+    return {
+        "models": get_available_models_by_modality(),
+        "capabilities": get_model_capabilities(),
+        "fields": fields,
+    }
 
 
 class PromptCompiler:
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: Optional CompileCache for compiled prompts. Adapters are
+                pure functions of (model, prompt fields), so repeated
+                payloads are served from the cache.
+        """
+        self.cache = cache
+
+    def build_prompt(self, modality: str, payload: dict):
+        """
+        Create the prompt object for a modality from a sanitized payload.
+
+        Raises:
+            ValueError: If the modality is unknown
+            TypeError: If the payload has unknown fields or lacks required ones
+        """
+        prompt_class = PROMPT_CLASSES.get(modality)
+        if not prompt_class:
+            raise ValueError(f"Unsupported modality: {modality}")
+        try:
+            return prompt_class(**payload)
+        except TypeError:
+            pass
+
+        # Name the offending fields rather than repeating the __init__ error
+        names, required = field_sets(prompt_class)
+        unknown = [key for key in payload if key not in names]
+        if unknown:
+            raise TypeError(f"Unknown fields for {modality}: {', '.join(unknown)}")
+        missing = ", ".join(sorted(required - payload.keys()))
+        raise TypeError(f"Missing required fields: {missing}")
+
     def compile(self, prompt, model_name: str) -> str:
-        adapter = ADAPTER_REGISTRY.get(model_name)
-        if not adapter:
+        # Check the frozen index first so unknown names never touch the registry
+        if model_name not in MODEL_MODALITY:
             raise ValueError(f"Unsupported model: {model_name}")
-        return adapter.compile(prompt)
+        adapter = ADAPTER_REGISTRY[model_name]
+
+        if self.cache is None:
+            return adapter.compile(prompt)
+
+        key = prompt_cache_key(prompt, model_name)
+        result = self.cache.get(key)
+        if result is None:
+            result = adapter.compile(prompt)
+            self.cache.set(key, result)
+        return result
+
+    def compile_many(self, items) -> list:
+        """
+        Compile a batch of validated and sanitized items.
+
+        Args:
+            items: Iterable of dicts with modality and model keys, plus
+                either a payload dict or a prompt built by
+                validation.prepare_request
+
+        Returns:
+            list: One result per item, in input order. Each result is either
+            {"prompt", "model", "modality"} or {"error"}, so a bad item,
+            including one an adapter fails on, does not fail the rest of
+            the batch.
+        """
+        results = []
+        for item in items:
+            modality = item["modality"]
+            model = item["model"]
+            prompt = item.get("prompt")
+            if prompt is None:
+                try:
+                    prompt = self.build_prompt(modality, item["payload"])
+                except TypeError as e:
+                    results.append({"error": f"Invalid payload: {str(e)}"})
+                    continue
+            try:
+                result = self.compile(prompt, model)
+            except ValueError as e:
+                results.append({"error": str(e)})
+                continue
+            except Exception as e:
+                # e.g. an adapter joining a non-string list item
+                logger.error("Failed to compile %s prompt for %s: %s", modality, model, e, exc_info=True)
+                results.append({"error": f"Could not compile prompt for {model}"})
+                continue
+            results.append({"prompt": result, "model": model, "modality": modality})
+        return results
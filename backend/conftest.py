@@ -0,0 +1,40 @@
+"""
+Shared pytest setup for the backend tests.
+
+app.py configures logging when it is imported, and LOG_FILE defaults to a
+file in the working directory; keep test runs from writing one.
+"""
+
+import os
+import time
+
+import pytest
+
+os.environ["LOG_FILE"] = ""
+
+
+class FakeClock:
+    """A settable clock, called like time.time."""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Freeze time.time at a FakeClock for the test.
+
+    This patches the attribute on the time module, so every module calling
+    time.time() reads the fake clock; names bound with `from time import`
+    keep the real function and need their own monkeypatch.setattr.
+    """
+    fake = FakeClock()
+    monkeypatch.setattr(time, "time", fake)
+    return fake
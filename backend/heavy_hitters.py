@@ -0,0 +1,164 @@
+"""
+Fixed-memory tracking of the busiest clients (heavy hitters).
+
+SpaceSaving keeps at most `capacity` counters however many distinct keys
+it sees. When a new key arrives and every counter is taken, the smallest
+counter is handed to the new key, which inherits its count as an error
+bound. Any key whose true count exceeds total / capacity is guaranteed to
+be tracked, and each reported count overestimates the true count by at
+most the reported error.
+"""
+
+import heapq
+import threading
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-K sketch (Metwally et al., 2005).
+
+    Counters live in a dict; a min-heap of (count, key) finds the smallest
+    one. Increments push a fresh heap entry instead of updating the old one
+    in place, and entries that no longer match their counter are skipped
+    when popped; the heap is rebuilt once it holds too many of them, so
+    memory stays O(capacity). Not thread-safe.
+    """
+
+    def __init__(self, capacity=100):
+        """
+        Args:
+            capacity: Maximum number of keys tracked
+        """
+        if capacity < 1:
+            raise ValueError("SpaceSaving capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self._counters = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self._counters)
+
+    def add(self, key, weight=1):
+        """
+        Count weight occurrences of key.
+
+        Args:
+            key: Item to count; must be orderable against other keys
+            weight: Positive amount to add
+        """
+        if weight <= 0:
+            return
+        self.total += weight
+
+        counter = self._counters.get(key)
+        if counter is None:
+            if len(self._counters) < self.capacity:
+                counter = self._counters[key] = [0, 0]
+            else:
+                # Replace the smallest counter; its count bounds the new key's error
+                count = self._pop_min()
+                counter = self._counters[key] = [count, count]
+
+        counter[0] += weight
+        heapq.heappush(self._heap, (counter[0], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, (count, _) in self._counters.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        """Remove the smallest counter and return its count."""
+        while True:
+            count, key = heapq.heappop(self._heap)
+            counter = self._counters.get(key)
+            if counter is not None and counter[0] == count:
+                del self._counters[key]
+                return count
+
+    def top(self, n=None):
+        """
+        Get the largest counters.
+
+        Args:
+            n: Number of keys to return; all tracked keys if None
+
+        Returns:
+            list: (key, count, error) tuples, largest count first; the true
+            count of each key is between count - error and count
+        """
+        ranked = sorted(self._counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+
+class HeavyHitters:
+    """
+    Top clients by requests and by rejected requests, in fixed memory.
+
+    Clients are split over independently locked stripes by key hash, as
+    ShardedRateLimiter splits its limiters, so requests from different
+    clients rarely wait on the same lock. Each client is counted in one
+    stripe only, so merging the stripes' top lists keeps every count and
+    error bound; a stripe's error is at most its own total / capacity.
+    """
+
+    def __init__(self, capacity=100, stripes=16):
+        """
+        Args:
+            capacity: Maximum number of clients tracked per sketch and stripe
+            stripes: Number of independently locked stripes
+        """
+        self.capacity = capacity
+        self._stripes = [
+            (threading.Lock(), SpaceSaving(capacity), SpaceSaving(capacity)) for _ in range(max(1, stripes))
+        ]
+
+    def record(self, key, allowed):
+        """
+        Count a request from key.
+
+        Args:
+            key: Client identifier
+            allowed: Whether the request passed the rate limit
+        """
+        lock, requests, rejections = self._stripes[hash(key) % len(self._stripes)]
+        with lock:
+            requests.add(key)
+            if not allowed:
+                rejections.add(key)
+
+    def snapshot(self, n=None):
+        """
+        Get the top clients.
+
+        Args:
+            n: Number of clients per list; all tracked clients if None
+
+        Returns:
+            dict: Totals and the top clients by requests and by rejections,
+            each as {"key", "count", "error"}
+        """
+        total_requests = total_rejections = 0
+        top_requests = []
+        top_rejections = []
+        for lock, requests, rejections in self._stripes:
+            with lock:
+                total_requests += requests.total
+                total_rejections += rejections.total
+                top_requests += requests.top(n)
+                top_rejections += rejections.top(n)
+        return {
+            "capacity": self.capacity,
+            "total_requests": total_requests,
+            "total_rejections": total_rejections,
+            "requests": [_entry(*item) for item in _largest(top_requests, n)],
+            "rejections": [_entry(*item) for item in _largest(top_rejections, n)],
+        }
+
+
+def _largest(items, n):
+    """The n (key, count, error) tuples with the largest counts, largest first."""
+    return sorted(items, key=lambda item: item[1], reverse=True)[:n]
+
+
+def _entry(key, count, error):
+    return {"key": key, "count": count, "error": error}
@@ -0,0 +1,227 @@
+"""
+HTTP caching helpers: responses serialized once with a strong ETag,
+conditional GET handling, and the canonical query string of the cacheable
+GET /generate.
+"""
+
+import hashlib
+import json
+from typing import NamedTuple
+from urllib.parse import quote
+
+from flask import Response, request
+from request_limits import MAX_JSON_DEPTH, json_too_deep
+
+# Headers describing one request or client. Shared caches store a response's
+# headers with its body and replay them to every later client, so publicly
+# cacheable responses are sent without them.
+PER_REQUEST_HEADERS = (
+    "X-Request-ID",
+    "Server-Timing",
+    "Timing-Allow-Origin",
+    "X-RateLimit-Limit",
+    "X-RateLimit-Remaining",
+    "X-RateLimit-Reset",
+)
+
+
+class CachedBody(NamedTuple):
+    """
+    A response body serialized ahead of time.
+
+    Attributes:
+        body: Encoded response bytes
+        etag: Strong entity tag (quoted content hash)
+        content_type: Content-Type header value
+    """
+
+    body: bytes
+    etag: str
+    content_type: str = "application/json"
+
+
+def etag_for(body):
+    """
+    Strong ETag for a response body.
+
+    Args:
+        body: Response bytes
+
+    Returns:
+        str: Quoted hex digest of the body
+    """
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def cached_json(data):
+    """
+    Serialize data as compact JSON once.
+
+    Args:
+        data: JSON-serializable object
+
+    Returns:
+        CachedBody: Body bytes and their ETag
+    """
+    body = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return CachedBody(body, etag_for(body))
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether an If-None-Match header value matches an ETag.
+
+    Uses the weak comparison RFC 9110 prescribes for If-None-Match, so a
+    W/ prefix added by a proxy (e.g. after compressing) still matches.
+
+    Args:
+        if_none_match: Header value, possibly a comma-separated list or "*"
+        etag: Current strong ETag
+
+    Returns:
+        bool: True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(cached, cache_control):
+    """
+    Respond with a cached body, or 304 Not Modified if the client has it.
+
+    Args:
+        cached: CachedBody
+        cache_control: Cache-Control header value
+
+    Returns:
+        Response: 304 without a body, or 200 with the cached bytes
+    """
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("If-None-Match"), cached.etag):
+        return Response(status=304, headers=headers)
+    return Response(cached.body, status=200, headers=headers, content_type=cached.content_type)
+
+
+def conditional(response, cache_control):
+    """
+    Make a generated response cacheable: tag it with an ETag of its body and
+    turn it into 304 Not Modified if the client already has that body.
+
+    Args:
+        response: Response with its full body
+        cache_control: Cache-Control header value
+
+    Returns:
+        Response: The same response, possibly emptied to a 304
+    """
+    etag = etag_for(response.get_data())
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        response.status_code = 304
+        response.set_data(b"")
+        del response.headers["Content-Type"]
+    return response
+
+
+def shared_cacheable(response):
+    """
+    Whether shared caches (CDNs, proxies) may store a response.
+
+    Args:
+        response: Response
+
+    Returns:
+        bool: True if its Cache-Control is public or sets s-maxage, and
+        neither private nor no-store
+    """
+    cache_control = response.cache_control
+    if cache_control.private or cache_control.no_store:
+        return False
+    return bool(cache_control.public) or cache_control.s_maxage is not None
+
+
+def drop_per_request_headers(response):
+    """
+    Remove PER_REQUEST_HEADERS from a response.
+
+    Args:
+        response: Response
+    """
+    for header in PER_REQUEST_HEADERS:
+        response.headers.pop(header, None)
+
+
+def _encode_component(value):
+    """Percent-encode like JavaScript's encodeURIComponent."""
+    return quote(value, safe="!'()*")
+
+
+def canonical_json(value):
+    """
+    Serialize a payload the same way every time, and the same way as the
+    frontend's canonicalJSON: sorted keys, no whitespace, non-ASCII kept.
+
+    Args:
+        value: JSON-serializable object
+
+    Returns:
+        str: Canonical JSON
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def canonical_generate_query(modality, model, payload):
+    """
+    Build the canonical query string of GET /generate.
+
+    Identical requests always produce the identical URL, so an edge cache
+    keyed on the URL serves every repeat. Parameters are in sorted order and
+    the payload is canonical JSON, percent-encoded as encodeURIComponent
+    does; the frontend builds the same string in api.js.
+
+    Args:
+        modality: Prompt modality
+        model: Model name
+        payload: Payload dict
+
+    Returns:
+        str: Query string without the leading "?"
+    """
+    return "modality={}&model={}&payload={}".format(
+        _encode_component(modality),
+        _encode_component(model),
+        _encode_component(canonical_json(payload)),
+    )
+
+
+def parse_generate_query(args):
+    """
+    Read a GET /generate request from its query parameters.
+
+    Args:
+        args: Query parameters (request.args)
+
+    Returns:
+        tuple: (request dict with modality, model and payload, None), or
+        (None, (error message, status code))
+    """
+    raw_payload = args.get("payload")
+    if raw_payload is None:
+        return None, ("Missing payload query parameter", 400)
+    if json_too_deep(raw_payload):
+        return None, (f"Payload query parameter is nested more than {MAX_JSON_DEPTH} levels deep", 400)
+    try:
+        payload = json.loads(raw_payload)
+    except ValueError:
+        return None, ("Payload query parameter must be JSON", 400)
+    return {"modality": args.get("modality"), "model": args.get("model"), "payload": payload}, None
@@ -0,0 +1,182 @@
+"""
+Non-blocking, structured logging for the API.
+
+Request threads only put log records on an in-memory queue; a
+QueueListener thread formats them and writes them to the console and to a
+rotating log file of JSON lines. Messages use %-style arguments so they
+are only formatted if a handler actually emits them.
+
+Configured from the environment by setup_logging():
+    LOG_LEVEL: Minimum level logged (default INFO)
+    LOG_FILE: JSON lines log file (default prompt_generator.log; empty
+        disables file logging)
+    LOG_ROTATE_WHEN: Rotate at a time interval instead of by size, e.g.
+        "midnight" or "H" (see TimedRotatingFileHandler)
+    LOG_MAX_BYTES: Rotate the file when it reaches this size (default 10 MB)
+    LOG_BACKUP_COUNT: Rotated files kept (default 5)
+    LOG_SUCCESS_SAMPLE_RATE: Fraction of successful requests written to
+        the access log (default 1.0); errors are always logged
+
+Several processes appending to one LOG_FILE (the pre-fork server) must not
+rotate it themselves, or each renames the file under the others; they call
+setup_logging(rotate=False) and leave rotation to an external tool.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from flask import g, has_request_context
+
+CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects, including extra= fields."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ConsoleHandler(logging.StreamHandler):
+    """
+    StreamHandler for sys.stderr that looks the stream up when it writes.
+
+    Records are written by the listener thread, possibly after whoever
+    started the app has swapped or closed the sys.stderr it saw at startup
+    (test runners capturing output do both).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._follow_stderr = True
+
+    def setStream(self, stream):
+        self._follow_stderr = False
+        return super().setStream(stream)
+
+    def emit(self, record):
+        if self._follow_stderr:
+            self.stream = sys.stderr
+        super().emit(record)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The base class formats every record on the logging thread so it can be
+    pickled; records here stay in process, so they are queued as is and
+    the request thread only pays for creating the record.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SuccessSampler(logging.Filter):
+    """Keep a fraction of records for successful requests, and all others."""
+
+    def __init__(self, rate):
+        """
+        Args:
+            rate: Fraction (0 to 1) of records with a status below 400 kept
+        """
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        status = getattr(record, "status", None)
+        return status is None or status >= 400 or random.random() < self.rate
+
+
+class RequestIdFilter(logging.Filter):
+    """Tag records logged while handling a request with its request id."""
+
+    def filter(self, record):
+        if not hasattr(record, "request_id") and has_request_context():
+            record.request_id = g.get("request_id")
+        return True
+
+
+def setup_logging(rotate=True):
+    """
+    Route the root logger through a queue to console and file handlers.
+
+    Args:
+        rotate: Rotate LOG_FILE by size or time in this process. When False,
+            LOG_ROTATE_WHEN, LOG_MAX_BYTES and LOG_BACKUP_COUNT are ignored
+            and the file is reopened whenever an external tool such as
+            logrotate moves it away
+
+    Returns:
+        QueueListener: The running listener; stopped (flushing the queue)
+        at interpreter exit
+    """
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_file = os.getenv("LOG_FILE", "prompt_generator.log")
+
+    console = ConsoleHandler()
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    handlers = [console]
+
+    if log_file:
+        when = os.getenv("LOG_ROTATE_WHEN")
+        backup_count = int(os.getenv("LOG_BACKUP_COUNT", 5))
+        if not rotate:
+            file_handler = logging.handlers.WatchedFileHandler(log_file, encoding="utf-8")
+        elif when:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=when, backupCount=backup_count, encoding="utf-8", utc=True
+            )
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024)),
+                backupCount=backup_count,
+                encoding="utf-8",
+            )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SuccessSampler(float(os.getenv("LOG_SUCCESS_SAMPLE_RATE", 1.0))))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener):
+    """Flush and stop a listener unless it has been stopped already."""
+    if listener._thread is not None:
+        listener.stop()
@@ -0,0 +1,245 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are sharded per thread: each thread adds to
+its own dicts without taking a lock, and a scrape sums the shards. Shards
+of threads that have exited are folded into one retired shard, so servers
+that start a thread per request do not accumulate them. Values computed at
+scrape time (cache and rate limiter stats) are registered as callbacks.
+
+Metrics are per process; with several worker processes, scrape each worker
+or aggregate in Prometheus.
+"""
+
+import threading
+from bisect import bisect_left
+
+# Latency buckets in seconds, from cached compiles to slow batches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _ThreadShards:
+    """One dict per thread, merged on read."""
+
+    def __init__(self, merge):
+        """
+        Args:
+            merge: Function(into, shard) adding one shard's values to another
+        """
+        self._merge = merge
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The calling thread's shard."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def _retire_dead(self):
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def collect(self):
+        """Sum of every shard; values are copied, never shared with writers."""
+        with self._lock:
+            self._retire_dead()
+            total = {}
+            self._merge(total, self._retired)
+            for _, shard in self._shards:
+                # dict() copies in one step under the GIL while the owner writes
+                self._merge(total, dict(shard))
+        return total
+
+
+def _merge_numbers(into, shard):
+    for labels, value in shard.items():
+        into[labels] = into.get(labels, 0) + value
+
+
+def _merge_histograms(into, shard):
+    for labels, counts in shard.items():
+        # Copy before summing; the owning thread may be updating counts
+        counts = list(counts)
+        total = into.get(labels)
+        if total is None:
+            into[labels] = counts
+        else:
+            for i, value in enumerate(counts):
+                total[i] += value
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        """
+        Args:
+            name: Metric name
+            help: Help text
+            labelnames: Label names, in the order values are passed
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._shards = _ThreadShards(_merge_numbers)
+
+    def inc(self, *labels, amount=1):
+        """Add amount for the label values."""
+        shard = self._shards.get()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, *labels):
+        """Current total for the label values."""
+        return self._shards.collect().get(labels, 0)
+
+    def samples(self):
+        for labels, value in sorted(self._shards.collect().items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. requests in flight."""
+
+    type = "gauge"
+
+    def dec(self, *labels, amount=1):
+        """Subtract amount for the label values."""
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    """Fixed-bucket histogram with labels."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name: Metric name
+            help: Help text
+            labelnames: Label names, in the order values are passed
+            buckets: Increasing upper bounds; +Inf is implied
+        """
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._shards = _ThreadShards(_merge_histograms)
+
+    def observe(self, value, *labels):
+        """Record one observation for the label values."""
+        shard = self._shards.get()
+        counts = shard.get(labels)
+        if counts is None:
+            # One count per bucket (non-cumulative) plus +Inf, then the sum
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        bounds = self.buckets + (float("inf"),)
+        names = self.labelnames + ("le",)
+        for labels, counts in sorted(self._shards.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", names, labels + (_number(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, counts[-1]
+            yield f"{self.name}_count", self.labelnames, labels, cumulative
+
+
+class Collected:
+    """Metric whose samples are computed at scrape time."""
+
+    def __init__(self, name, help, type, labelnames, collect):
+        """
+        Args:
+            name: Metric name
+            help: Help text
+            type: "counter" or "gauge"
+            labelnames: Label names
+            collect: Function returning {label values tuple: value}
+        """
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def samples(self):
+        for labels, value in sorted(self._collect().items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class MetricsRegistry:
+    """Set of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """Add a metric and return it."""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collected(self, name, help, type, labelnames, collect):
+        return self.register(Collected(name, help, type, labelnames, collect))
+
+    def render(self):
+        """
+        Render every metric.
+
+        Returns:
+            str: Prometheus text exposition format (version 0.0.4)
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(f"{name}{_label_text(labelnames, labels)} {_number(value)}")
+        return "\n".join(lines) + "\n"
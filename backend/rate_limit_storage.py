@@ -0,0 +1,224 @@
+"""
+Pluggable storage for GCRA rate limiting.
+
+A storage applies a GCRA check to a key atomically and keeps the key's
+theoretical arrival time (TAT). StorageRateLimiter turns any storage into a
+rate limiter with the same interface as those in rate_limiter.
+
+Backends:
+    MemoryStorage: in-process, thread-safe; for a single process or tests
+    RedisStorage: shared by every process and node using the same Redis;
+        each check is one EVALSHA round trip running a Lua script, timed
+        by the Redis server clock so nodes with skewed clocks agree
+
+Enable Redis by setting RATE_LIMIT_REDIS_URL (requires the redis package
+and Redis 5 or later, which replicates the script's effects rather than the
+script itself).
+"""
+
+import logging
+import threading
+import time
+from typing import Protocol
+
+from rate_limiter import KeyStore, RateLimitDecision, gcra_step
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed for RedisStorage
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStorage(Protocol):
+    """Atomic GCRA state store."""
+
+    def gcra(self, key, max_requests, window_seconds, cost=1):
+        """
+        Atomically check key and, if allowed, record cost requests.
+
+        Args:
+            key: Identifier for rate limiting
+            max_requests: Maximum requests per window
+            window_seconds: Time window in seconds
+            cost: Requests this check counts as; 0 only inspects
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
+
+    def stats(self):
+        """Return a dict of storage gauges."""
+
+
+class MemoryStorage:
+    """In-process storage: a bounded key store of TATs behind one lock."""
+
+    def __init__(self, max_keys=100_000):
+        """
+        Args:
+            max_keys: Maximum number of keys kept
+        """
+        self.store = KeyStore(lambda tat, now: tat <= now, max_keys)
+        self.lock = threading.Lock()
+
+    def gcra(self, key, max_requests, window_seconds, cost=1):
+        """Atomically check key and record cost requests if allowed."""
+        interval = window_seconds / max_requests
+        with self.lock:
+            now = time.time()
+            decision, tat = gcra_step(self.store.get(key), now, interval, window_seconds, max_requests, cost)
+            if cost:
+                self.store.put(key, tat, now)
+        return decision
+
+    def stats(self):
+        """Live key and eviction gauges of the key store."""
+        with self.lock:
+            return self.store.stats()
+
+
+# GCRA check as a Redis script. Timestamps are kept as decimal strings since
+# Redis converts Lua numbers in replies to integers. Keys expire once their
+# TAT has passed, which is when they stop carrying information.
+GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local max_requests = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local interval = window / max_requests
+local tolerance = 1e-6
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval * cost
+local allow_at = new_tat - window
+
+if allow_at - now > tolerance then
+    return {0, 0, string.format('%.6f', tat - now), string.format('%.6f', allow_at - now)}
+end
+
+if cost > 0 then
+    redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+end
+local remaining = math.floor((now - allow_at) / interval + tolerance)
+if remaining > max_requests then
+    remaining = max_requests
+end
+return {1, remaining, string.format('%.6f', new_tat - now), '0'}
+"""
+
+
+class RedisStorage:
+    """
+    Redis storage shared by every process and node using the same server.
+
+    Each check runs GCRA_SCRIPT once through EVALSHA (the script is loaded
+    on first use and reloaded if the server has flushed it), so it costs a
+    single round trip and is atomic on the server.
+    """
+
+    def __init__(self, client, prefix="ratelimit:", fail_open=True):
+        """
+        Args:
+            client: redis.Redis client, or any object with register_script
+            prefix: Prefix for rate limit keys
+            fail_open: Allow requests when Redis cannot be reached, instead
+                of raising
+        """
+        self.client = client
+        self.prefix = prefix
+        self.fail_open = fail_open
+        self.errors = 0
+        self._script = client.register_script(GCRA_SCRIPT)
+        self._error_types = (redis.RedisError, OSError) if redis else (OSError,)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """
+        Create a storage from a Redis URL.
+
+        Args:
+            url: Redis URL, e.g. redis://localhost:6379/0
+            **kwargs: Passed to RedisStorage
+
+        Returns:
+            RedisStorage: Storage using a new client for url
+        """
+        if redis is None:
+            raise RuntimeError("RedisStorage requires the redis package: pip install redis")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def gcra(self, key, max_requests, window_seconds, cost=1):
+        """Atomically check key and record cost requests if allowed."""
+        try:
+            allowed, remaining, reset_after, retry_after = self._script(
+                keys=[f"{self.prefix}{key}"],
+                args=[max_requests, window_seconds, cost],
+            )
+        except self._error_types as e:
+            if not self.fail_open:
+                raise
+            self.errors += 1
+            logger.warning("Rate limit storage unavailable, allowing request: %s", e)
+            return RateLimitDecision(True, max_requests, max_requests, 0.0, 0.0)
+
+        return RateLimitDecision(
+            bool(allowed),
+            max_requests,
+            int(remaining),
+            float(reset_after),
+            float(retry_after),
+        )
+
+    def stats(self):
+        """Redis expires idle keys itself; only errors are counted here."""
+        return {"errors": self.errors}
+
+
+class StorageRateLimiter:
+    """GCRA rate limiter whose state lives in a RateLimitStorage."""
+
+    def __init__(self, storage, max_requests=60, window_seconds=60):
+        """
+        Args:
+            storage: RateLimitStorage backend
+            max_requests: Maximum requests allowed in time window
+            window_seconds: Time window in seconds
+        """
+        self.storage = storage
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+
+    def check(self, key, cost=1):
+        """
+        Record a request for key if it is allowed.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Requests this call counts as (e.g. items in a batch)
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
+        return self.storage.gcra(key, self.max_requests, self.window_seconds, cost)
+
+    def is_allowed(self, key):
+        """Check and record a request for key; return True if allowed."""
+        return self.check(key).allowed
+
+    def get_remaining(self, key):
+        """Get remaining requests for key without recording one."""
+        return self.storage.gcra(key, self.max_requests, self.window_seconds, cost=0).remaining
+
+    def get_reset_time(self, key):
+        """Get seconds until the key's quota is fully available again."""
+        return int(self.storage.gcra(key, self.max_requests, self.window_seconds, cost=0).reset_after)
+
+    def stats(self):
+        """Gauges of the storage backend."""
+        return self.storage.stats()
@@ -1,31 +1,145 @@
 """
 Simple in-memory rate limiter for Flask API.
-For production, use Redis-backed rate limiting.
+For production with several nodes, use Redis-backed rate limiting.
+
+The algorithm is chosen with RATE_LIMIT_ALGORITHM: "sliding-log" (default,
+exact, one timestamp per request), "sliding-window" (two counters per key)
+or "gcra" (one timestamp per key). At most RATE_LIMIT_MAX_KEYS clients are
+tracked; idle clients are forgotten and the least recently seen client is
+evicted when the table is full.
+
+Limits are named policies (register_policy). Each route checks one or more
+of them in a single call, and a request may cost several units (e.g. the
+items of a batch). Each policy's limiter is split into RATE_LIMIT_SHARDS
+independently locked shards so it is safe under threaded servers. Setting
+RATE_LIMIT_SHM_PATH shares GCRA limits across worker processes instead (see
+shm_rate_limiter), and RATE_LIMIT_REDIS_URL across nodes (see
+rate_limit_storage).
+
+The busiest and most rejected clients of this process are kept in a
+fixed-size heavy-hitter sketch of RATE_LIMIT_TOP_K clients per shard (0
+disables it).
 """
 
+import math
+import os
+import threading
 import time
 from functools import wraps
+from typing import NamedTuple
 from flask import request, jsonify
-from collections import defaultdict, deque
+from collections import OrderedDict, deque
+from itertools import repeat
+from heavy_hitters import HeavyHitters
+from server_timing import add_phase
 
 
-class RateLimiter:
+class RateLimitDecision(NamedTuple):
     """
-    Token bucket rate limiter implementation.
-    Tracks requests per IP address.
+    Outcome of one rate limit check.
+
+    Attributes:
+        allowed: Whether the request may proceed
+        limit: Maximum requests per window
+        remaining: Requests still allowed right now, after this one
+        reset_after: Seconds until the key's full quota is available again
+        retry_after: Seconds until the next request would be allowed
+            (0 when allowed)
     """
 
-    def __init__(self, max_requests=60, window_seconds=60):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+    retry_after: float
+
+
+class KeyStore(OrderedDict):
+    """
+    Capacity-bounded map from client key to rate limit state.
+
+    Entries are kept in least-recently-used order: limiters read with get()
+    and mark a key used with move_to_end(), both plain OrderedDict calls.
+    Only inserting a key grows the table, so only insert() pays for upkeep:
+    it looks at a few entries at the least recently used end and drops
+    those whose state has gone idle, so stale keys are swept incrementally
+    without ever scanning the table. If the table is still over capacity,
+    the least recently used key is evicted.
+    """
+
+    def __init__(self, is_idle, max_keys=100_000, sweep_batch=2):
+        """
+        Args:
+            is_idle: Callable (state, now) -> bool; idle state carries no
+                information and can be dropped
+            max_keys: Maximum number of keys kept
+            sweep_batch: Idle candidates examined per inserted key; more
+                than one drains idle keys faster than new ones arrive
         """
-        Initialize rate limiter.
+        super().__init__()
+        self.is_idle = is_idle
+        self.max_keys = max_keys
+        self.sweep_batch = sweep_batch
+        self.idle_evictions = 0
+        self.capacity_evictions = 0
+
+    def insert(self, key, state, now):
+        """Add a new key as most recently used, sweeping idle keys."""
+        self[key] = state
+
+        sweeps = self.sweep_batch
+        while sweeps:
+            oldest = next(iter(self))
+            if oldest == key or not self.is_idle(self[oldest], now):
+                break
+            del self[oldest]
+            self.idle_evictions += 1
+            sweeps -= 1
+
+        if len(self) > self.max_keys:
+            self.popitem(last=False)
+            self.capacity_evictions += 1
+
+    def put(self, key, state, now):
+        """Store a key's state as most recently used."""
+        if key in self:
+            self[key] = state
+            self.move_to_end(key)
+        else:
+            self.insert(key, state, now)
+
+    def stats(self):
+        """
+        Returns:
+            dict: live_keys gauge and eviction counters
+        """
+        return {
+            "live_keys": len(self),
+            "evictions": self.idle_evictions + self.capacity_evictions,
+            "idle_evictions": self.idle_evictions,
+            "capacity_evictions": self.capacity_evictions,
+        }
+
 
+class BaseRateLimiter:
+    """Shared setup for the rate limiting algorithms."""
+
+    def __init__(self, max_requests=60, window_seconds=60, max_keys=100_000):
+        """
         Args:
             max_requests: Maximum requests allowed in time window
             window_seconds: Time window in seconds
+            max_keys: Maximum number of client keys tracked at once
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = defaultdict(deque)
+        self.store = KeyStore(self._is_idle, max_keys)
+
+    def _is_idle(self, state, now):
+        raise NotImplementedError
+
+    def check(self, key, cost=1):
+        raise NotImplementedError
 
     def is_allowed(self, key):
         """
@@ -37,19 +151,70 @@ class RateLimiter:
         Returns:
             bool: True if request is allowed, False otherwise
         """
+        return self.check(key).allowed
+
+    def stats(self):
+        """Live key and eviction gauges of the key store."""
+        return self.store.stats()
+
+
+class RateLimiter(BaseRateLimiter):
+    """
+    Sliding log rate limiter.
+    Tracks request timestamps per IP address.
+    """
+
+    def _is_idle(self, timestamps, now):
+        return not timestamps or timestamps[-1] < now - self.window_seconds
+
+    def check(self, key, cost=1):
+        """
+        Record a request for key if it is allowed.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Requests this call counts as (e.g. items in a batch)
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
         now = time.time()
+        timestamps = self.store.get(key)
+        if timestamps is None:
+            timestamps = deque()
+            self.store.insert(key, timestamps, now)
+        else:
+            self.store.move_to_end(key)
         cutoff = now - self.window_seconds
 
         # Remove old requests outside the window
-        while self.requests[key] and self.requests[key][0] < cutoff:
-            self.requests[key].popleft()
-
-        # Check if under limit
-        if len(self.requests[key]) < self.max_requests:
-            self.requests[key].append(now)
-            return True
-
-        return False
+        while timestamps and timestamps[0] < cutoff:
+            timestamps.popleft()
+
+        excess = len(timestamps) + cost - self.max_requests
+        allowed = excess <= 0
+        if allowed:
+            if cost == 1:
+                timestamps.append(now)
+            else:
+                timestamps.extend(repeat(now, cost))
+
+        reset_after = max(0.0, timestamps[0] + self.window_seconds - now) if timestamps else 0.0
+        if allowed:
+            retry_after = 0.0
+        elif excess <= len(timestamps):
+            # Wait for enough of the oldest requests to leave the window
+            retry_after = max(0.0, timestamps[excess - 1] + self.window_seconds - now)
+        else:
+            # Costs more than the whole limit; never fits
+            retry_after = float(self.window_seconds)
+        return RateLimitDecision(
+            allowed,
+            self.max_requests,
+            max(0, self.max_requests - len(timestamps)),
+            reset_after,
+            retry_after,
+        )
 
     def get_remaining(self, key):
         """
@@ -61,14 +226,17 @@ class RateLimiter:
         Returns:
             int: Number of remaining requests
         """
-        now = time.time()
-        cutoff = now - self.window_seconds
+        timestamps = self.store.get(key)
+        if not timestamps:
+            return self.max_requests
+
+        cutoff = time.time() - self.window_seconds
 
         # Clean up old requests
-        while self.requests[key] and self.requests[key][0] < cutoff:
-            self.requests[key].popleft()
+        while timestamps and timestamps[0] < cutoff:
+            timestamps.popleft()
 
-        return max(0, self.max_requests - len(self.requests[key]))
+        return max(0, self.max_requests - len(timestamps))
 
     def get_reset_time(self, key):
         """
@@ -80,27 +248,498 @@ class RateLimiter:
         Returns:
             int: Seconds until limit resets
         """
-        if not self.requests[key]:
+        timestamps = self.store.get(key)
+        if not timestamps:
             return 0
 
-        oldest_request = self.requests[key][0]
+        oldest_request = timestamps[0]
         reset_time = oldest_request + self.window_seconds
         return max(0, int(reset_time - time.time()))
 
 
-# Global rate limiter instance
-_rate_limiter = None
+class SlidingWindowRateLimiter(BaseRateLimiter):
+    """
+    Sliding window counter rate limiter.
+
+    Keeps two counters per key, for the current and the previous fixed
+    window, and weights the previous one by how much of it still overlaps
+    the sliding window. State per key is constant regardless of the limit.
+    """
+
+    # State per key: [current window start, previous window count, current window count]
+
+    def _is_idle(self, state, now):
+        # Both counters have aged out two windows after the current one began
+        return state[0] + 2 * self.window_seconds <= now
+
+    def _estimate(self, state, now):
+        """Roll a key's windows forward to now; return the weighted count."""
+        window = self.window_seconds
+        start = now - now % window
+        if state[0] != start:
+            # The current window becomes the previous one if it just ended
+            state[1] = state[2] if start - state[0] == window else 0
+            state[0] = start
+            state[2] = 0
+        weight = 1.0 - (now - start) / window
+        return state[1] * weight + state[2]
+
+    def check(self, key, cost=1):
+        """
+        Record a request for key if it is allowed.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Requests this call counts as (e.g. items in a batch)
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
+        now = time.time()
+        state = self.store.get(key)
+        if state is None:
+            state = [now - now % self.window_seconds, 0, 0]
+            self.store.insert(key, state, now)
+        else:
+            self.store.move_to_end(key)
+        count = self._estimate(state, now)
+        allowed = count + cost <= self.max_requests
+        if allowed:
+            state[2] += cost
+            count += cost
+
+        # The weighted count falls to the current window's count by the end of
+        # the window and to zero one window later
+        into_window = now - state[0]
+        reset_after = (2 * self.window_seconds - into_window) if state[2] else (self.window_seconds - into_window)
+        retry_after = 0.0 if allowed else self._retry_after(state, count, into_window, cost)
+        return RateLimitDecision(
+            allowed,
+            self.max_requests,
+            max(0, int(self.max_requests - count)),
+            reset_after if count else 0.0,
+            retry_after,
+        )
+
+    def _retry_after(self, state, count, into_window, cost):
+        """Seconds until the weighted count leaves room for cost more requests."""
+        window = self.window_seconds
+        if cost > self.max_requests:
+            # Costs more than the whole limit; never fits
+            return float(window)
+        excess = count + cost - self.max_requests
+        # The previous window's share decays linearly over the current window
+        if state[1] and excess <= state[1] * (1.0 - into_window / window):
+            return excess / state[1] * window
+        # Otherwise wait for the current window to become the decaying one
+        excess = state[2] + cost - self.max_requests
+        return (window - into_window) + (excess / state[2] * window if excess > 0 else 0.0)
+
+    def get_remaining(self, key):
+        """Get remaining requests for key without recording one."""
+        state = self.store.get(key)
+        if state is None:
+            return self.max_requests
+        count = self._estimate(state, time.time())
+        return max(0, int(self.max_requests - count))
+
+    def get_reset_time(self, key):
+        """Get seconds until the key's quota is fully available again."""
+        state = self.store.get(key)
+        if state is None:
+            return 0
+        into_window = time.time() - state[0]
+        return max(0, int(2 * self.window_seconds - into_window))
+
+
+# Seconds of slack in GCRA comparisons
+_GCRA_TOLERANCE = 1e-6
+
+
+def gcra_step(tat, now, interval, window_seconds, max_requests, cost=1):
+    """
+    Apply one GCRA check to a key's stored theoretical arrival time (TAT).
+
+    Args:
+        tat: Stored TAT, or None for a key never seen
+        now: Current time in seconds
+        interval: Seconds one request adds to the TAT (window / limit)
+        window_seconds: Burst window; a request is allowed while the new
+            TAT is at most this far ahead of now
+        max_requests: Limit reported in the decision
+        cost: Requests this check counts as; 0 only inspects
+
+    Returns:
+        tuple: (RateLimitDecision, TAT to store)
+    """
+    if tat is None or tat < now:
+        tat = now
+    new_tat = tat + interval * cost
+    allow_at = new_tat - window_seconds
+
+    # Tolerate float drift from summing intervals so a full burst fits
+    if allow_at - now > _GCRA_TOLERANCE:
+        return RateLimitDecision(False, max_requests, 0, tat - now, allow_at - now), tat
+
+    remaining = int((now - allow_at) / interval + _GCRA_TOLERANCE)
+    return RateLimitDecision(True, max_requests, min(remaining, max_requests), new_tat - now, 0.0), new_tat
+
+
+class GCRARateLimiter(BaseRateLimiter):
+    """
+    Generic cell rate algorithm (GCRA) rate limiter.
+
+    Stores one float per key, the theoretical arrival time (TAT) of the next
+    request. Requests are spaced window_seconds / max_requests apart, with a
+    burst of up to max_requests allowed when the key has been idle.
+    """
+
+    def __init__(self, max_requests=60, window_seconds=60, max_keys=100_000):
+        super().__init__(max_requests, window_seconds, max_keys)
+        self.interval = window_seconds / max_requests
+
+    def _is_idle(self, tat, now):
+        # A TAT in the past behaves exactly like a key never seen
+        return tat <= now
+
+    def check(self, key, cost=1):
+        """
+        Record a request for key if it is allowed.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Requests this call counts as (e.g. items in a batch)
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
+        now = time.time()
+        store = self.store
+        tat = store.get(key)
+        decision, new_tat = gcra_step(tat, now, self.interval, self.window_seconds, self.max_requests, cost)
+        if tat is None:
+            store.insert(key, new_tat, now)
+        else:
+            # Stored on denial too, so a denied client is the last evicted
+            store[key] = new_tat
+            store.move_to_end(key)
+        return decision
+
+    def get_remaining(self, key):
+        """Get remaining requests for key without recording one."""
+        decision, _ = gcra_step(
+            self.store.get(key), time.time(), self.interval, self.window_seconds, self.max_requests, cost=0
+        )
+        return decision.remaining
+
+    def get_reset_time(self, key):
+        """Get seconds until the key's quota is fully available again."""
+        tat = self.store.get(key)
+        if tat is None:
+            return 0
+        return max(0, int(tat - time.time()))
+
+
+# Rate limiting algorithms selectable with RATE_LIMIT_ALGORITHM
+RATE_LIMIT_ALGORITHMS = {
+    "sliding-log": RateLimiter,
+    "sliding-window": SlidingWindowRateLimiter,
+    "gcra": GCRARateLimiter,
+}
+
+
+def create_rate_limiter(max_requests=60, window_seconds=60, algorithm=None, max_keys=None):
+    """
+    Create a rate limiter for the given algorithm.
+
+    Args:
+        max_requests: Maximum requests per window
+        window_seconds: Time window in seconds
+        algorithm: One of RATE_LIMIT_ALGORITHMS; defaults to the
+            RATE_LIMIT_ALGORITHM environment variable, then "sliding-log"
+        max_keys: Maximum client keys tracked; defaults to the
+            RATE_LIMIT_MAX_KEYS environment variable, then 100000
+
+    Returns:
+        Rate limiter instance
+    """
+    algorithm = algorithm or os.getenv("RATE_LIMIT_ALGORITHM", "sliding-log")
+    max_keys = max_keys or int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+    try:
+        limiter_class = RATE_LIMIT_ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError(
+            f"Unknown rate limit algorithm: {algorithm}. "
+            f"Must be one of: {', '.join(RATE_LIMIT_ALGORITHMS)}"
+        )
+    return limiter_class(max_requests, window_seconds, max_keys)
+
+
+class ShardedRateLimiter:
+    """
+    Thread-safe rate limiter made of independently locked shards.
+
+    Each key always hashes to the same shard, so its limit is enforced
+    exactly by that shard's limiter, while requests for keys on other
+    shards never wait on its lock.
+    """
+
+    def __init__(self, max_requests=60, window_seconds=60, algorithm=None, shards=16, max_keys=None):
+        """
+        Args:
+            max_requests: Maximum requests allowed in time window
+            window_seconds: Time window in seconds
+            algorithm: One of RATE_LIMIT_ALGORITHMS (see create_rate_limiter)
+            shards: Number of shards, each with its own lock
+            max_keys: Maximum client keys tracked across all shards
+        """
+        max_keys = max_keys or int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.shards = [
+            (threading.Lock(), create_rate_limiter(max_requests, window_seconds, algorithm, max(1, max_keys // shards)))
+            for _ in range(shards)
+        ]
+
+    def _shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def check(self, key, cost=1):
+        """
+        Record a request for key if it is allowed.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Requests this call counts as (e.g. items in a batch)
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
+        lock, limiter = self._shard(key)
+        with lock:
+            return limiter.check(key, cost)
+
+    def is_allowed(self, key):
+        """Check and record a request for key; return True if allowed."""
+        return self.check(key).allowed
+
+    def get_remaining(self, key):
+        """Get remaining requests for key without recording one."""
+        lock, limiter = self._shard(key)
+        with lock:
+            return limiter.get_remaining(key)
+
+    def get_reset_time(self, key):
+        """Get seconds until the key's quota is fully available again."""
+        lock, limiter = self._shard(key)
+        with lock:
+            return limiter.get_reset_time(key)
+
+    def stats(self):
+        """Key store gauges summed over all shards."""
+        totals = {}
+        for lock, limiter in self.shards:
+            with lock:
+                shard_stats = limiter.stats()
+            for name, value in shard_stats.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+
+class RateLimitPolicy(NamedTuple):
+    """
+    A named limit on one kind of client key.
+
+    Attributes:
+        name: Registry name, also used to namespace the policy's keys
+        max_requests: Maximum requests (or cost units) per window
+        window_seconds: Time window in seconds
+        key: Name in RATE_LIMIT_KEYS of the function that identifies the
+            client, e.g. "ip" or "api_key"
+    """
+
+    name: str
+    max_requests: int
+    window_seconds: float = 60
+    key: str = "ip"
+
+
+def client_ip():
+    """Client IP address of the current request, honoring X-Forwarded-For."""
+    client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
+    if client_ip:
+        # Handle multiple IPs in X-Forwarded-For
+        client_ip = client_ip.split(",")[0].strip()
+    # Clients without an address share one bucket rather than going unlimited
+    return client_ip or "unknown"
+
+
+def api_key():
+    """API key of the current request, or None so that key policies do not apply."""
+    return request.headers.get("X-API-Key") or None
+
+
+# Functions identifying the client a policy counts against
+RATE_LIMIT_KEYS = {
+    "ip": client_ip,
+    "api_key": api_key,
+}
+
+# Registered policies and their limiters, created on first use
+_policies = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+# Busiest and most rejected clients by IP, or None when disabled
+_top_k = int(os.getenv("RATE_LIMIT_TOP_K", 100))
+heavy_hitters = HeavyHitters(_top_k, int(os.getenv("RATE_LIMIT_SHARDS", 16))) if _top_k > 0 else None
+
+
+def register_policy(name, max_requests, window_seconds=60, key="ip"):
+    """
+    Register (or replace) a named rate limit policy.
+
+    Args:
+        name: Policy name
+        max_requests: Maximum requests (or cost units) per window
+        window_seconds: Time window in seconds
+        key: Client key kind, one of RATE_LIMIT_KEYS
+
+    Returns:
+        RateLimitPolicy: The registered policy
+    """
+    if key not in RATE_LIMIT_KEYS:
+        raise ValueError(f"Unknown rate limit key: {key}. Must be one of: {', '.join(RATE_LIMIT_KEYS)}")
+    policy = RateLimitPolicy(name, max_requests, window_seconds, key)
+    with _registry_lock:
+        _policies[name] = policy
+        _limiters.pop(name, None)
+    return policy
+
 
+def get_policy(name):
+    """
+    Look up a registered policy.
 
-def get_rate_limiter(max_requests=60, window_seconds=60):
-    """Get or create rate limiter instance."""
-    global _rate_limiter
-    if _rate_limiter is None:
-        _rate_limiter = RateLimiter(max_requests, window_seconds)
-    return _rate_limiter
+    Raises:
+        KeyError: If no policy is registered under name
+    """
+    try:
+        return _policies[name]
+    except KeyError:
+        raise KeyError(f"Unknown rate limit policy: {name}")
 
 
-def rate_limit(max_requests=60, window_seconds=60):
+def create_policy_limiter(policy):
+    """
+    Create the shared limiter for a policy on the configured backend.
+
+    RATE_LIMIT_REDIS_URL shares it across nodes, RATE_LIMIT_SHM_PATH across
+    the worker processes of a host; otherwise it is an in-process, sharded
+    limiter using RATE_LIMIT_ALGORITHM.
+
+    Args:
+        policy: RateLimitPolicy
+
+    Returns:
+        Thread-safe rate limiter for the policy
+    """
+    redis_url = os.getenv("RATE_LIMIT_REDIS_URL")
+    shm_path = os.getenv("RATE_LIMIT_SHM_PATH")
+    max_keys = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+
+    if redis_url:
+        # Shared by every process and node using the same Redis
+        from rate_limit_storage import RedisStorage, StorageRateLimiter
+
+        storage = RedisStorage.from_url(redis_url, prefix=f"ratelimit:{policy.name}:")
+        return StorageRateLimiter(storage, policy.max_requests, policy.window_seconds)
+
+    if shm_path:
+        # Shared by every worker process on the host, one table per policy
+        from shm_rate_limiter import SharedMemoryRateLimiter
+
+        return SharedMemoryRateLimiter(
+            f"{shm_path}.{policy.name}",
+            policy.max_requests,
+            policy.window_seconds,
+            max_keys,
+        )
+
+    return ShardedRateLimiter(
+        policy.max_requests,
+        policy.window_seconds,
+        shards=int(os.getenv("RATE_LIMIT_SHARDS", 16)),
+        max_keys=max_keys,
+    )
+
+
+def get_rate_limiter(name):
+    """
+    Get or create the limiter of a registered policy.
+
+    Args:
+        name: Policy name
+
+    Returns:
+        Thread-safe rate limiter shared by every route using the policy
+    """
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _registry_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = _limiters[name] = create_policy_limiter(get_policy(name))
+    return limiter
+
+
+def limiter_stats():
+    """
+    Get the stats of every policy limiter created so far.
+
+    Returns:
+        dict: Policy name to the limiter's stats() dict
+    """
+    with _registry_lock:
+        limiters = list(_limiters.items())
+    return {name: limiter.stats() for name, limiter in limiters}
+
+
+def check_policies(names, cost=1):
+    """
+    Check the current request against stacked policies in one call.
+
+    Policies are checked in order and a request must pass all of them.
+    Checking stops at the first policy that denies, so later policies are
+    not charged for a rejected request; earlier ones are, as with stacked
+    limits in proxies, so list the cheapest-to-exhaust policy (e.g. a
+    per-IP burst) first. Policies whose key does not apply to the request
+    (e.g. no API key) are skipped.
+
+    Args:
+        names: Policy names
+        cost: Requests this call counts as (e.g. items in a batch)
+
+    Returns:
+        RateLimitDecision or None: The first denial, or else the allowing
+        decision with the least remaining; None if no policy applied
+    """
+    decision = None
+    for name in names:
+        policy = get_policy(name)
+        key = RATE_LIMIT_KEYS[policy.key]()
+        if key is None:
+            continue
+
+        policy_decision = get_rate_limiter(name).check(key, cost)
+        if not policy_decision.allowed:
+            return policy_decision
+        if decision is None or policy_decision.remaining < decision.remaining:
+            decision = policy_decision
+    return decision
+
+
+def rate_limit(max_requests=60, window_seconds=60, policies=None, cost=None):
     """
     Decorator to rate limit Flask routes.
 
@@ -110,49 +749,59 @@ def rate_limit(max_requests=60, window_seconds=60):
         def my_endpoint():
             return 'Hello'
 
+        @app.route('/batch')
+        @rate_limit(policies=["burst", "api-key-hourly"], cost=count_items)
+        def batch():
+            ...
+
     Args:
-        max_requests: Maximum requests per window
+        max_requests: Maximum requests per window, for a route without
+            policies; the limit is registered as a policy named after
+            the view function, so each route has its own
         window_seconds: Time window in seconds
+        policies: Names of registered policies, checked together
+        cost: Callable returning how many requests the current request
+            counts as; defaults to 1
     """
 
     def decorator(f):
+        names = policies
+        if names is None:
+            names = [register_policy(f.__name__, max_requests, window_seconds).name]
+
         @wraps(f)
         def wrapped(*args, **kwargs):
-            limiter = get_rate_limiter(max_requests, window_seconds)
-
-            # Get client identifier (IP address)
-            client_ip = request.headers.get("X-Forwarded-For", request.remote_addr)
-            if client_ip:
-                # Handle multiple IPs in X-Forwarded-For
-                client_ip = client_ip.split(",")[0].strip()
+            # Check and record the request against every policy in one call
+            started = time.perf_counter()
+            decision = check_policies(names, cost() if cost else 1)
+            add_phase("ratelimit", time.perf_counter() - started)
+            if heavy_hitters is not None:
+                heavy_hitters.record(client_ip(), decision is None or decision.allowed)
 
-            # Check rate limit
-            if not limiter.is_allowed(client_ip):
-                remaining = limiter.get_remaining(client_ip)
-                reset_time = limiter.get_reset_time(client_ip)
+            if decision is not None and not decision.allowed:
+                retry_after = math.ceil(decision.retry_after)
 
                 response = jsonify(
                     {
                         "error": "Rate limit exceeded",
-                        "message": f"Too many requests. Please try again in {reset_time} seconds.",
+                        "message": f"Too many requests. Please try again in {retry_after} seconds.",
                     }
                 )
                 response.status_code = 429
-                response.headers["X-RateLimit-Limit"] = str(max_requests)
-                response.headers["X-RateLimit-Remaining"] = str(remaining)
-                response.headers["X-RateLimit-Reset"] = str(reset_time)
-                response.headers["Retry-After"] = str(reset_time)
+                response.headers["X-RateLimit-Limit"] = str(decision.limit)
+                response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
+                response.headers["X-RateLimit-Reset"] = str(math.ceil(decision.reset_after))
+                response.headers["Retry-After"] = str(retry_after)
 
                 return response
 
             # Request allowed - add rate limit headers
-            remaining = limiter.get_remaining(client_ip)
             response = f(*args, **kwargs)
 
             # Add rate limit headers to response
-            if hasattr(response, "headers"):
-                response.headers["X-RateLimit-Limit"] = str(max_requests)
-                response.headers["X-RateLimit-Remaining"] = str(remaining)
+            if decision is not None and hasattr(response, "headers"):
+                response.headers["X-RateLimit-Limit"] = str(decision.limit)
+                response.headers["X-RateLimit-Remaining"] = str(decision.remaining)
 
             return response
 
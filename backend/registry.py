@@ -3,69 +3,158 @@ Central registry for all prompt adapters.
 Maps model names to their corresponding adapter instances.
 """
 
-from adapters.image import (
-    DalleAdapter,
-    MidjourneyAdapter,
-    StableDiffusionAdapter,
-    ImagenAdapter,
-    FireflyAdapter,
-)
-from adapters.video import (
-    SoraAdapter,
-    RunwayAdapter,
-    PikaAdapter,
-    VeoAdapter,
-    StableVideoDiffusionAdapter,
-)
-from adapters.audio import (
-    OpenAIAudioAdapter,
-    ElevenLabsAdapter,
-    SeamlessM4TAdapter,
-    IndicTTSAdapter,
-    CoquiTTSAdapter,
-)
-from adapters.text import (
-    GPT4Adapter,
-    LlamaAdapter,
-    MistralAdapter,
-    GeminiAdapter,
-    ClaudeAdapter,
-)
+import importlib
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import NamedTuple
 
-# Registry mapping model names to adapter instances
-ADAPTER_REGISTRY = {
+
+class AdapterSpec(NamedTuple):
+    """Where an adapter lives and which modality it serves."""
+
+    modality: str
+    module: str
+    class_name: str
+
+
+# Registry table mapping model names to adapter specs.
+# Adapter modules are imported and instantiated on first use only.
+ADAPTER_SPECS = {
     # Text/LLM models
-    "gpt-4": GPT4Adapter(),
-    "llama-3": LlamaAdapter(),
-    "mistral": MistralAdapter(),
-    "gemini": GeminiAdapter(),
-    "claude": ClaudeAdapter(),
+    "gpt-4": AdapterSpec("text", "adapters.text", "GPT4Adapter"),
+    "llama-3": AdapterSpec("text", "adapters.text", "LlamaAdapter"),
+    "mistral": AdapterSpec("text", "adapters.text", "MistralAdapter"),
+    "gemini": AdapterSpec("text", "adapters.text", "GeminiAdapter"),
+    "claude": AdapterSpec("text", "adapters.text", "ClaudeAdapter"),
     # Image models
-    "dalle": DalleAdapter(),
-    "stable-diffusion": StableDiffusionAdapter(),
-    "midjourney": MidjourneyAdapter(),
-    "imagen": ImagenAdapter(),
-    "firefly": FireflyAdapter(),
+    "dalle": AdapterSpec("image", "adapters.image", "DalleAdapter"),
+    "stable-diffusion": AdapterSpec("image", "adapters.image", "StableDiffusionAdapter"),
+    "midjourney": AdapterSpec("image", "adapters.image", "MidjourneyAdapter"),
+    "imagen": AdapterSpec("image", "adapters.image", "ImagenAdapter"),
+    "firefly": AdapterSpec("image", "adapters.image", "FireflyAdapter"),
     # Video models
-    "sora": SoraAdapter(),
-    "runway": RunwayAdapter(),
-    "pika": PikaAdapter(),
-    "veo": VeoAdapter(),
-    "stable-video-diffusion": StableVideoDiffusionAdapter(),
+    "sora": AdapterSpec("video", "adapters.video", "SoraAdapter"),
+    "runway": AdapterSpec("video", "adapters.video", "RunwayAdapter"),
+    "pika": AdapterSpec("video", "adapters.video", "PikaAdapter"),
+    "veo": AdapterSpec("video", "adapters.video", "VeoAdapter"),
+    "stable-video-diffusion": AdapterSpec("video", "adapters.video", "StableVideoDiffusionAdapter"),
     # Audio models
-    "openai-audio": OpenAIAudioAdapter(),
-    "elevenlabs": ElevenLabsAdapter(),
-    "seamless-m4t": SeamlessM4TAdapter(),
-    "indic-tts": IndicTTSAdapter(),
-    "coqui-tts": CoquiTTSAdapter(),
+    "openai-audio": AdapterSpec("audio", "adapters.audio", "OpenAIAudioAdapter"),
+    "elevenlabs": AdapterSpec("audio", "adapters.audio", "ElevenLabsAdapter"),
+    "seamless-m4t": AdapterSpec("audio", "adapters.audio", "SeamlessM4TAdapter"),
+    "indic-tts": AdapterSpec("audio", "adapters.audio", "IndicTTSAdapter"),
+    "coqui-tts": AdapterSpec("audio", "adapters.audio", "CoquiTTSAdapter"),
+    # Voice synthesis models (VoicePrompt, served under the audio modality)
+    "openai-voice": AdapterSpec("audio", "adapters.voice", "OpenAIVoiceAdapter"),
+    "playht": AdapterSpec("audio", "adapters.voice", "PlayHTAdapter"),
+    "azure-voice": AdapterSpec("audio", "adapters.voice", "AzureVoiceAdapter"),
+    "murfai": AdapterSpec("audio", "adapters.voice", "MurfAIAdapter"),
+    "wellsaid": AdapterSpec("audio", "adapters.voice", "WellSaidAdapter"),
 }
 
 
+class LazyAdapterRegistry(Mapping):
+    """
+    Read-only mapping of model names to adapter instances.
+    Each adapter is imported and created on first lookup, then reused.
+    """
+
+    def __init__(self, specs):
+        """
+        Initialize registry.
+
+        Args:
+            specs: Dict mapping model name to AdapterSpec
+        """
+        self._specs = specs
+        self._adapters = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, model_name):
+        adapter = self._adapters.get(model_name)
+        if adapter is None:
+            spec = self._specs[model_name]
+            with self._lock:
+                adapter = self._adapters.get(model_name)
+                if adapter is None:
+                    adapter_class = getattr(importlib.import_module(spec.module), spec.class_name)
+                    adapter = adapter_class()
+                    self._adapters[model_name] = adapter
+        return adapter
+
+    def __iter__(self):
+        return iter(self._specs)
+
+    def __len__(self):
+        return len(self._specs)
+
+    def __contains__(self, model_name):
+        return model_name in self._specs
+
+    def is_loaded(self, model_name):
+        """Return True if the adapter for model_name has been created."""
+        return model_name in self._adapters
+
+    def load_all(self):
+        """Import and create every adapter, e.g. to warm a long-lived server."""
+        for model_name in self._specs:
+            self[model_name]
+
+
+# Registry mapping model names to adapter instances
+ADAPTER_REGISTRY = LazyAdapterRegistry(ADAPTER_SPECS)
+
+
+def _build_model_index(specs):
+    """
+    Derive frozen lookup tables from the adapter specs.
+
+    Returns:
+        tuple: (model -> modality, modality -> frozenset of models,
+        modality -> tuple of models in registration order)
+    """
+    ordered = {}
+    for model_name, spec in specs.items():
+        ordered.setdefault(spec.modality, []).append(model_name)
+
+    model_modality = MappingProxyType({name: spec.modality for name, spec in specs.items()})
+    modality_models = MappingProxyType(
+        {modality: frozenset(models) for modality, models in ordered.items()}
+    )
+    models_by_modality = MappingProxyType(
+        {modality: tuple(models) for modality, models in ordered.items()}
+    )
+    return model_modality, modality_models, models_by_modality
+
+
+# Precomputed at import for O(1) model and modality lookups
+MODEL_MODALITY, MODALITY_MODELS, MODELS_BY_MODALITY = _build_model_index(ADAPTER_SPECS)
+MODALITIES = tuple(MODELS_BY_MODALITY)
+
+
 def get_available_models_by_modality():
     """Return available models grouped by modality."""
-    return {
-        "text": ["gpt-4", "llama-3", "mistral", "gemini", "claude"],
-        "image": ["dalle", "stable-diffusion", "midjourney", "imagen", "firefly"],
-        "video": ["sora", "runway", "pika", "veo", "stable-video-diffusion"],
-        "audio": ["openai-audio", "elevenlabs", "seamless-m4t", "indic-tts", "coqui-tts"],
-    }
+    return {modality: list(models) for modality, models in MODELS_BY_MODALITY.items()}
+
+
+def get_model_capabilities():
+    """
+    Describe every model from its adapter.
+
+    Imports every adapter, so call it once (e.g. at startup) and keep the
+    result.
+
+    Returns:
+        dict: Model name to {"modality", "target" (the model version the
+        prompt is written for), "description"}
+    """
+    capabilities = {}
+    for model_name, spec in ADAPTER_SPECS.items():
+        adapter = ADAPTER_REGISTRY[model_name]
+        capabilities[model_name] = {
+            "modality": spec.modality,
+            "target": getattr(adapter, "model_name", model_name),
+            "description": (type(adapter).__doc__ or "").strip().split("\n")[0],
+        }
+    return capabilities
@@ -0,0 +1,361 @@
+"""
+Traffic replay harness for captured request JSONL files.
+
+Each line of a capture is one request, either a bare /generate body:
+    {"modality": "image", "model": "dalle", "payload": {...}}
+or an envelope:
+    {"method": "POST", "path": "/generate/batch", "body": {...},
+     "headers": {...}, "timestamp": 1718000000.25}
+
+``timestamp`` (epoch seconds or ISO 8601) drives realtime pacing; lines
+without one are sent back to back. Lines that describe no request are
+counted as skipped.
+
+Requests go to the Flask app in-process or to a running server, from a pool
+of threads or processes, and the run ends with p50/p95/p99 latency,
+throughput and error counts per modality and model.
+
+Usage:
+    python -m backend.replay capture.jsonl --concurrency 8
+    python -m backend.replay capture.jsonl --url http://127.0.0.1:5000 \\
+        --mode processes --concurrency 16 --pace realtime --speed 2
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import NamedTuple, Optional
+from urllib.parse import urlsplit
+
+# Backend modules use flat imports; make them importable as `python -m backend.replay`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class CapturedRequest(NamedTuple):
+    """One request read from a capture file."""
+
+    method: str
+    path: str
+    body: Optional[bytes]
+    headers: dict
+    offset: Optional[float]  # Seconds since the first timestamped request
+    modality: str
+    model: str
+
+
+class Outcome(NamedTuple):
+    """Result of sending one request."""
+
+    modality: str
+    model: str
+    status: int  # 0 when the request failed without a response
+    latency: float  # Seconds
+    error: Optional[str]
+
+
+def _parse_timestamp(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def parse_line(line):
+    """
+    Turn a capture line into a request.
+
+    Returns:
+        tuple: (CapturedRequest or None, absolute timestamp or None)
+    """
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        return None, None
+
+    if "path" in record:
+        body = record.get("body")
+        method = record.get("method") or ("POST" if body is not None else "GET")
+        path = record["path"]
+    elif "modality" in record and "model" in record:
+        body = record
+        method = "POST"
+        path = "/generate"
+    else:
+        return None, None
+
+    info = body if isinstance(body, dict) else {}
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body).encode("utf-8")
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+
+    request = CapturedRequest(
+        method=method.upper(),
+        path=path,
+        body=body,
+        headers=dict(record.get("headers") or {}),
+        offset=None,
+        # Requests without a model (e.g. GET /models) are grouped by route
+        modality=str(info.get("modality") or "-"),
+        model=str(info.get("model") or f"{method.upper()} {path}"),
+    )
+    return request, _parse_timestamp(record.get("timestamp"))
+
+
+def read_capture(path, stats):
+    """
+    Stream requests from a capture file, with offsets relative to the first timestamp.
+
+    Args:
+        path: Capture JSONL file
+        stats: Dict whose "skipped" count is incremented for unusable lines
+
+    Yields:
+        CapturedRequest
+    """
+    first = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                request, timestamp = parse_line(line)
+            except ValueError:
+                request = None
+            if request is None:
+                stats["skipped"] += 1
+                continue
+            if timestamp is not None:
+                if first is None:
+                    first = timestamp
+                request = request._replace(offset=timestamp - first)
+            yield request
+
+
+class InProcessTarget:
+    """Sends requests to the Flask app through its test client."""
+
+    def __init__(self):
+        from app import app
+
+        self.client = app.test_client()
+
+    def send(self, request):
+        headers = dict(request.headers)
+        headers.setdefault("Content-Type", "application/json")
+        response = self.client.open(request.path, method=request.method, data=request.body, headers=headers)
+        return response.status_code
+
+
+class HttpTarget:
+    """Sends requests to a running server over a keep-alive connection."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.prefix = parts.path.rstrip("/")
+        self.connection = connection_class(parts.hostname, parts.port, timeout=30)
+
+    def send(self, request):
+        headers = dict(request.headers)
+        headers.setdefault("Content-Type", "application/json")
+        try:
+            self.connection.request(request.method, self.prefix + request.path, body=request.body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # Drop the broken connection; the next request reconnects
+            self.connection.close()
+            raise
+        return response.status
+
+
+# Target settings for this process, and one target per worker thread
+_target_url = None
+_local = threading.local()
+
+
+def _init_worker(url):
+    global _target_url
+    _target_url = url
+    if url is None:
+        # In-process replay measures the app, not the per-client rate limit
+        os.environ.setdefault("RATE_LIMIT", str(10**9))
+        os.environ.setdefault("RATE_LIMIT_BATCH_ITEMS", str(10**9))
+        import app  # noqa: F401
+
+
+def _ready(_):
+    """No-op task used to start every worker before the clock starts."""
+
+
+def _target():
+    target = getattr(_local, "target", None)
+    if target is None:
+        target = _local.target = HttpTarget(_target_url) if _target_url else InProcessTarget()
+    return target
+
+
+def send_request(request):
+    """Send one request with this worker's target and time it."""
+    target = _target()
+    start = time.perf_counter()
+    try:
+        status = target.send(request)
+    except Exception as e:
+        return Outcome(request.modality, request.model, 0, time.perf_counter() - start, type(e).__name__)
+    latency = time.perf_counter() - start
+    error = f"HTTP {status}" if status >= 400 else None
+    return Outcome(request.modality, request.model, status, latency, error)
+
+
+def replay(requests, url=None, mode="threads", concurrency=4, pace="fast", speed=1.0):
+    """
+    Replay requests and collect their outcomes.
+
+    Args:
+        requests: Iterable of CapturedRequest
+        url: Base URL of a running server; None replays in-process
+        mode: "threads" or "processes"
+        concurrency: Number of workers
+        pace: "fast" sends as soon as a worker is free; "realtime" follows
+            the captured timestamps
+        speed: Realtime speed-up factor (2.0 replays twice as fast)
+
+    Returns:
+        tuple: (list of Outcome, wall time in seconds, max lag behind schedule in seconds)
+    """
+    if mode == "processes":
+        executor = ProcessPoolExecutor(concurrency, initializer=_init_worker, initargs=(url,))
+    else:
+        _init_worker(url)
+        executor = ThreadPoolExecutor(concurrency)
+
+    # Bound in-flight requests so a large capture is never queued in full
+    slots = threading.BoundedSemaphore(concurrency * 2)
+    outcomes = []
+    max_lag = 0.0
+
+    def done(future):
+        outcomes.append(future.result())
+        slots.release()
+
+    with executor:
+        list(executor.map(_ready, range(concurrency)))
+        start = time.perf_counter()
+        for request in requests:
+            if pace == "realtime" and request.offset is not None:
+                due = start + request.offset / speed
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            slots.acquire()
+            executor.submit(send_request, request).add_done_callback(done)
+    wall = time.perf_counter() - start
+    return outcomes, wall, max_lag
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an ascending list, q in [0, 100]."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(outcomes, wall):
+    """
+    Aggregate outcomes overall, per modality and per model.
+
+    Returns:
+        dict: {"overall": {...}, "modalities": {name: {...}}, "models": {name: {...}}}
+    """
+
+    def stats(items):
+        latencies = sorted(item.latency for item in items)
+        errors = defaultdict(int)
+        for item in items:
+            if item.error:
+                errors[item.error] += 1
+        return {
+            "requests": len(items),
+            "errors": sum(errors.values()),
+            "error_breakdown": dict(errors),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "throughput_rps": len(items) / wall if wall else 0.0,
+        }
+
+    modalities = defaultdict(list)
+    models = defaultdict(list)
+    for outcome in outcomes:
+        modalities[outcome.modality].append(outcome)
+        models[outcome.model].append(outcome)
+
+    return {
+        "overall": stats(outcomes),
+        "modalities": {name: stats(items) for name, items in sorted(modalities.items())},
+        "models": {name: stats(items) for name, items in sorted(models.items())},
+    }
+
+
+def print_report(summary, wall, max_lag, skipped):
+    overall = summary["overall"]
+    print(
+        f"{overall['requests']} requests in {wall:.2f} s ({overall['throughput_rps']:.1f} req/s), "
+        f"{overall['errors']} errors, {skipped} capture lines skipped"
+    )
+    if max_lag:
+        print(f"Fell behind the capture schedule by up to {max_lag * 1000:.1f} ms")
+
+    for title, groups in (("modality", summary["modalities"]), ("model", summary["models"])):
+        print(f"\n{title:<28} {'reqs':>7} {'errs':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+        for name, stats in list(groups.items()) + [("all", overall)]:
+            print(
+                f"{name:<28} {stats['requests']:>7} {stats['errors']:>6} {stats['p50_ms']:8.2f} "
+                f"{stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f} {stats['throughput_rps']:8.1f}"
+            )
+
+    if overall["error_breakdown"]:
+        print("\nErrors by model:")
+        for name, stats in summary["models"].items():
+            for error, count in sorted(stats["error_breakdown"].items()):
+                print(f"  {name:<26} {error:<24} {count:>6}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.replay", description="Replay captured requests")
+    parser.add_argument("capture", help="Capture JSONL file")
+    parser.add_argument("--url", default=None, help="Base URL of a running server (default: in-process app)")
+    parser.add_argument("--mode", choices=("threads", "processes"), default="threads", help="Worker type")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Concurrent workers")
+    parser.add_argument("--pace", choices=("fast", "realtime"), default="fast", help="Request pacing")
+    parser.add_argument("--speed", type=float, default=1.0, help="Realtime speed-up factor")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    stats = {"skipped": 0}
+    requests = read_capture(args.capture, stats)
+    outcomes, wall, max_lag = replay(requests, args.url, args.mode, args.concurrency, args.pace, args.speed)
+    summary = summarize(outcomes, wall)
+    print_report(summary, wall, max_lag, stats["skipped"])
+
+    if args.json_path:
+        summary.update(wall_seconds=wall, max_lag_seconds=max_lag, skipped=stats["skipped"])
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Limits on request bodies, applied before and while they are parsed.
+
+Bodies larger than the app's MAX_CONTENT_LENGTH are refused from their
+Content-Length header, before any of the body is read. JSON bodies are
+checked for nesting depth before they are decoded: the decoder recurses
+once per level, so a body of a few thousand brackets would otherwise
+exhaust the interpreter's recursion limit instead of failing validation.
+"""
+
+from flask import Request, request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+# Body size limit (bytes) used when MAX_CONTENT_LENGTH is not configured
+DEFAULT_MAX_CONTENT_LENGTH = 1024 * 1024
+
+# Deepest JSON accepted; a batch item's list field is five levels deep
+MAX_JSON_DEPTH = 8
+
+# translate() arguments keeping only quotes and brackets, with braces turned
+# into square brackets: the decoder checks that brackets pair up, only
+# their depth matters here
+_BRACES_AS_BRACKETS = bytes.maketrans(b"{}", b"[]")
+_NOT_STRUCTURE = bytes(set(range(256)) - set(b'[]{}"'))
+
+
+def json_too_deep(text, max_depth=MAX_JSON_DEPTH):
+    """
+    Whether a JSON document nests arrays and objects more than max_depth deep.
+
+    Escaped characters and strings are removed and everything but brackets
+    dropped, then the innermost empty containers are removed once per
+    level; anything left after max_depth rounds is nested deeper. Each step
+    is a C-level pass over the body, and a body with no more than max_depth
+    brackets in all skips the check.
+
+    Args:
+        text: JSON document as str or bytes
+        max_depth: Deepest nesting allowed
+
+    Returns:
+        bool: True if the document must be refused
+    """
+    if isinstance(text, str):
+        text = text.encode("utf-8", "surrogatepass")
+    if text.count(b"[") + text.count(b"{") <= max_depth:
+        return False
+
+    if b"\\" in text:
+        # Escaped backslashes first, so that every remaining backslash escapes
+        # the character after it; only escaped quotes matter
+        text = text.replace(b"\\\\", b"").replace(b'\\"', b"")
+    # Now every quote delimits a string. Strings without brackets reduce to a
+    # pair of adjacent quotes and go first; the pieces between the remaining
+    # quotes alternate outside and inside strings.
+    structure = text.translate(_BRACES_AS_BRACKETS, _NOT_STRUCTURE).replace(b'""', b"")
+    if b'"' in structure:
+        structure = b"".join(structure.split(b'"')[::2])
+
+    for _ in range(max_depth):
+        if not structure:
+            return False
+        structure = structure.replace(b"[]", b"")
+    return bool(structure)
+
+
+class BoundedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that refuses deeply nested documents before decoding them."""
+
+    max_depth = MAX_JSON_DEPTH
+
+    def loads(self, s, **kwargs):
+        if json_too_deep(s, self.max_depth):
+            # request.get_json turns a ValueError into 400 Bad Request
+            raise ValueError(f"JSON is nested more than {self.max_depth} levels deep")
+        return super().loads(s, **kwargs)
+
+
+class JSONErrorRequest(Request):
+    """Request whose JSON decoding errors say what is wrong with the body."""
+
+    def on_json_loading_failed(self, e):
+        # Flask hides the decoder's message outside debug mode; it only ever
+        # describes the client's own body, e.g. that it is nested too deeply
+        if e is None:
+            return super().on_json_loading_failed(e)
+        raise BadRequest(f"Request body is not valid JSON: {e}")
+
+
+def refuse_oversized_body():
+    """
+    before_request hook raising 413 when Content-Length exceeds the limit.
+
+    Werkzeug enforces MAX_CONTENT_LENGTH too, but only once a view reads the
+    body; checking here refuses the request before rate limiting and
+    routing, and without reading from the client. Bodies sent without a
+    Content-Length are cut off by Werkzeug at the limit as they are read.
+    """
+    max_length = request.max_content_length
+    if max_length is not None and (request.content_length or 0) > max_length:
+        raise RequestEntityTooLarge(f"Request body exceeds maximum size of {max_length} bytes")
@@ -1,8 +1,35 @@
-from dataclasses import dataclass
+import sys
+from dataclasses import MISSING, dataclass, fields
 from typing import List, Optional
 
+# Slotted dataclasses (3.10+) drop the per-instance __dict__; older
+# interpreters fall back to regular dataclasses with the same fields
+_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+# Prompt class -> (all field names, required field names), filled on first use
+_FIELD_SETS = {}
+
+
+def field_sets(cls):
+    """
+    Field names of a prompt class, computed once per class.
+
+    Returns:
+        tuple: (frozenset of all field names, frozenset of required field names)
+    """
+    try:
+        return _FIELD_SETS[cls]
+    except KeyError:
+        pass
+    names = frozenset(f.name for f in fields(cls))
+    required = frozenset(
+        f.name for f in fields(cls) if f.default is MISSING and f.default_factory is MISSING
+    )
+    _FIELD_SETS[cls] = names, required
+    return names, required
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class CanonicalPrompt:
     modality: str
     goal: str
@@ -13,7 +40,7 @@ class CanonicalPrompt:
     quality_level: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class ImagePrompt(CanonicalPrompt):
     environment: Optional[str] = None
     lighting: Optional[str] = None
@@ -22,7 +49,7 @@ class ImagePrompt(CanonicalPrompt):
     aspect_ratio: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class VideoPrompt(CanonicalPrompt):
     scene: str = ""
     action: str = ""
@@ -32,7 +59,7 @@ class VideoPrompt(CanonicalPrompt):
     realism_level: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class VoicePrompt(CanonicalPrompt):
     voice_gender: Optional[str] = None
     age_range: Optional[str] = None
@@ -42,7 +69,7 @@ class VoicePrompt(CanonicalPrompt):
     use_case: Optional[str] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class TextPrompt(CanonicalPrompt):
     task_type: Optional[str] = None  # e.g., "creative writing", "code generation", "analysis"
     tone: Optional[str] = None  # e.g., "formal", "casual", "technical"
@@ -0,0 +1,427 @@
+"""
+Pre-fork production server for the Flask app.
+
+The master process imports the app, creates every adapter and then forks
+the workers, so the code and adapters are shared copy-on-write instead of
+being built in each worker. Workers accept connections on one listening
+socket opened by the master and serve one request at a time; run about one
+worker per core.
+
+Signals to the master:
+    SIGHUP: Graceful reload. The master re-executes itself with the same
+        listening socket, imports the current code, starts new workers and,
+        once they are ready, stops the old ones after their current request.
+        No connection is refused meanwhile.
+    SIGTERM, SIGINT: Graceful shutdown. Workers finish their current
+        request; any still busy after --graceful-timeout are killed.
+
+A worker that exits is replaced, so --max-requests recycles each worker
+after that many requests (plus a random 0 to --max-requests-jitter more,
+so workers do not all restart together), bounding per-process growth.
+
+Readiness: once all workers accept connections, the master writes
+--ready-file if given, as JSON with its pid, the bound address and the
+worker pids, and under systemd (Type=notify) sends READY=1 to
+$NOTIFY_SOCKET. On reload it sends RELOADING=1 first.
+
+Each worker has its own rate limiter tables, compiled prompt cache and
+metrics; set RATE_LIMIT_SHM_PATH to share rate limits between workers.
+
+The master and every worker append to the same LOG_FILE without rotating
+it (LOG_ROTATE_WHEN and LOG_MAX_BYTES are ignored); rotate it externally,
+e.g. with logrotate, and each process reopens it.
+
+Usage:
+    python -m backend.server --bind 0.0.0.0:5000 --workers 4 --max-requests 10000
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+
+# Backend modules use flat imports; make them importable as `python -m backend.server`
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from werkzeug.serving import make_server  # noqa: E402
+
+logger = logging.getLogger("server")
+
+# Set by the master when it re-executes itself on SIGHUP
+LISTEN_FD_ENV = "PROMPT_GENERATOR_LISTEN_FD"
+OLD_WORKERS_ENV = "PROMPT_GENERATOR_OLD_WORKERS"
+
+# Seconds a worker waits for a connection before checking for shutdown
+WORKER_POLL_INTERVAL = 0.5
+
+# Seconds before replacing a worker that died before it became ready
+RESPAWN_BACKOFF = 1.0
+
+
+def parse_bind(bind):
+    """
+    Split a HOST:PORT address.
+
+    Returns:
+        tuple: (host, port)
+    """
+    host, _, port = bind.rpartition(":")
+    return host.strip("[]") or "0.0.0.0", int(port)
+
+
+def open_listener(host, port, backlog):
+    """
+    Open the listening socket, or adopt the one kept across a reload.
+
+    The socket is non-blocking: every worker waits for it to become
+    readable, and all but the one that accepts the connection go back to
+    waiting instead of blocking in accept().
+
+    Returns:
+        socket.socket: Listening socket
+    """
+    inherited = os.environ.pop(LISTEN_FD_ENV, None)
+    if inherited is not None:
+        listener = socket.socket(fileno=int(inherited))
+    else:
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        listener = socket.create_server((host, port), family=family, backlog=backlog)
+    listener.setblocking(False)
+    return listener
+
+
+def notify_systemd(state):
+    """Send a state such as READY=1 to systemd if it started the server with Type=notify."""
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return
+    if address.startswith("@"):
+        address = "\0" + address[1:]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        try:
+            sock.sendto(state.encode(), address)
+        except OSError as e:
+            logger.warning("Could not notify systemd: %s", e)
+
+
+def restart_logging(app_module):
+    """
+    Replace the app's log listener with one that never rotates LOG_FILE,
+    which other processes of this server append to as well.
+    """
+    from logging_config import setup_logging
+
+    listener = app_module.log_listener
+    # In a worker the inherited listener thread does not exist, so only
+    # close its handlers; stopping it would wait on that thread forever
+    if listener._thread is not None and listener._thread.is_alive():
+        listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    app_module.log_listener = setup_logging(rotate=False)
+    # The app writes its own access log
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+
+def warm_up():
+    """
+    Import the app and build everything workers would otherwise each build.
+
+    Returns:
+        module: The imported app module
+    """
+    import app as app_module
+    from registry import ADAPTER_REGISTRY
+
+    restart_logging(app_module)
+    ADAPTER_REGISTRY.load_all()
+    # Route matching is compiled on first use
+    app_module.app.url_map.bind("localhost").match("/health")
+    # Leave what exists now out of garbage collection, which would otherwise
+    # write to (and so copy) every page holding these objects in each worker
+    gc.collect()
+    gc.freeze()
+    return app_module
+
+
+class Worker:
+    """One forked worker process, run by run()."""
+
+    def __init__(self, app_module, listener, max_requests, ready_fd):
+        """
+        Args:
+            app_module: Warmed-up app module
+            listener: Listening socket shared with the other workers
+            max_requests: Requests served before exiting; 0 for no limit
+            ready_fd: Pipe to the master, written once the worker accepts connections
+        """
+        self.app_module = app_module
+        self.listener = listener
+        self.max_requests = max_requests
+        self.ready_fd = ready_fd
+        self.master_pid = os.getppid()
+        self.handled = 0
+        self.stopping = False
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+
+    def _app(self, environ, start_response):
+        self.handled += 1
+        return self.app_module.app(environ, start_response)
+
+    def run(self):
+        """
+        Serve requests until told to stop, the request limit is reached or
+        the master goes away.
+
+        Returns:
+            int: Exit status
+        """
+        signal.signal(signal.SIGTERM, self._stop)
+        # Ctrl+C reaches the whole process group; the master coordinates
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        restart_logging(self.app_module)
+
+        host, port = self.listener.getsockname()[:2]
+        server = make_server(host, port, self._app, fd=self.listener.fileno())
+        server.timeout = WORKER_POLL_INTERVAL
+        os.write(self.ready_fd, b"%d\n" % os.getpid())
+        os.close(self.ready_fd)
+
+        try:
+            while not self.stopping and os.getppid() == self.master_pid:
+                server.handle_request()
+                if self.max_requests and self.handled >= self.max_requests:
+                    logger.info("Worker %d served %d requests, recycling", os.getpid(), self.handled)
+                    break
+        finally:
+            server.server_close()
+            self.app_module.log_listener.stop()
+        return 0
+
+
+class PreforkServer:
+    """Master process: forks, watches and replaces workers."""
+
+    def __init__(self, app_module, listener, workers, max_requests=0, max_requests_jitter=0,
+                 graceful_timeout=30.0, ready_file=None):
+        """
+        Args:
+            app_module: Warmed-up app module
+            listener: Listening socket from open_listener
+            workers: Number of worker processes
+            max_requests: Requests before a worker is replaced; 0 for no limit
+            max_requests_jitter: Random extra requests added per worker
+            graceful_timeout: Seconds workers get to finish on shutdown or reload
+            ready_file: Path written once all workers are ready
+        """
+        self.app_module = app_module
+        self.listener = listener
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.ready_file = ready_file
+
+        self.workers = {}  # pid -> True once the worker reported ready
+        old_workers = os.environ.pop(OLD_WORKERS_ENV, "")
+        # Workers of the master this process replaced by re-executing itself
+        self.retiring = {int(pid) for pid in old_workers.split(",") if pid}
+        self.ready = False
+        self.signals = []
+        self.spawn_after = 0.0
+
+        self.ready_r, self.ready_w = os.pipe()
+        self.wakeup_r, self.wakeup_w = os.pipe()
+        for fd in (self.ready_r, self.wakeup_r, self.wakeup_w):
+            os.set_blocking(fd, False)
+
+    def _on_signal(self, signum, frame):
+        self.signals.append(signum)
+
+    def spawn_worker(self):
+        """Fork a worker process."""
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = False
+            return pid
+
+        # Worker process: leave the master's signal plumbing behind
+        status = 1
+        try:
+            signal.set_wakeup_fd(-1)
+            for fd in (self.ready_r, self.wakeup_r, self.wakeup_w):
+                os.close(fd)
+            status = Worker(self.app_module, self.listener, max_requests, self.ready_w).run()
+        except Exception:
+            logger.exception("Worker %d failed", os.getpid())
+        finally:
+            os._exit(status)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+                continue
+            was_ready = self.workers.pop(pid, None)
+            if was_ready is False:
+                logger.error("Worker %d exited before becoming ready (status %d)", pid, status)
+                self.spawn_after = time.monotonic() + RESPAWN_BACKOFF
+
+    def _read_ready(self):
+        try:
+            data = os.read(self.ready_r, 65536)
+        except BlockingIOError:
+            return
+        for line in data.split():
+            pid = int(line)
+            if pid in self.workers:
+                self.workers[pid] = True
+
+        if not self.ready and len(self.workers) == self.num_workers and all(self.workers.values()):
+            self.ready = True
+            self._stop_workers(self.retiring)
+            if self.ready_file:
+                self._write_ready_file()
+            notify_systemd("READY=1")
+            logger.info("Serving on %s:%s with %d workers", *self.listener.getsockname()[:2], self.num_workers)
+
+    def _write_ready_file(self):
+        host, port = self.listener.getsockname()[:2]
+        state = {"pid": os.getpid(), "address": f"{host}:{port}", "workers": sorted(self.workers)}
+        # Write then rename, so a reader never sees a partial file
+        temporary = f"{self.ready_file}.{os.getpid()}"
+        with open(temporary, "w") as f:
+            json.dump(state, f)
+        os.replace(temporary, self.ready_file)
+
+    def _wait(self, timeout):
+        try:
+            readable, _, _ = select.select([self.ready_r, self.wakeup_r], [], [], timeout)
+        except InterruptedError:
+            return
+        if self.wakeup_r in readable:
+            try:
+                os.read(self.wakeup_r, 65536)
+            except BlockingIOError:
+                pass
+        if self.ready_r in readable:
+            self._read_ready()
+
+    def _stop_workers(self, pids):
+        """Ask workers to finish their current request and exit."""
+        for pid in list(pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def _wait_for_exit(self, pids):
+        deadline = time.monotonic() + self.graceful_timeout
+        while pids and time.monotonic() < deadline:
+            self._reap()
+            pids = [pid for pid in pids if pid in self.workers or pid in self.retiring]
+            time.sleep(0.05)
+        for pid in pids:
+            logger.warning("Worker %d did not stop in %.0f s, killing it", pid, self.graceful_timeout)
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self._reap()
+
+    def reload(self):
+        """Re-execute the master, keeping the listening socket and current workers."""
+        logger.info("Reloading")
+        notify_systemd("RELOADING=1")
+        os.environ[OLD_WORKERS_ENV] = ",".join(str(pid) for pid in [*self.workers, *self.retiring])
+        os.environ[LISTEN_FD_ENV] = str(self.listener.fileno())
+        os.set_inheritable(self.listener.fileno(), True)
+        self.app_module.log_listener.stop()
+        argv = getattr(sys, "orig_argv", None) or [sys.executable, *sys.argv]
+        os.execv(sys.executable, argv)
+
+    def run(self):
+        """
+        Run until SIGTERM or SIGINT, replacing workers as they exit.
+
+        Returns:
+            int: Exit status
+        """
+        signal.set_wakeup_fd(self.wakeup_w)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+
+        while True:
+            while self.signals:
+                signum = self.signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    logger.info("Shutting down")
+                    self._stop_workers([*self.workers, *self.retiring])
+                    self._wait_for_exit([*self.workers, *self.retiring])
+                    return 0
+                if signum == signal.SIGHUP:
+                    self.reload()
+
+            self._reap()
+            if time.monotonic() >= self.spawn_after:
+                while len(self.workers) < self.num_workers:
+                    self.spawn_worker()
+            self._wait(1.0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.server", description="Pre-fork server for the API")
+    parser.add_argument(
+        "-b", "--bind",
+        default=f"{os.getenv('FLASK_HOST', '127.0.0.1')}:{os.getenv('FLASK_PORT', 5000)}",
+        help="HOST:PORT to listen on (default: FLASK_HOST:FLASK_PORT)",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY") or 0) or os.cpu_count(),
+        help="Worker processes (default: WEB_CONCURRENCY or the CPU count)",
+    )
+    parser.add_argument("--max-requests", type=int, default=0, help="Requests before a worker is replaced; 0 disables")
+    parser.add_argument("--max-requests-jitter", type=int, default=0, help="Random extra requests per worker")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0, help="Seconds workers get to finish")
+    parser.add_argument("--backlog", type=int, default=2048, help="Listen queue length")
+    parser.add_argument("--ready-file", help="JSON file written once all workers accept connections")
+    args = parser.parse_args(argv)
+
+    host, port = parse_bind(args.bind)
+    listener = open_listener(host, port, args.backlog)
+    app_module = warm_up()
+    server = PreforkServer(
+        app_module,
+        listener,
+        args.workers,
+        max_requests=args.max_requests,
+        max_requests_jitter=args.max_requests_jitter,
+        graceful_timeout=args.graceful_timeout,
+        ready_file=args.ready_file,
+    )
+    return server.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Per-request phase timings, reported in the Server-Timing response header.
+
+A PhaseTimer is started for each request; code on the request path marks
+phase boundaries or records how long a phase took, and the timings are sent as
+`Server-Timing: ratelimit;dur=0.021, parse;dur=0.015, ..., total;dur=0.4`
+(durations in milliseconds), which browser devtools show for the request.
+"""
+
+from time import perf_counter
+
+from flask import g
+
+
+class PhaseTimer:
+    """Monotonic lap timer collecting (phase, seconds) pairs."""
+
+    __slots__ = ("start", "last", "phases")
+
+    def __init__(self):
+        self.start = self.last = perf_counter()
+        self.phases = []
+
+    def mark(self):
+        """Start the next lap now, leaving the time since the previous one out."""
+        self.last = perf_counter()
+
+    def lap(self, name):
+        """Record the time since the previous lap or mark as phase name."""
+        now = perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def add(self, name, seconds):
+        """Record a phase timed elsewhere."""
+        self.phases.append((name, seconds))
+
+    def elapsed(self):
+        """Seconds since the timer started."""
+        return perf_counter() - self.start
+
+    def header(self):
+        """
+        Build the Server-Timing header value, ending with the total so far.
+
+        Returns:
+            str: Comma-separated metrics with durations in milliseconds
+        """
+        metrics = ["%s;dur=%.3f" % (name, seconds * 1000) for name, seconds in self.phases]
+        metrics.append("total;dur=%.3f" % ((perf_counter() - self.start) * 1000))
+        return ", ".join(metrics)
+
+
+def start_timer():
+    """
+    Start timing the current request.
+
+    Returns:
+        PhaseTimer: The request's timer, also kept as g.timer; hold on to it
+        rather than reading g.timer for every lap, as each g lookup goes
+        through Flask's context proxy
+    """
+    timer = g.timer = PhaseTimer()
+    return timer
+
+
+def add_phase(name, seconds):
+    """Record a phase of the current request timed elsewhere, if it has a timer."""
+    timer = g.get("timer")
+    if timer is not None:
+        timer.add(name, seconds)
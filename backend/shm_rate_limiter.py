@@ -0,0 +1,260 @@
+"""
+Cross-process rate limiter backed by a shared memory-mapped file.
+
+Every worker process on a host maps the same file, so together they
+enforce one limit per client instead of one limit per worker. The file
+holds a fixed-size, open-addressed hash table of GCRA slots; each slot is
+updated under a byte-range lock (fcntl.lockf) on just that slot, so
+workers only wait on each other when they touch the same client. A key
+lives within a short window of slots from its hash, so finding it, or
+finding that it is absent, reads at most that many slots however full
+the table is.
+
+Enable it by setting RATE_LIMIT_SHM_PATH, preferably to a path on a tmpfs
+such as /dev/shm; each rate limit policy gets its own file at that path
+plus ".<policy name>". Requires a POSIX system.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from rate_limiter import gcra_step
+
+# File header: magic (including the layout version) and slot count
+_MAGIC = b"PGRLSHM1"
+_HEADER = struct.Struct("<8sQ")
+_HEADER_SIZE = 64
+
+# Slot: 64-bit key hash (0 marks an empty slot) and the key's GCRA TAT
+_SLOT = struct.Struct("<Qd")
+_SLOT_SIZE = _SLOT.size
+
+# Slots a key may occupy, starting at its hash; a new key evicts the
+# window's least active client when none of them is free
+_PROBE_LENGTH = 32
+
+# In-process locks striped over slots; fcntl locks do not exclude threads
+# of the same process
+_THREAD_LOCK_STRIPES = 64
+
+
+def key_hash(key):
+    """
+    Hash a client key to a nonzero 64-bit integer, identically in every process.
+
+    Args:
+        key: Client identifier
+
+    Returns:
+        int: Hash in 1..2**64-1
+    """
+    digest = hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class SharedMemoryRateLimiter:
+    """
+    GCRA rate limiter whose state is shared by all processes mapping a file.
+
+    Slots are claimed by linear probing within a window of _PROBE_LENGTH
+    slots and never emptied. A new key takes the window's first empty slot
+    or a slot whose TAT is in the past (an idle client); in a window of
+    active clients it evicts the one with the lowest TAT, the closest to
+    idle, who then starts over with a full quota. Claiming a slot takes a
+    file-wide insert lock so two processes cannot claim slots for the same
+    key at once; requests from clients that already have a slot only lock
+    their own slot.
+    """
+
+    def __init__(self, path, max_requests=60, window_seconds=60, max_keys=65536):
+        """
+        Args:
+            path: File holding the shared table; created if missing
+            max_requests: Maximum requests allowed in time window
+            window_seconds: Time window in seconds
+            max_keys: Slots in the table when this call creates it
+        """
+        self.path = path
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.interval = window_seconds / max_requests
+        self.idle_evictions = 0
+        self.capacity_evictions = 0
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.capacity = self._initialize(max_keys)
+        self._map = mmap.mmap(self._fd, _HEADER_SIZE + self.capacity * _SLOT_SIZE)
+        self._thread_locks = [threading.Lock() for _ in range(_THREAD_LOCK_STRIPES)]
+        self._insert_thread_lock = threading.Lock()
+
+    def _initialize(self, max_keys):
+        """Write the header if this process is first; return the slot count."""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size:
+                magic, capacity = _HEADER.unpack(header)
+                if magic == _MAGIC:
+                    return capacity
+            os.ftruncate(self._fd, _HEADER_SIZE + max_keys * _SLOT_SIZE)
+            os.pwrite(self._fd, _HEADER.pack(_MAGIC, max_keys), 0)
+            return max_keys
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+    def close(self):
+        """Unmap and close the table file."""
+        self._map.close()
+        os.close(self._fd)
+
+    def _lock_slot(self, index):
+        self._thread_locks[index % _THREAD_LOCK_STRIPES].acquire()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _SLOT_SIZE, _HEADER_SIZE + index * _SLOT_SIZE)
+
+    def _unlock_slot(self, index):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, _SLOT_SIZE, _HEADER_SIZE + index * _SLOT_SIZE)
+        self._thread_locks[index % _THREAD_LOCK_STRIPES].release()
+
+    def _read(self, index):
+        return _SLOT.unpack_from(self._map, _HEADER_SIZE + index * _SLOT_SIZE)
+
+    def _write(self, index, hashed, tat):
+        _SLOT.pack_into(self._map, _HEADER_SIZE + index * _SLOT_SIZE, hashed, tat)
+
+    def _update(self, index, now, cost):
+        """Apply one GCRA check to a locked slot that belongs to the key."""
+        slot_hash, tat = self._read(index)
+        decision, new_tat = gcra_step(tat, now, self.interval, self.window_seconds, self.max_requests, cost)
+        if decision.allowed:
+            self._write(index, slot_hash, new_tat)
+        return decision
+
+    def _probe(self, hashed, now):
+        """
+        Read the key's window of slots without locking them.
+
+        Slot hashes only change under the insert lock, so the result is
+        exact while it is held; otherwise a slot found here is confirmed
+        under its own lock before use.
+
+        Returns:
+            tuple: (index of the key's slot or None, slot a new key would take)
+        """
+        start = hashed % self.capacity
+        reclaimable = least_active = None
+        lowest_tat = float("inf")
+        for step in range(min(_PROBE_LENGTH, self.capacity)):
+            index = (start + step) % self.capacity
+            slot_hash, tat = self._read(index)
+            if slot_hash == hashed:
+                return index, None
+            if slot_hash == 0:
+                # Slots are never emptied, so the key is not further along
+                return None, reclaimable if reclaimable is not None else index
+            if reclaimable is None and tat <= now:
+                reclaimable = index
+            if tat < lowest_tat:
+                least_active, lowest_tat = index, tat
+        return None, reclaimable if reclaimable is not None else least_active
+
+    def check(self, key, cost=1):
+        """
+        Record a request for key if it is allowed.
+
+        Args:
+            key: Identifier for rate limiting (usually IP address)
+            cost: Requests this call counts as (e.g. items in a batch)
+
+        Returns:
+            RateLimitDecision: Decision with remaining quota and reset times
+        """
+        hashed = key_hash(key)
+        now = time.time()
+
+        index, _ = self._probe(hashed, now)
+        if index is not None:
+            self._lock_slot(index)
+            try:
+                # Another process may have evicted the key since the probe
+                if self._read(index)[0] == hashed:
+                    return self._update(index, now, cost)
+            finally:
+                self._unlock_slot(index)
+
+        # New key: claim a slot with no other inserter running, then probe
+        # again in case another process inserted the key meanwhile
+        with self._insert_thread_lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                index, free = self._probe(hashed, now)
+                if index is None:
+                    index = free
+                self._lock_slot(index)
+                try:
+                    slot_hash, tat = self._read(index)
+                    if slot_hash != hashed:
+                        if slot_hash and tat > now:
+                            self.capacity_evictions += 1
+                        elif slot_hash:
+                            self.idle_evictions += 1
+                        self._write(index, hashed, now)
+                    return self._update(index, now, cost)
+                finally:
+                    self._unlock_slot(index)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+
+    def is_allowed(self, key):
+        """Check and record a request for key; return True if allowed."""
+        return self.check(key).allowed
+
+    def _tat(self, key):
+        """Read the key's TAT without creating a slot; None if absent."""
+        hashed = key_hash(key)
+        index, _ = self._probe(hashed, time.time())
+        if index is None:
+            return None
+        self._lock_slot(index)
+        try:
+            slot_hash, tat = self._read(index)
+        finally:
+            self._unlock_slot(index)
+        return tat if slot_hash == hashed else None
+
+    def get_remaining(self, key):
+        """Get remaining requests for key without recording one."""
+        decision, _ = gcra_step(
+            self._tat(key), time.time(), self.interval, self.window_seconds, self.max_requests, cost=0
+        )
+        return decision.remaining
+
+    def get_reset_time(self, key):
+        """Get seconds until the key's quota is fully available again."""
+        tat = self._tat(key)
+        if tat is None:
+            return 0
+        return max(0, int(tat - time.time()))
+
+    def stats(self):
+        """
+        Returns:
+            dict: live_keys across all processes (a full table scan, for
+            metrics only), plus this process's slot reclaims
+        """
+        now = time.time()
+        live = 0
+        for index in range(self.capacity):
+            slot_hash, tat = self._read(index)
+            if slot_hash and tat > now:
+                live += 1
+        return {
+            "live_keys": live,
+            "evictions": self.idle_evictions + self.capacity_evictions,
+            "idle_evictions": self.idle_evictions,
+            "capacity_evictions": self.capacity_evictions,
+        }
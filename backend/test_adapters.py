@@ -3,6 +3,7 @@ Unit tests for prompt adapters.
 """
 
 import pytest
+from compiler import PROMPT_CLASSES, PromptCompiler
 from schema import ImagePrompt, VideoPrompt, VoicePrompt
 from adapters.image import (
     DalleAdapter,
@@ -13,6 +14,14 @@ from adapters.image import (
 )
 from adapters.video import RunwayAdapter, PikaAdapter, SoraAdapter
 from adapters.voice import OpenAIVoiceAdapter, ElevenLabsAdapter
+from registry import (
+    ADAPTER_SPECS,
+    MODALITY_MODELS,
+    MODEL_MODALITY,
+    LazyAdapterRegistry,
+    get_available_models_by_modality,
+    get_model_capabilities,
+)
 
 
 class TestImageAdapters:
@@ -257,5 +266,80 @@ class TestAdapterEdgeCases:
         assert "Negative:" in result
 
 
+class TestPromptSchema:
+    """Tests for the prompt dataclasses."""
+
+    @pytest.mark.parametrize("prompt_class", list(PROMPT_CLASSES.values()))
+    def test_prompts_are_slotted(self, prompt_class):
+        prompt = prompt_class(modality="x", goal="g", subject="s")
+        assert not hasattr(prompt, "__dict__")
+
+    def test_build_prompt_names_bad_fields(self):
+        compiler = PromptCompiler()
+        payload = {"modality": "video", "goal": "g", "subject": "s", "colour": "red", "fps": 24}
+
+        with pytest.raises(TypeError, match="^Unknown fields for video: colour, fps$"):
+            compiler.build_prompt("video", payload)
+        with pytest.raises(TypeError, match="^Missing required fields: goal, subject$"):
+            compiler.build_prompt("audio", {"modality": "audio", "pace": "slow"})
+
+
+class TestLazyRegistry:
+    """Tests for on-demand adapter creation."""
+
+    def test_adapter_created_on_first_use(self):
+        registry = LazyAdapterRegistry(ADAPTER_SPECS)
+
+        assert not registry.is_loaded("dalle")
+        adapter = registry["dalle"]
+
+        assert isinstance(adapter, DalleAdapter)
+        assert registry.is_loaded("dalle")
+        assert not registry.is_loaded("sora")
+        assert registry["dalle"] is adapter
+
+    def test_unknown_model(self):
+        registry = LazyAdapterRegistry(ADAPTER_SPECS)
+
+        assert registry.get("unknown-model") is None
+        assert "unknown-model" not in registry
+
+    def test_load_all(self):
+        registry = LazyAdapterRegistry(ADAPTER_SPECS)
+        registry.load_all()
+
+        assert all(registry.is_loaded(name) for name in ADAPTER_SPECS)
+        assert len(registry) == len(ADAPTER_SPECS)
+
+
+class TestModelIndex:
+    """Tests for the precomputed model/modality index."""
+
+    def test_index_matches_specs(self):
+        for model_name, spec in ADAPTER_SPECS.items():
+            assert MODEL_MODALITY[model_name] == spec.modality
+            assert model_name in MODALITY_MODELS[spec.modality]
+
+    def test_voice_adapters_registered(self):
+        for model_name in ("openai-voice", "playht", "azure-voice", "murfai", "wellsaid"):
+            assert MODEL_MODALITY[model_name] == "audio"
+
+    def test_available_models_follow_index(self):
+        models = get_available_models_by_modality()
+
+        assert set(models) == set(MODALITY_MODELS)
+        for modality, names in models.items():
+            assert frozenset(names) == MODALITY_MODELS[modality]
+
+    def test_capabilities_describe_every_model(self):
+        capabilities = get_model_capabilities()
+
+        assert set(capabilities) == set(ADAPTER_SPECS)
+        assert capabilities["dalle"]["target"] == "dalle-3"
+        assert capabilities["dalle"]["modality"] == "image"
+        assert capabilities["dalle"]["description"].startswith("DALL-E 3 adapter")
+
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -4,7 +4,11 @@ Integration tests for Flask API.
 
 import pytest
 import json
+import app as app_module
+import rate_limiter
 from app import app
+from heavy_hitters import HeavyHitters
+from http_cache import canonical_generate_query
 
 
 @pytest.fixture
@@ -46,6 +50,30 @@ class TestModelsEndpoint:
         assert "openai-voice" in data["models"]["voice"]
 
 
+class TestModelsCaching:
+    """Tests for the precomputed, ETag-validated /models response."""
+
+    def test_etag_and_not_modified(self, client):
+        response = client.get("/models")
+        etag = response.headers["ETag"]
+
+        assert response.status_code == 200
+        assert "max-age" in response.headers["Cache-Control"]
+
+        cached = client.get("/models", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.data == b""
+        assert cached.headers["ETag"] == etag
+
+    def test_includes_capabilities_and_fields(self, client):
+        data = json.loads(client.get("/models").data)
+
+        assert "dalle" in data["models"]["image"]
+        assert data["capabilities"]["dalle"]["target"] == "dalle-3"
+        assert "subject" in data["fields"]["image"]["required"]
+        assert "lighting" in data["fields"]["image"]["optional"]
+
+
 class TestGenerateEndpoint:
     """Tests for the prompt generation endpoint."""
 
@@ -115,6 +143,27 @@ class TestGenerateEndpoint:
         data = json.loads(response.data)
         assert "prompt" in data
 
+    def test_generate_registered_voice_adapter(self, client):
+        payload = {
+            "modality": "audio",
+            "model": "playht",
+            "payload": {
+                "modality": "audio",
+                "goal": "test",
+                "subject": "test",
+                "voice_gender": "female",
+                "emotion": "warm",
+            },
+        }
+
+        response = client.post(
+            "/generate", data=json.dumps(payload), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert "Emotional tone: warm" in data["prompt"]
+
     def test_missing_modality(self, client):
         payload = {
             "model": "dalle-3",
@@ -241,6 +290,387 @@ class TestGenerateEndpoint:
         assert "error" in data
 
 
+class TestGenerateGet:
+    """Tests for the cacheable GET form of /generate."""
+
+    REQUEST = {"modality": "image", "model": "midjourney", "payload": {"modality": "image", "goal": "x", "subject": "y"}}
+
+    def get(self, client, **kwargs):
+        query = canonical_generate_query(**self.REQUEST)
+        return client.get(f"/generate?{query}", **kwargs)
+
+    def test_matches_post(self, client):
+        response = self.get(client)
+        posted = client.post("/generate", data=json.dumps(self.REQUEST), content_type="application/json")
+
+        assert response.status_code == 200
+        assert response.data == posted.data
+        assert "ETag" not in posted.headers
+
+    def test_shared_cache_headers_and_not_modified(self, client):
+        response = self.get(client)
+        etag = response.headers["ETag"]
+        cache_control = response.headers["Cache-Control"]
+
+        assert "s-maxage=" in cache_control
+        assert "stale-while-revalidate=" in cache_control
+
+        cached = self.get(client, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.data == b""
+        assert cached.headers["ETag"] == etag
+
+    def test_no_per_request_headers_on_shared_responses(self, client):
+        response = self.get(client, headers={"X-Request-ID": "req-1"})
+        cached = self.get(client, headers={"If-None-Match": response.headers["ETag"]})
+        posted = client.post("/generate", data=json.dumps(self.REQUEST), content_type="application/json")
+
+        for header in ("X-Request-ID", "Server-Timing", "X-RateLimit-Remaining"):
+            assert header not in response.headers
+            assert header not in cached.headers
+            assert header in posted.headers
+
+    def test_invalid_requests_are_not_cached(self, client):
+        missing = client.get("/generate?modality=image&model=midjourney")
+        assert missing.status_code == 400
+        assert "Cache-Control" not in missing.headers
+
+        malformed = client.get("/generate?modality=image&model=midjourney&payload=%7Bnot-json")
+        assert malformed.status_code == 400
+
+        invalid = client.get("/generate?" + canonical_generate_query("image", "nonexistent", {"goal": "x"}))
+        assert invalid.status_code == 400
+        assert "Cache-Control" not in invalid.headers
+
+
+class TestGenerateBatchEndpoint:
+    """Tests for the batch prompt generation endpoint."""
+
+    def test_batch_results_by_position(self, client):
+        payload = {
+            "items": [
+                {
+                    "modality": "image",
+                    "model": "dalle",
+                    "payload": {"modality": "image", "goal": "test", "subject": "a cat"},
+                },
+                {
+                    "modality": "image",
+                    "model": "invalid-model",
+                    "payload": {"modality": "image", "goal": "test", "subject": "a dog"},
+                },
+                {
+                    "modality": "video",
+                    "model": "sora",
+                    "payload": {
+                        "modality": "video",
+                        "goal": "test",
+                        "subject": "test",
+                        "scene": "city street",
+                    },
+                },
+                {
+                    "modality": "text",
+                    "model": "gpt-4",
+                    "payload": {"modality": "text", "goal": "test", "unknown": "x"},
+                },
+            ]
+        }
+
+        response = client.post(
+            "/generate/batch", data=json.dumps(payload), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["count"] == 4
+        assert data["errors"] == 2
+
+        results = data["results"]
+        assert "cat" in results[0]["prompt"]
+        assert results[0]["model"] == "dalle"
+        assert "error" in results[1]
+        assert "city street" in results[2]["prompt"]
+        assert "invalid payload" in results[3]["error"].lower()
+
+    def test_batch_accepts_bare_list(self, client):
+        payload = [
+            {
+                "modality": "text",
+                "model": "claude",
+                "payload": {"modality": "text", "goal": "summarize", "subject": "a paper"},
+            }
+        ]
+
+        response = client.post(
+            "/generate/batch", data=json.dumps(payload), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert "Goal: summarize" in data["results"][0]["prompt"]
+
+    def test_batch_rejects_empty_items(self, client):
+        response = client.post(
+            "/generate/batch", data=json.dumps({"items": []}), content_type="application/json"
+        )
+
+        assert response.status_code == 400
+        data = json.loads(response.data)
+        assert "error" in data
+
+    def test_batch_rejects_non_object_item(self, client):
+        response = client.post(
+            "/generate/batch", data=json.dumps({"items": ["nope"]}), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["errors"] == 1
+        assert "error" in data["results"][0]
+
+    def test_batch_adapter_failure_fails_only_its_item(self, client):
+        good = {"modality": "text", "model": "gpt-4", "payload": {"modality": "text", "goal": "g", "subject": "a paper"}}
+        bad = {"modality": "text", "model": "gpt-4", "payload": {"modality": "text", "goal": "g", "subject": "s", "constraints": [1]}}
+
+        response = client.post(
+            "/generate/batch", data=json.dumps({"items": [good, bad, good]}), content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["errors"] == 1
+        assert "a paper" in data["results"][0]["prompt"]
+        assert "error" in data["results"][1]
+        assert "a paper" in data["results"][2]["prompt"]
+
+    def test_batch_costs_one_request_per_item(self, client):
+        item = {"modality": "text", "model": "claude", "payload": {"goal": "summarize", "subject": "a paper"}}
+
+        def post(items):
+            return client.post(
+                "/generate/batch", data=json.dumps({"items": items}), content_type="application/json"
+            )
+
+        first = int(post([item]).headers["X-RateLimit-Remaining"])
+        second = int(post([item] * 3).headers["X-RateLimit-Remaining"])
+
+        assert second == first - 3
+
+
+class TestResponseHeaders:
+    """Tests for request id and Server-Timing headers."""
+
+    def post(self, client, **kwargs):
+        return client.post(
+            "/generate",
+            data=json.dumps(
+                {"modality": "image", "model": "midjourney", "payload": {"modality": "image", "goal": "x", "subject": "y"}}
+            ),
+            content_type="application/json",
+            **kwargs,
+        )
+
+    def test_server_timing_lists_phases(self, client):
+        response = self.post(client)
+        assert response.status_code == 200
+
+        metrics = [metric.split(";")[0] for metric in response.headers["Server-Timing"].split(", ")]
+        assert metrics == ["ratelimit", "parse", "prepare", "compile", "serialize", "total"]
+        for metric in response.headers["Server-Timing"].split(", "):
+            assert float(metric.split(";dur=")[1]) >= 0
+
+    def test_request_id(self, client):
+        generated = client.get("/health").headers["X-Request-ID"]
+        assert len(generated) == 16
+        assert client.get("/health").headers["X-Request-ID"] != generated
+
+        assert self.post(client, headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+        assert self.post(client, headers={"X-Request-ID": "bad id\t"}).headers["X-Request-ID"] != "bad id\t"
+
+    def test_headers_exposed_to_frontend(self, client):
+        response = self.post(client, headers={"Origin": "http://localhost:3000"})
+        exposed = response.headers["Access-Control-Expose-Headers"]
+
+        assert "Server-Timing" in exposed
+        assert "X-Request-ID" in exposed
+
+
+class TestAccessLog:
+    """Tests for the structured per-request log record."""
+
+    def test_logs_request_fields(self, client, caplog):
+        caplog.set_level("INFO", logger="access")
+        client.post(
+            "/generate",
+            data=json.dumps(
+                {"modality": "image", "model": "midjourney", "payload": {"modality": "image", "goal": "x", "subject": "y"}}
+            ),
+            content_type="application/json",
+            headers={"X-Request-ID": "req-42"},
+        )
+
+        record = [r for r in caplog.records if r.name == "access"][-1]
+        assert record.request_id == "req-42"
+        assert record.status == 200
+        assert record.model == "midjourney"
+        assert record.modality == "image"
+        assert record.latency_ms >= 0
+
+
+class TestMetricsEndpoint:
+    """Tests for the Prometheus /metrics endpoint."""
+
+    def sample(self, client, line_prefix):
+        text = client.get("/metrics").get_data(as_text=True)
+        values = [line.rsplit(" ", 1)[1] for line in text.splitlines() if line.startswith(line_prefix)]
+        return float(values[0]) if values else 0.0
+
+    def test_prometheus_format(self, client):
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+        text = response.get_data(as_text=True)
+        assert "# TYPE prompt_generator_request_duration_seconds histogram" in text
+        assert "# TYPE prompt_generator_requests_in_flight gauge" in text
+
+    def test_counts_requests_by_model(self, client):
+        prefix = (
+            'prompt_generator_request_duration_seconds_count{endpoint="/generate",'
+            'model="sora",modality="video",status="200"}'
+        )
+        before = self.sample(client, prefix)
+        client.post(
+            "/generate",
+            data=json.dumps(
+                {"modality": "video", "model": "sora", "payload": {"modality": "video", "goal": "x", "subject": "y"}}
+            ),
+            content_type="application/json",
+        )
+
+        assert self.sample(client, prefix) == before + 1
+
+    def test_counts_validation_failures(self, client):
+        prefix = 'prompt_generator_validation_failures_total{endpoint="/generate"}'
+        before = self.sample(client, prefix)
+        client.post("/generate", data=json.dumps({"modality": "image"}), content_type="application/json")
+
+        assert self.sample(client, prefix) == before + 1
+
+    def test_counts_rate_limit_rejections(self, client, monkeypatch):
+        monkeypatch.setattr(rate_limiter, "_policies", dict(rate_limiter._policies))
+        monkeypatch.setattr(rate_limiter, "_limiters", dict(rate_limiter._limiters))
+        rate_limiter.register_policy("generate", 1, 60)
+        prefix = 'prompt_generator_rate_limit_rejections_total{endpoint="/generate"}'
+        before = self.sample(client, prefix)
+        for _ in range(3):
+            client.post("/generate", data=json.dumps({}), content_type="application/json")
+
+        assert self.sample(client, prefix) == before + 2
+        assert self.sample(client, 'prompt_generator_rate_limit_live_keys{policy="generate"}') == 1
+
+
+class TestHeavyHittersEndpoint:
+    """Tests for the admin heavy-hitter endpoint."""
+
+    @pytest.fixture
+    def tracker(self, monkeypatch):
+        tracker = HeavyHitters(capacity=8)
+        monkeypatch.setattr(rate_limiter, "heavy_hitters", tracker)
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", "secret")
+        return tracker
+
+    def test_disabled_without_token(self, client, tracker, monkeypatch):
+        monkeypatch.setattr(app_module, "ADMIN_TOKEN", None)
+        assert client.get("/admin/heavy-hitters").status_code == 404
+
+    def test_requires_token(self, client, tracker):
+        assert client.get("/admin/heavy-hitters").status_code == 403
+        assert client.get("/admin/heavy-hitters", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    def test_reports_top_clients(self, client, tracker):
+        for _ in range(3):
+            client.post(
+                "/generate",
+                data=json.dumps({"modality": "image", "model": "dalle", "payload": {"goal": "x", "subject": "y"}}),
+                content_type="application/json",
+                headers={"X-Forwarded-For": "203.0.113.9"},
+            )
+        tracker.record("198.51.100.1", allowed=False)
+
+        response = client.get("/admin/heavy-hitters?limit=1", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 200
+
+        data = json.loads(response.data)
+        assert data["total_requests"] == 4
+        assert data["requests"] == [{"key": "203.0.113.9", "count": 3, "error": 0}]
+        assert data["rejections"] == [{"key": "198.51.100.1", "count": 1, "error": 0}]
+
+
+class TestRequestLimits:
+    """Tests for body size, nesting depth and list size limits."""
+
+    def test_large_body_refused_without_reading_it(self, client):
+        class Body:
+            """50 MB request stream that records how much of it is read."""
+
+            size = 50 * 1024 * 1024
+            position = 0
+            read_bytes = 0
+
+            def seek(self, offset, whence=0):
+                self.position = self.size + offset if whence == 2 else offset
+
+            def tell(self):
+                return self.position
+
+            def read(self, n=-1):
+                n = self.size - self.position if n is None or n < 0 else min(n, self.size - self.position)
+                self.position += n
+                self.read_bytes += n
+                return b" " * n
+
+        body = Body()
+        response = client.post(
+            "/generate",
+            input_stream=body,
+            content_type="application/json",
+        )
+
+        assert response.status_code == 413
+        assert "maximum size" in json.loads(response.data)["error"]
+        assert body.read_bytes == 0
+
+    def test_deeply_nested_body(self, client):
+        payload = {"modality": "text", "goal": "g", "subject": "s", "constraints": [[[[[[[["x"]]]]]]]]}
+        response = client.post(
+            "/generate",
+            data=json.dumps({"modality": "text", "model": "gpt-4", "payload": payload}),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 400
+        assert "nested" in json.loads(response.data)["error"]
+
+    def test_list_and_payload_limits(self, client):
+        def post(payload):
+            return client.post(
+                "/generate",
+                data=json.dumps({"modality": "text", "model": "gpt-4", "payload": payload}),
+                content_type="application/json",
+            )
+
+        base = {"modality": "text", "goal": "g", "subject": "s"}
+        response = post({**base, "constraints": ["x"] * 51})
+        assert response.status_code == 400
+        assert "maximum of 50 items" in json.loads(response.data)["error"]
+
+        response = post({**base, "constraints": ["x" * 1000] * 21})
+        assert response.status_code == 400
+        assert "Payload text exceeds" in json.loads(response.data)["error"]
+
+
 class TestErrorHandlers:
     """Tests for error handlers."""
 
@@ -252,7 +682,7 @@ class TestErrorHandlers:
         assert "error" in data
 
     def test_405_error(self, client):
-        response = client.get("/generate")  # Should be POST
+        response = client.get("/generate/batch")  # Should be POST
         assert response.status_code == 405
 
         data = json.loads(response.data)
@@ -0,0 +1,203 @@
+"""
+Tests for the offline bulk compiler.
+"""
+
+import json
+
+import pytest
+
+import bulk
+
+
+def _request(index):
+    return {
+        "modality": "text",
+        "model": "gpt-4",
+        "payload": {"modality": "text", "goal": f"goal {index}", "subject": "s"},
+    }
+
+
+def _write_jsonl(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        for item in items:
+            f.write((item if isinstance(item, str) else json.dumps(item)) + "\n")
+
+
+def _read_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return tmp_path / "in.jsonl", tmp_path / "out.jsonl", tmp_path / "err.jsonl"
+
+
+class TestBulkCompiler:
+    """Tests for the JSONL bulk compiler."""
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_results_in_input_order(self, paths, workers):
+        input_path, output_path, error_path = paths
+        _write_jsonl(input_path, [_request(i) for i in range(50)])
+
+        stats = bulk.run(input_path, output_path, error_path, workers=workers, chunk_size=7)
+
+        assert stats == {"compiled": 50, "failed": 0, "line": 50}
+        results = _read_jsonl(output_path)
+        assert [r["line"] for r in results] == list(range(1, 51))
+        assert all(r["prompt"].startswith(f"goal {r['line'] - 1}:") for r in results)
+
+    def test_errors_written_separately(self, paths):
+        input_path, output_path, error_path = paths
+        _write_jsonl(
+            input_path,
+            [
+                _request(0),
+                "{not json",
+                "",
+                {"modality": "image", "model": "nope", "payload": {"subject": "x"}},
+                {"id": "a", **_request(1)},
+            ],
+        )
+
+        stats = bulk.run(input_path, output_path, error_path, workers=1)
+
+        assert stats["compiled"] == 2
+        assert stats["failed"] == 2
+        assert [r["line"] for r in _read_jsonl(output_path)] == [1, 5]
+        assert _read_jsonl(output_path)[1]["id"] == "a"
+        errors = _read_jsonl(error_path)
+        assert [e["line"] for e in errors] == [2, 4]
+        assert errors[0]["error"].startswith("Invalid JSON")
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_failing_line_becomes_error_record(self, paths, monkeypatch, workers):
+        input_path, output_path, error_path = paths
+        adapter_failure = _request(1)
+        adapter_failure["payload"]["constraints"] = [1]
+        _write_jsonl(
+            input_path,
+            [_request(0), {"id": "bad", **adapter_failure}, {"id": "boom", **_request(2)}, _request(3)],
+        )
+
+        prepare_request = bulk.prepare_request
+
+        def fail_on_boom(item):
+            if item.get("id") == "boom":
+                raise RuntimeError("boom")
+            return prepare_request(item)
+
+        # Workers are forked, so they inherit the patched module
+        monkeypatch.setattr(bulk, "prepare_request", fail_on_boom)
+        stats = bulk.run(input_path, output_path, error_path, workers=workers)
+
+        assert stats == {"compiled": 2, "failed": 2, "line": 4}
+        assert [r["line"] for r in _read_jsonl(output_path)] == [1, 4]
+        errors = _read_jsonl(error_path)
+        assert [(e["line"], e["id"]) for e in errors] == [(2, "bad"), (3, "boom")]
+        assert errors[1]["error"] == "Could not compile line: RuntimeError: boom"
+
+    def test_invalid_utf8_fails_only_its_line(self, paths):
+        input_path, output_path, error_path = paths
+        lines = [json.dumps(_request(i)).encode("utf-8") for i in range(3)]
+        input_path.write_bytes(lines[0] + b"\n" + b'{"goal": "\xff"}\n' + lines[2] + b"\n")
+
+        stats = bulk.run(input_path, output_path, error_path, workers=1)
+
+        assert stats == {"compiled": 2, "failed": 1, "line": 3}
+        assert [r["line"] for r in _read_jsonl(output_path)] == [1, 3]
+        errors = _read_jsonl(error_path)
+        assert [e["line"] for e in errors] == [2]
+        assert errors[0]["error"].startswith("Invalid UTF-8")
+
+    def test_chunk_size_must_be_positive(self, paths, capsys):
+        input_path, output_path, error_path = paths
+        _write_jsonl(input_path, [_request(0)])
+
+        with pytest.raises(ValueError, match="chunk_size"):
+            bulk.run(input_path, output_path, error_path, workers=1, chunk_size=0)
+        with pytest.raises(SystemExit):
+            bulk.main([str(input_path), "-o", str(output_path), "-e", str(error_path), "--chunk-size", "0"])
+
+        assert "--chunk-size must be at least 1" in capsys.readouterr().err
+        assert not output_path.exists()
+
+    def test_start_line_appends(self, paths):
+        input_path, output_path, error_path = paths
+        _write_jsonl(input_path, [_request(i) for i in range(10)])
+
+        bulk.run(input_path, output_path, error_path, workers=1, chunk_size=3)
+        first = output_path.read_bytes()
+        stats = bulk.run(input_path, output_path, error_path, workers=1, start_line=8)
+
+        assert stats["compiled"] == 2
+        results = _read_jsonl(output_path)
+        assert len(results) == 12
+        assert output_path.read_bytes().startswith(first)
+
+    def test_resume_truncates_to_checkpoint(self, paths):
+        input_path, output_path, error_path = paths
+        _write_jsonl(input_path, [_request(i) for i in range(20)])
+        bulk.run(input_path, output_path, error_path, workers=1)
+        expected = output_path.read_bytes()
+
+        # Simulate a crash after line 12: checkpoint at line 12 plus a partial write
+        lines = expected.splitlines(keepends=True)
+        partial = b"".join(lines[:12])
+        output_path.write_bytes(partial + lines[12] + b'{"line": 14, "pro')
+        with open(f"{output_path}.checkpoint", "w", encoding="utf-8") as f:
+            json.dump({"line": 12, "output_offset": len(partial), "error_offset": 0}, f)
+
+        stats = bulk.run(input_path, output_path, error_path, workers=1, resume=True)
+
+        assert stats["compiled"] == 8
+        assert output_path.read_bytes() == expected
+        assert bulk.load_checkpoint(str(output_path))["line"] == 20
+
+    def test_resume_seeks_to_input_offset(self, paths):
+        input_path, output_path, error_path = paths
+        requests = [json.dumps(_request(i)) + "\n" for i in range(20)]
+        input_path.write_text("".join(requests[:12]), encoding="utf-8")
+        bulk.run(input_path, output_path, error_path, workers=1, chunk_size=5)
+        assert bulk.load_checkpoint(str(output_path))["input_offset"] == input_path.stat().st_size
+
+        # Lines before the checkpoint are not read again: rewrite them as the
+        # same number of bytes spread over a different number of lines
+        head = len("".join(requests[:12]).encode("utf-8"))
+        input_path.write_text("\n" * 20 + " " * (head - 20) + "".join(requests[12:]), encoding="utf-8")
+        stats = bulk.run(input_path, output_path, error_path, workers=1, chunk_size=5, resume=True)
+
+        assert stats == {"compiled": 8, "failed": 0, "line": 20}
+        assert [r["line"] for r in _read_jsonl(output_path)] == list(range(1, 21))
+
+    def test_resume_without_checkpoint_refuses(self, paths, capsys):
+        input_path, output_path, error_path = paths
+        _write_jsonl(input_path, [_request(i) for i in range(5)])
+        bulk.run(input_path, output_path, error_path, workers=1)
+        expected = output_path.read_bytes()
+        (output_path.parent / "out.jsonl.checkpoint").unlink()
+
+        with pytest.raises(bulk.ResumeError, match="Nothing to resume"):
+            bulk.run(input_path, output_path, error_path, workers=1, resume=True)
+        with pytest.raises(SystemExit):
+            bulk.main([str(input_path), "-o", str(output_path), "-e", str(error_path), "--resume"])
+
+        assert output_path.read_bytes() == expected
+        assert "Nothing to resume" in capsys.readouterr().err
+
+    def test_main_cli(self, paths, capsys):
+        input_path, output_path, error_path = paths
+        _write_jsonl(input_path, [_request(i) for i in range(3)])
+
+        code = bulk.main(
+            [str(input_path), "-o", str(output_path), "-e", str(error_path), "--workers", "1"]
+        )
+
+        assert code == 0
+        assert len(_read_jsonl(output_path)) == 3
+        assert "Compiled 3 prompts" in capsys.readouterr().err
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,101 @@
+"""
+Unit tests for the compiled prompt cache.
+"""
+
+import pytest
+from cache import CompileCache, prompt_cache_key
+from compiler import PromptCompiler
+from schema import ImagePrompt, TextPrompt
+
+
+class TestPromptCacheKey:
+    """Tests for canonical cache keys."""
+
+    def test_equal_prompts_share_key(self):
+        first = ImagePrompt(modality="image", goal="test", subject="a cat", style="noir")
+        second = ImagePrompt(modality="image", goal="test", subject="a cat", style="noir")
+
+        assert prompt_cache_key(first, "dalle") == prompt_cache_key(second, "dalle")
+
+    def test_key_depends_on_model_and_fields(self):
+        prompt = ImagePrompt(modality="image", goal="test", subject="a cat")
+        other = ImagePrompt(modality="image", goal="test", subject="a dog")
+
+        assert prompt_cache_key(prompt, "dalle") != prompt_cache_key(prompt, "firefly")
+        assert prompt_cache_key(prompt, "dalle") != prompt_cache_key(other, "dalle")
+
+    def test_list_fields_are_part_of_the_key(self):
+        def prompt(constraints):
+            return TextPrompt(modality="text", goal="explain", subject="caching", constraints=constraints)
+
+        key = prompt_cache_key(prompt(["short"]), "gpt-4")
+        assert key == prompt_cache_key(prompt(["short"]), "gpt-4")
+        assert key != prompt_cache_key(prompt(["long"]), "gpt-4")
+        assert hash(key) == hash(prompt_cache_key(prompt(["short"]), "gpt-4"))
+
+
+class TestCompileCache:
+    """Tests for LRU and TTL eviction."""
+
+    def test_hit_and_miss_counters(self):
+        cache = CompileCache(max_entries=4, ttl_seconds=60)
+
+        assert cache.get("a") is None
+        cache.set("a", "value")
+        assert cache.get("a") == "value"
+
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_lru_eviction(self):
+        cache = CompileCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # "b" is now least recently used
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.evictions == 1
+        assert len(cache) == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("cache.time.monotonic", lambda: now[0])
+        cache = CompileCache(max_entries=2, ttl_seconds=10)
+        cache.set("a", 1)
+
+        now[0] += 11
+        assert cache.get("a") is None
+        assert cache.evictions == 1
+        assert len(cache) == 0
+
+
+class TestCompilerCache:
+    """Tests for caching inside PromptCompiler."""
+
+    def test_repeated_compile_hits_cache(self):
+        compiler = PromptCompiler(cache=CompileCache(max_entries=8, ttl_seconds=60))
+        prompt = TextPrompt(modality="text", goal="explain", subject="caching")
+
+        first = compiler.compile(prompt, "gpt-4")
+        second = compiler.compile(
+            TextPrompt(modality="text", goal="explain", subject="caching"), "gpt-4"
+        )
+
+        assert first == second
+        assert compiler.cache.hits == 1
+        assert compiler.cache.misses == 1
+
+    def test_uncached_compiler_matches_cached(self):
+        prompt = TextPrompt(modality="text", goal="explain", subject="caching", tone="formal")
+
+        cached = PromptCompiler(cache=CompileCache()).compile(prompt, "claude")
+        uncached = PromptCompiler().compile(prompt, "claude")
+
+        assert cached == uncached
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,38 @@
+"""
+Cold-start tests for the serverless entry point (api/index.py).
+
+Each test serves a request from a fresh interpreter, as a new serverless
+instance does (see benchmarks/bench_cold_start.py).
+"""
+
+import os
+
+import pytest
+from benchmarks.bench_cold_start import measure, run_once
+
+# Time from `import index` to the first /api/generate response, in
+# milliseconds. About 150-250 ms when written, nearly all of it importing
+# Flask; the budget leaves room for slower machines, not for new eager work.
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", 500))
+
+
+class TestColdStart:
+    """Tests for import-time work and time to first response."""
+
+    def test_import_leaves_generation_to_first_use(self):
+        result, _ = run_once("health")
+
+        assert result["status"] == 200
+        assert result["modules"] == []
+
+    def test_first_generate_response_within_budget(self):
+        timings = measure("generate", runs=3)
+
+        assert timings["last"]["status"] == 200
+        assert "compiler" in timings["last"]["modules"]
+        assert "rate_limiter" not in timings["last"]["modules"]
+        assert timings["response_min_ms"] < COLD_START_BUDGET_MS, timings
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
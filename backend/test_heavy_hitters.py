@@ -0,0 +1,121 @@
+"""
+Unit tests for the Space-Saving heavy-hitter sketch.
+"""
+
+import random
+import threading
+
+import pytest
+from heavy_hitters import HeavyHitters, SpaceSaving
+
+
+class TestSpaceSaving:
+    """Tests for the top-K sketch."""
+
+    def test_exact_below_capacity(self):
+        sketch = SpaceSaving(capacity=10)
+        for key, count in [("a", 5), ("b", 3), ("c", 1)]:
+            for _ in range(count):
+                sketch.add(key)
+
+        assert sketch.top() == [("a", 5, 0), ("b", 3, 0), ("c", 1, 0)]
+        assert sketch.top(2) == [("a", 5, 0), ("b", 3, 0)]
+
+    def test_memory_is_bounded(self):
+        sketch = SpaceSaving(capacity=8)
+        for i in range(10_000):
+            sketch.add(f"client-{i}")
+
+        assert len(sketch) == 8
+        assert len(sketch._heap) <= 4 * 8
+        assert sketch.total == 10_000
+
+    def test_finds_heavy_hitters_among_noise(self):
+        rng = random.Random(7)
+        stream = ["attacker"] * 3000 + ["scraper"] * 1500
+        stream += [f"client-{rng.randrange(50_000)}" for _ in range(20_000)]
+        rng.shuffle(stream)
+
+        sketch = SpaceSaving(capacity=20)
+        for key in stream:
+            sketch.add(key)
+
+        top = sketch.top(2)
+        assert [key for key, _, _ in top] == ["attacker", "scraper"]
+        for key, count, error in top:
+            assert count - error <= stream.count(key) <= count
+
+    def test_error_bounds_hold(self):
+        rng = random.Random(3)
+        stream = [f"k{int(rng.paretovariate(1.2))}" for _ in range(5000)]
+
+        sketch = SpaceSaving(capacity=16)
+        for key in stream:
+            sketch.add(key)
+
+        for key, count, error in sketch.top():
+            assert count - error <= stream.count(key) <= count
+            assert error <= len(stream) / 16
+
+    def test_weights(self):
+        sketch = SpaceSaving(capacity=2)
+        sketch.add("a", 10)
+        sketch.add("b", 3)
+        sketch.add("c", 1)
+        sketch.add("b", 0)
+
+        assert sketch.top() == [("a", 10, 0), ("c", 4, 3)]
+
+    def test_capacity_must_be_positive(self):
+        with pytest.raises(ValueError):
+            SpaceSaving(capacity=0)
+
+
+class TestHeavyHitters:
+    """Tests for request and rejection tracking."""
+
+    def test_snapshot(self):
+        tracker = HeavyHitters(capacity=4)
+        for _ in range(3):
+            tracker.record("10.0.0.1", allowed=True)
+        tracker.record("10.0.0.1", allowed=False)
+        tracker.record("10.0.0.2", allowed=True)
+
+        snapshot = tracker.snapshot(1)
+        assert snapshot["total_requests"] == 5
+        assert snapshot["total_rejections"] == 1
+        assert snapshot["requests"] == [{"key": "10.0.0.1", "count": 4, "error": 0}]
+        assert snapshot["rejections"] == [{"key": "10.0.0.1", "count": 1, "error": 0}]
+
+    def test_snapshot_merges_stripes(self):
+        tracker = HeavyHitters(capacity=20, stripes=8)
+        for i in range(20):
+            for _ in range(i + 1):
+                tracker.record(f"client-{i}", allowed=i % 2 == 0)
+
+        snapshot = tracker.snapshot(3)
+        assert snapshot["total_requests"] == sum(range(1, 21))
+        assert snapshot["total_rejections"] == sum(i + 1 for i in range(20) if i % 2)
+        assert [entry["key"] for entry in snapshot["requests"]] == ["client-19", "client-18", "client-17"]
+        assert [entry["key"] for entry in snapshot["rejections"]] == ["client-19", "client-17", "client-15"]
+
+    def test_threads_record_every_request(self):
+        tracker = HeavyHitters(capacity=8, stripes=4)
+
+        def hammer(thread):
+            for i in range(2000):
+                tracker.record(f"client-{(thread + i) % 6}", allowed=True)
+
+        threads = [threading.Thread(target=hammer, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = tracker.snapshot()
+        assert snapshot["total_requests"] == 16_000
+        assert sum(entry["count"] for entry in snapshot["requests"]) == 16_000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
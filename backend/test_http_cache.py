@@ -0,0 +1,157 @@
+"""
+Unit tests for the HTTP caching helpers.
+"""
+
+import json
+
+import pytest
+from urllib.parse import parse_qsl
+
+from flask import Flask, Response, jsonify
+from http_cache import (
+    cached_json,
+    canonical_generate_query,
+    conditional,
+    conditional_response,
+    drop_per_request_headers,
+    etag_for,
+    etag_matches,
+    parse_generate_query,
+    shared_cacheable,
+)
+
+
+class TestCachedJson:
+    """Tests for serialize-once bodies."""
+
+    def test_compact_body_and_strong_etag(self):
+        cached = cached_json({"models": {"image": ["dalle"]}, "name": "café"})
+
+        assert cached.body == '{"models":{"image":["dalle"]},"name":"café"}'.encode("utf-8")
+        assert cached.etag == etag_for(cached.body)
+        assert cached.etag.startswith('"') and not cached.etag.startswith('W/')
+
+    def test_etag_follows_content(self):
+        assert cached_json({"a": 1}).etag == cached_json({"a": 1}).etag
+        assert cached_json({"a": 1}).etag != cached_json({"a": 2}).etag
+
+
+class TestEtagMatches:
+    """Tests for If-None-Match comparison."""
+
+    @pytest.mark.parametrize(
+        "header,expected",
+        [
+            (None, False),
+            ("", False),
+            ('"abc"', True),
+            ('W/"abc"', True),
+            ('"old", "abc"', True),
+            ('"old"', False),
+            ("*", True),
+        ],
+    )
+    def test_weak_comparison(self, header, expected):
+        assert etag_matches(header, '"abc"') is expected
+
+
+class TestConditionalResponse:
+    """Tests for 200 and 304 responses."""
+
+    def test_full_then_not_modified(self):
+        app = Flask(__name__)
+        cached = cached_json({"ok": True})
+
+        with app.test_request_context():
+            response = conditional_response(cached, "public, max-age=60")
+        assert response.status_code == 200
+        assert json.loads(response.get_data()) == {"ok": True}
+        assert response.headers["ETag"] == cached.etag
+        assert response.headers["Cache-Control"] == "public, max-age=60"
+        assert response.content_type == "application/json"
+
+        with app.test_request_context(headers={"If-None-Match": cached.etag}):
+            response = conditional_response(cached, "public, max-age=60")
+        assert response.status_code == 304
+        assert response.get_data() == b""
+        assert response.headers["ETag"] == cached.etag
+
+
+class TestConditional:
+    """Tests for ETags on generated responses."""
+
+    def test_etag_of_body_and_not_modified(self):
+        app = Flask(__name__)
+
+        with app.test_request_context():
+            response = conditional(jsonify({"ok": True}), "public, s-maxage=60")
+        assert response.status_code == 200
+        assert response.headers["ETag"] == etag_for(response.get_data())
+        assert response.headers["Cache-Control"] == "public, s-maxage=60"
+        etag = response.headers["ETag"]
+
+        with app.test_request_context(headers={"If-None-Match": etag}):
+            response = conditional(jsonify({"ok": True}), "public, s-maxage=60")
+        assert response.status_code == 304
+        assert response.get_data() == b""
+        assert response.headers["ETag"] == etag
+
+
+class TestSharedCacheable:
+    """Tests for dropping per-request headers from shared responses."""
+
+    @pytest.mark.parametrize(
+        "cache_control,expected",
+        [
+            ("public, max-age=300", True),
+            ("max-age=0, s-maxage=60", True),
+            ("private, s-maxage=60", False),
+            ("public, no-store", False),
+            ("max-age=60", False),
+            (None, False),
+        ],
+    )
+    def test_shared_cacheable(self, cache_control, expected):
+        response = Response(headers={"Cache-Control": cache_control} if cache_control else {})
+        assert shared_cacheable(response) is expected
+
+    def test_drop_per_request_headers(self):
+        response = Response(headers={"X-Request-ID": "abc", "X-RateLimit-Remaining": "3", "ETag": '"x"'})
+        drop_per_request_headers(response)
+
+        assert "X-Request-ID" not in response.headers
+        assert "X-RateLimit-Remaining" not in response.headers
+        assert response.headers["ETag"] == '"x"'
+
+
+class TestCanonicalGenerateQuery:
+    """Tests for the canonical GET /generate query string."""
+
+    def test_key_order_does_not_change_the_url(self):
+        first = canonical_generate_query("image", "dalle", {"subject": "a cat", "goal": "x", "style": ["a", "b"]})
+        second = canonical_generate_query("image", "dalle", {"style": ["a", "b"], "goal": "x", "subject": "a cat"})
+
+        assert first == second
+        assert first.startswith("modality=image&model=dalle&payload=")
+
+    def test_encodes_like_encode_uri_component(self):
+        query = canonical_generate_query("text", "gpt-4", {"goal": "café & (tea)!*'~"})
+
+        # Values as JavaScript's encodeURIComponent produces them
+        assert query.endswith("payload=%7B%22goal%22%3A%22caf%C3%A9%20%26%20(tea)!*'~%22%7D")
+
+    def test_round_trip(self):
+        payload = {"goal": "naïve = yes", "nested": {"b": 1, "a": [1.5, None, True]}}
+        args = dict(parse_qsl(canonical_generate_query("text", "claude", payload)))
+
+        data, error = parse_generate_query(args)
+        assert error is None
+        assert data == {"modality": "text", "model": "claude", "payload": payload}
+
+    def test_missing_or_malformed_payload(self):
+        assert parse_generate_query({"modality": "text"}) == (None, ("Missing payload query parameter", 400))
+        assert parse_generate_query({"payload": "{oops"})[1][1] == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
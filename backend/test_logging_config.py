@@ -0,0 +1,141 @@
+"""
+Unit tests for the queued, structured logging setup.
+"""
+
+import json
+import logging
+
+import pytest
+from flask import Flask, g
+from logging_config import DeferredQueueHandler, JsonFormatter, RequestIdFilter, SuccessSampler, setup_logging
+
+
+def make_record(msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def root_logger():
+    """Restore the root logger's handlers and level after setup_logging."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+class TestJsonFormatter:
+    """Tests for JSON lines formatting."""
+
+    def test_includes_message_and_extra_fields(self):
+        line = JsonFormatter().format(make_record(request_id="abc", status=200, latency_ms=1.5))
+        entry = json.loads(line)
+
+        assert "\n" not in line
+        assert entry["message"] == "hello world"
+        assert entry["level"] == "INFO"
+        assert entry["logger"] == "test"
+        assert entry["request_id"] == "abc"
+        assert entry["status"] == 200
+        assert entry["latency_ms"] == 1.5
+        assert "args" not in entry and "msg" not in entry
+
+    def test_includes_exception(self):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord("test", logging.ERROR, __file__, 1, "failed", None, __import__("sys").exc_info())
+
+        entry = json.loads(JsonFormatter().format(record))
+        assert "ValueError: boom" in entry["exception"]
+
+
+class TestHandlers:
+    """Tests for the queue handler and filters."""
+
+    def test_queue_handler_does_not_format(self):
+        record = make_record()
+        prepared = DeferredQueueHandler(None).prepare(record)
+
+        assert prepared is record
+        assert prepared.args == ("world",)
+
+    def test_sampler_keeps_errors_and_plain_records(self):
+        sampler = SuccessSampler(0.0)
+
+        assert not sampler.filter(make_record(status=200))
+        assert sampler.filter(make_record(status=500))
+        assert sampler.filter(make_record())
+        assert SuccessSampler(1.0).filter(make_record(status=200))
+
+    def test_request_id_filter(self):
+        app = Flask(__name__)
+        record = make_record()
+        with app.test_request_context():
+            g.request_id = "req-1"
+            RequestIdFilter().filter(record)
+
+        assert record.request_id == "req-1"
+
+
+class TestSetupLogging:
+    """Tests for the queued pipeline end to end."""
+
+    def test_writes_json_lines_and_rotates(self, tmp_path, monkeypatch, root_logger):
+        log_file = tmp_path / "app.log"
+        monkeypatch.setenv("LOG_FILE", str(log_file))
+        monkeypatch.setenv("LOG_MAX_BYTES", "2000")
+        monkeypatch.setenv("LOG_BACKUP_COUNT", "2")
+
+        listener = setup_logging()
+        for i in range(50):
+            logging.getLogger("access").info("request %d", i, extra={"status": 200})
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+        entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+        assert entries[-1]["message"] == "request 49"
+        assert entries[-1]["status"] == 200
+        assert (tmp_path / "app.log.1").exists()
+        assert not (tmp_path / "app.log.3").exists()
+
+    def test_shared_file_is_reopened_not_rotated(self, tmp_path, monkeypatch, root_logger):
+        log_file = tmp_path / "app.log"
+        monkeypatch.setenv("LOG_FILE", str(log_file))
+        monkeypatch.setenv("LOG_MAX_BYTES", "200")
+
+        listener = setup_logging(rotate=False)
+        logging.getLogger("test").warning("first")
+        logging.getLogger("test").warning("x" * 300)
+        # Wait for the listener to write before moving the file, as logrotate would
+        listener.stop()
+        listener.start()
+        log_file.rename(tmp_path / "app.log.old")
+        logging.getLogger("test").warning("after move")
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+        assert not (tmp_path / "app.log.1").exists()
+        assert len((tmp_path / "app.log.old").read_text().splitlines()) == 2
+        assert [json.loads(line)["message"] for line in log_file.read_text().splitlines()] == ["after move"]
+
+    def test_filtered_levels_are_not_queued(self, tmp_path, monkeypatch, root_logger):
+        monkeypatch.setenv("LOG_FILE", str(tmp_path / "app.log"))
+        monkeypatch.setenv("LOG_LEVEL", "WARNING")
+
+        listener = setup_logging()
+        logging.getLogger("test").info("dropped")
+        logging.getLogger("test").warning("kept")
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+        assert [json.loads(line)["message"] for line in (tmp_path / "app.log").read_text().splitlines()] == ["kept"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,100 @@
+"""
+Unit tests for the Prometheus metrics registry.
+"""
+
+import threading
+
+import pytest
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def in_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestCounters:
+    """Tests for thread-sharded counters and gauges."""
+
+    def test_sums_shards_of_all_threads(self):
+        counter = Counter("requests_total", "Requests.", ("status",))
+
+        def work():
+            for _ in range(1000):
+                counter.inc(200)
+            counter.inc(500, amount=2)
+
+        in_threads(8, work)
+        counter.inc(200)
+
+        assert counter.value(200) == 8001
+        assert counter.value(500) == 16
+        assert counter.value(404) == 0
+
+    def test_dead_thread_shards_are_folded(self):
+        counter = Counter("requests_total", "Requests.")
+        for _ in range(20):
+            in_threads(1, counter.inc)
+
+        assert counter.value() == 20
+        assert len(counter._shards._shards) <= 1
+
+    def test_gauge_goes_down(self):
+        gauge = Gauge("in_flight", "In flight.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+
+        assert gauge.value() == 1
+
+
+class TestRender:
+    """Tests for the text exposition format."""
+
+    def test_counter_and_gauge(self):
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests.", ("endpoint", "status")).inc("/generate", 200)
+        registry.gauge("in_flight", "In flight.").inc()
+
+        assert registry.render() == (
+            "# HELP requests_total Requests.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{endpoint="/generate",status="200"} 1\n'
+            "# HELP in_flight In flight.\n"
+            "# TYPE in_flight gauge\n"
+            "in_flight 1\n"
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", ("model",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "dalle")
+
+        lines = registry.render().splitlines()[2:]
+        assert lines == [
+            'latency_seconds_bucket{model="dalle",le="0.1"} 2',
+            'latency_seconds_bucket{model="dalle",le="1.0"} 3',
+            'latency_seconds_bucket{model="dalle",le="+Inf"} 4',
+            'latency_seconds_sum{model="dalle"} 3.65',
+            'latency_seconds_count{model="dalle"} 4',
+        ]
+
+    def test_histogram_sums_threads(self):
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(1.0,))
+        in_threads(4, lambda: [histogram.observe(0.5) for _ in range(100)])
+
+        assert list(histogram.samples())[-1] == ("latency_seconds_count", (), (), 400)
+
+    def test_collected_and_escaping(self):
+        registry = MetricsRegistry()
+        registry.collected("keys", "Keys.", "gauge", ("policy",), lambda: {('a "b"\\',): 3})
+
+        assert registry.render().splitlines()[-1] == 'keys{policy="a \\"b\\"\\\\"} 3'
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
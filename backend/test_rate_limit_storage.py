@@ -0,0 +1,203 @@
+"""
+Unit tests for the pluggable rate limit storage backends.
+"""
+
+import os
+
+import pytest
+
+import rate_limit_storage
+from rate_limit_storage import GCRA_SCRIPT, MemoryStorage, RedisStorage, StorageRateLimiter
+
+
+class FakeRedis:
+    """
+    In-process stand-in for a Redis server that runs GCRA_SCRIPT itself.
+
+    The script executes in an embedded Lua 5.1 interpreter (lupa), the
+    Lua version Redis embeds, with redis.call backed by a dict, the test
+    clock and key expiry, and replies converted as Redis converts them.
+    Script calls are counted so tests can check each rate limit check is
+    a single round trip.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+        self.calls = 0
+        self.down = False
+        self.lua = _lua_runtime()
+
+    def register_script(self, script):
+        assert script == GCRA_SCRIPT
+        # KEYS, ARGV and redis are globals in Redis; parameters here
+        function = self.lua.eval(f"function(redis, KEYS, ARGV)\n{script}\nend")
+        redis = self.lua.table_from({"call": self._call})
+
+        def run(keys, args):
+            self.calls += 1
+            if self.down:
+                raise ConnectionError("Connection refused")
+            # Redis passes arguments as strings and truncates numbers in replies
+            reply = function(redis, self.lua.table_from(keys), self.lua.table_from([str(arg) for arg in args]))
+            return [
+                value.encode() if isinstance(value, str) else int(value)
+                for value in (reply[i] for i in range(1, len(reply) + 1))
+            ]
+
+        return run
+
+    def _call(self, command, *args):
+        if command == "TIME":
+            seconds, micros = divmod(round(self.clock.now * 1_000_000), 1_000_000)
+            return self.lua.table(str(seconds), str(micros))
+        if command == "GET":
+            return self._get(args[0])
+        if command == "SET":
+            key, value, unit, ttl = args
+            assert unit == "PX"
+            self.data[key] = (value, self.clock.now + int(ttl) / 1000)
+            return "OK"
+        raise AssertionError(f"Unexpected command: {command}")
+
+    def _get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if value is not None and expires_at <= self.clock.now:
+            del self.data[key]
+            return None
+        return value
+
+
+def _lua_runtime():
+    """A Lua 5.1 interpreter, or skip the test when lupa is not installed."""
+    pytest.importorskip("lupa")
+    try:
+        from lupa.lua51 import LuaRuntime
+    except ImportError:
+        from lupa import LuaRuntime
+    return LuaRuntime()
+
+
+@pytest.fixture(params=["memory", "fake-redis"])
+def storage(request, clock):
+    if request.param == "memory":
+        return MemoryStorage()
+    return RedisStorage(FakeRedis(clock))
+
+
+class TestStorageContract:
+    """Behavior every storage backend must share."""
+
+    def test_allows_exactly_max_requests(self, storage):
+        limiter = StorageRateLimiter(storage, max_requests=5, window_seconds=10)
+        decisions = [limiter.check("client") for _ in range(7)]
+
+        assert [d.allowed for d in decisions] == [True] * 5 + [False] * 2
+        assert [d.remaining for d in decisions[:5]] == [4, 3, 2, 1, 0]
+
+    def test_retry_after_is_honored(self, storage, clock):
+        limiter = StorageRateLimiter(storage, max_requests=4, window_seconds=8)
+        for _ in range(4):
+            limiter.check("client")
+        denied = limiter.check("client")
+
+        assert not denied.allowed
+        clock.advance(denied.retry_after + 0.001)
+        assert limiter.check("client").allowed
+
+    def test_cost_consumes_several_requests(self, storage):
+        assert storage.gcra("client", 10, 60, cost=7).remaining == 3
+        assert not storage.gcra("client", 10, 60, cost=4).allowed
+        assert storage.gcra("client", 10, 60, cost=3).allowed
+
+    def test_reads_do_not_record(self, storage):
+        limiter = StorageRateLimiter(storage, max_requests=3, window_seconds=60)
+
+        assert limiter.get_remaining("client") == 3
+        assert limiter.get_reset_time("client") == 0
+        limiter.check("client")
+        assert limiter.get_remaining("client") == 2
+        assert limiter.get_remaining("client") == 2
+
+
+class TestRedisStorage:
+    """Tests specific to the Redis backend, running its script in the in-process fake."""
+
+    def test_nodes_share_one_limit(self, clock):
+        server = FakeRedis(clock)
+        node_a = StorageRateLimiter(RedisStorage(server), max_requests=4, window_seconds=60)
+        node_b = StorageRateLimiter(RedisStorage(server), max_requests=4, window_seconds=60)
+        for _ in range(2):
+            node_a.check("client")
+            node_b.check("client")
+
+        assert not node_a.check("client").allowed
+        assert not node_b.check("client").allowed
+
+    def test_one_round_trip_per_check(self, clock):
+        server = FakeRedis(clock)
+        limiter = StorageRateLimiter(RedisStorage(server), max_requests=4, window_seconds=60)
+        for _ in range(6):
+            limiter.check("client")
+
+        assert server.calls == 6
+
+    def test_idle_keys_expire(self, clock):
+        server = FakeRedis(clock)
+        storage = RedisStorage(server, prefix="rl:")
+        storage.gcra("client", 10, 60)
+
+        assert server._get("rl:client") is not None
+        clock.advance(6.001)
+        assert server._get("rl:client") is None
+
+    def test_fails_open_when_unavailable(self, clock):
+        server = FakeRedis(clock)
+        server.down = True
+        storage = RedisStorage(server)
+
+        assert storage.gcra("client", 1, 60).allowed
+        assert storage.stats()["errors"] == 1
+
+    def test_fail_closed_raises(self, clock):
+        server = FakeRedis(clock)
+        server.down = True
+
+        with pytest.raises(ConnectionError):
+            RedisStorage(server, fail_open=False).gcra("client", 1, 60)
+
+    def test_from_url_requires_redis_package(self, monkeypatch):
+        monkeypatch.setattr(rate_limit_storage, "redis", None)
+        with pytest.raises(RuntimeError, match="requires the redis package"):
+            RedisStorage.from_url("redis://localhost:6379/0")
+
+
+@pytest.fixture
+def redis_server():
+    """A real Redis server from RATE_LIMIT_TEST_REDIS_URL (or localhost), else skip."""
+    redis = pytest.importorskip("redis")
+    client = redis.Redis.from_url(os.getenv("RATE_LIMIT_TEST_REDIS_URL", "redis://localhost:6379/15"))
+    try:
+        client.ping()
+    except redis.RedisError:
+        pytest.skip("Redis server not available")
+    yield client
+    for key in client.scan_iter("test-ratelimit:*"):
+        client.delete(key)
+
+
+class TestRealRedis:
+    """Runs the Lua script on a real server when one is available."""
+
+    def test_script_enforces_limit(self, redis_server):
+        storage = RedisStorage(redis_server, prefix="test-ratelimit:", fail_open=False)
+        decisions = [storage.gcra("client", 5, 60) for _ in range(7)]
+
+        assert [d.allowed for d in decisions] == [True] * 5 + [False] * 2
+        assert [d.remaining for d in decisions[:5]] == [4, 3, 2, 1, 0]
+        assert 0 < decisions[-1].retry_after <= 12
+        assert 0 < redis_server.pttl("test-ratelimit:client") <= 60_000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,429 @@
+"""
+Unit tests for the rate limiters.
+"""
+
+import sys
+import threading
+from collections import Counter
+
+import pytest
+from flask import Flask, jsonify
+
+import rate_limiter
+from rate_limiter import (
+    RATE_LIMIT_ALGORITHMS,
+    GCRARateLimiter,
+    KeyStore,
+    RateLimiter,
+    ShardedRateLimiter,
+    SlidingWindowRateLimiter,
+    check_policies,
+    create_rate_limiter,
+    get_rate_limiter,
+    rate_limit,
+    register_policy,
+)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """An empty policy registry, restored after the test."""
+    monkeypatch.setattr(rate_limiter, "_policies", {})
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+
+
+class TestAlgorithms:
+    """Behavior shared by every rate limiting algorithm."""
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    @pytest.mark.parametrize("max_requests", [1, 3, 10, 60])
+    def test_allows_exactly_max_requests(self, clock, limiter_class, max_requests):
+        limiter = limiter_class(max_requests=max_requests, window_seconds=7)
+        decisions = [limiter.check("client") for _ in range(max_requests + 3)]
+
+        assert [d.allowed for d in decisions] == [True] * max_requests + [False] * 3
+        assert [d.remaining for d in decisions[:max_requests]] == list(range(max_requests - 1, -1, -1))
+        assert all(d.retry_after > 0 for d in decisions[max_requests:])
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_keys_are_independent(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=2, window_seconds=60)
+        assert limiter.is_allowed("a") and limiter.is_allowed("a")
+        assert not limiter.is_allowed("a")
+        assert limiter.is_allowed("b")
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_quota_restored_after_reset(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=5, window_seconds=10)
+        for _ in range(5):
+            limiter.check("client")
+        denied = limiter.check("client")
+
+        assert not denied.allowed
+        clock.advance(denied.reset_after + 0.001)
+        assert limiter.get_remaining("client") == 5
+        assert limiter.check("client").allowed
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_retry_after_is_honored(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=4, window_seconds=8)
+        for _ in range(4):
+            limiter.check("client")
+        denied = limiter.check("client")
+
+        clock.advance(denied.retry_after + 0.001)
+        assert limiter.check("client").allowed
+
+    def test_gcra_spaces_requests(self, clock):
+        limiter = GCRARateLimiter(max_requests=10, window_seconds=10)
+        for _ in range(10):
+            limiter.check("client")
+
+        clock.advance(0.5)
+        assert not limiter.check("client").allowed
+        clock.advance(0.5)
+        assert limiter.check("client").allowed
+
+    def test_sliding_window_weights_previous_window(self, clock):
+        clock.now = 1_000_000.0  # Start of a 10 s window
+        limiter = SlidingWindowRateLimiter(max_requests=10, window_seconds=10)
+        for _ in range(10):
+            limiter.check("client")
+
+        # Halfway through the next window half of the previous count remains
+        clock.advance(15)
+        assert limiter.get_remaining("client") == 5
+
+
+class TestKeyStore:
+    """Tests for bounding and sweeping the key table."""
+
+    def test_lru_eviction_at_capacity(self):
+        store = KeyStore(lambda state, now: False, max_keys=3)
+        for key in "abc":
+            store.put(key, 0, 0.0)
+        store.put("a", 1, 0.0)  # "b" is now least recently used
+        store.put("d", 0, 0.0)
+
+        assert "b" not in store
+        assert len(store) == 3
+        assert store.stats()["capacity_evictions"] == 1
+
+    def test_get_does_not_change_recency(self):
+        store = KeyStore(lambda state, now: False, max_keys=2)
+        store.put("a", 0, 0.0)
+        store.put("b", 0, 0.0)
+        assert store.get("a") == 0
+        store.put("c", 0, 0.0)
+
+        assert "a" not in store and "b" in store
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_idle_keys_are_swept(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=5, window_seconds=10)
+        for i in range(100):
+            limiter.check(f"idle-{i}")
+
+        # Each new key sweeps a couple of idle keys off the old end
+        clock.advance(30)
+        for i in range(60):
+            limiter.check(f"new-{i}")
+
+        stats = limiter.stats()
+        assert stats["live_keys"] == 60
+        assert stats["idle_evictions"] == 100
+        assert stats["evictions"] == 100
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_key_count_is_bounded(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=5, window_seconds=10, max_keys=50)
+        for i in range(500):
+            limiter.check(f"client-{i}")
+
+        assert limiter.stats()["live_keys"] == 50
+        assert limiter.stats()["capacity_evictions"] == 450
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_reads_do_not_create_keys(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=5, window_seconds=10)
+
+        assert limiter.get_remaining("unseen") == 5
+        assert limiter.get_reset_time("unseen") == 0
+        assert limiter.stats()["live_keys"] == 0
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_active_key_survives_sweep(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=3, window_seconds=10)
+        for _ in range(3):
+            limiter.check("busy")
+        limiter.check("other")
+
+        # "busy" is oldest but still inside its window, so it is kept
+        clock.advance(1)
+        limiter.check("other")
+        assert not limiter.check("busy").allowed
+
+
+def run_threads(count, target):
+    """Start count threads on target behind a barrier and wait for them."""
+    barrier = threading.Barrier(count)
+
+    def worker(index):
+        barrier.wait()
+        target(index)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.fixture
+def fast_switching():
+    """Switch threads as often as possible to surface races."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+class TestShardedRateLimiter:
+    """Tests for the lock-striped, thread-safe limiter."""
+
+    @pytest.mark.parametrize("algorithm", list(RATE_LIMIT_ALGORITHMS))
+    def test_limits_exact_under_contention(self, clock, fast_switching, algorithm):
+        limiter = ShardedRateLimiter(max_requests=50, window_seconds=60, algorithm=algorithm, shards=4)
+        keys = [f"client-{i}" for i in range(8)]
+        allowed = Counter()
+        allowed_lock = threading.Lock()
+
+        def hammer(index):
+            local = Counter()
+            for i in range(400):
+                key = keys[(index + i) % len(keys)]
+                if limiter.check(key).allowed:
+                    local[key] += 1
+            with allowed_lock:
+                allowed.update(local)
+
+        # 16 threads x 400 requests over 8 keys: 800 attempts per key
+        run_threads(16, hammer)
+
+        assert allowed == Counter({key: 50 for key in keys})
+        assert all(limiter.get_remaining(key) == 0 for key in keys)
+
+    def test_keys_spread_over_shards(self):
+        limiter = ShardedRateLimiter(max_requests=5, window_seconds=60, shards=8, max_keys=800)
+        for i in range(400):
+            limiter.check(f"client-{i}")
+
+        live = [shard.stats()["live_keys"] for _, shard in limiter.shards]
+        assert sum(live) == 400
+        assert min(live) > 0
+        assert limiter.stats()["live_keys"] == 400
+
+    def test_reads_do_not_create_keys(self):
+        limiter = ShardedRateLimiter(max_requests=5, window_seconds=60, shards=4)
+        assert limiter.get_remaining("unseen") == 5
+        assert limiter.get_reset_time("unseen") == 0
+        assert limiter.stats()["live_keys"] == 0
+
+    def test_policy_limiter_created_once(self, fast_switching, registry):
+        register_policy("shared", 10, 60)
+        instances = [None] * 16
+
+        def fetch(index):
+            instances[index] = get_rate_limiter("shared")
+
+        run_threads(16, fetch)
+
+        assert isinstance(instances[0], ShardedRateLimiter)
+        assert all(instance is instances[0] for instance in instances)
+
+
+class TestFactory:
+    """Tests for choosing an algorithm."""
+
+    def test_algorithm_from_environment(self, monkeypatch):
+        monkeypatch.setenv("RATE_LIMIT_ALGORITHM", "gcra")
+        assert isinstance(create_rate_limiter(10, 60), GCRARateLimiter)
+
+    def test_default_algorithm(self, monkeypatch):
+        monkeypatch.delenv("RATE_LIMIT_ALGORITHM", raising=False)
+        assert isinstance(create_rate_limiter(10, 60), RateLimiter)
+
+    def test_max_keys_from_environment(self, monkeypatch):
+        monkeypatch.setenv("RATE_LIMIT_MAX_KEYS", "25")
+        assert create_rate_limiter(10, 60).store.max_keys == 25
+
+    def test_unknown_algorithm(self):
+        with pytest.raises(ValueError, match="Unknown rate limit algorithm"):
+            create_rate_limiter(10, 60, algorithm="leaky")
+
+
+class TestCost:
+    """Tests for requests that count as several."""
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_cost_consumes_quota(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=10, window_seconds=60)
+
+        assert limiter.check("client", cost=7).remaining == 3
+        denied = limiter.check("client", cost=4)
+        assert not denied.allowed
+        assert limiter.check("client", cost=3).allowed
+        assert not limiter.check("client").allowed
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_retry_after_fits_cost(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=6, window_seconds=12)
+        for _ in range(6):
+            limiter.check("client")
+        clock.advance(1)
+        denied = limiter.check("client", cost=3)
+
+        assert not denied.allowed
+        clock.advance(denied.retry_after + 0.001)
+        assert limiter.check("client", cost=3).allowed
+
+    @pytest.mark.parametrize("limiter_class", list(RATE_LIMIT_ALGORITHMS.values()))
+    def test_cost_over_limit_never_fits(self, clock, limiter_class):
+        limiter = limiter_class(max_requests=10, window_seconds=60)
+        denied = limiter.check("client", cost=20)
+
+        assert not denied.allowed
+        assert denied.retry_after == 60
+        assert limiter.check("client", cost=10).allowed
+
+    def test_sharded_limiter_passes_cost(self, clock):
+        limiter = ShardedRateLimiter(max_requests=5, window_seconds=60, shards=2)
+        assert limiter.check("client", cost=5).remaining == 0
+        assert not limiter.check("client").allowed
+
+
+def limited_app(*routes):
+    """Flask app with one JSON view per (path, rate_limit kwargs) pair."""
+    app = Flask(__name__)
+    for path, options in routes:
+        view = rate_limit(**options)(lambda: jsonify({"ok": True}))
+        app.add_url_rule(path, path.strip("/"), view)
+    return app
+
+
+class TestPolicies:
+    """Tests for named, per-route and stacked policies."""
+
+    def test_routes_get_their_own_limits(self, clock, registry):
+        app = Flask(__name__)
+
+        @app.route("/strict")
+        @rate_limit(max_requests=1, window_seconds=60)
+        def strict():
+            return jsonify({"ok": True})
+
+        @app.route("/loose")
+        @rate_limit(max_requests=5, window_seconds=60)
+        def loose():
+            return jsonify({"ok": True})
+
+        client = app.test_client()
+        assert client.get("/strict").status_code == 200
+        assert client.get("/strict").status_code == 429
+        assert client.get("/loose").headers["X-RateLimit-Remaining"] == "4"
+
+    def test_routes_share_a_named_policy(self, clock, registry):
+        register_policy("shared", 3, 60)
+        client = limited_app(("/a", {"policies": ["shared"]}), ("/b", {"policies": ["shared"]})).test_client()
+
+        client.get("/a")
+        client.get("/b")
+        assert client.get("/a").headers["X-RateLimit-Remaining"] == "0"
+        assert client.get("/b").status_code == 429
+
+    def test_cost_callable(self, clock, registry):
+        register_policy("items", 10, 60)
+        client = limited_app(("/batch", {"policies": ["items"], "cost": lambda: 4})).test_client()
+
+        assert client.get("/batch").headers["X-RateLimit-Remaining"] == "6"
+        assert client.get("/batch").headers["X-RateLimit-Remaining"] == "2"
+        assert client.get("/batch").status_code == 429
+
+    def test_stacked_burst_and_sustained(self, clock, registry):
+        register_policy("burst", 2, 1)
+        register_policy("hourly", 3, 3600, key="api_key")
+        client = limited_app(("/x", {"policies": ["burst", "hourly"]})).test_client()
+        headers = {"X-API-Key": "key-1"}
+
+        assert client.get("/x", headers=headers).status_code == 200
+        second = client.get("/x", headers=headers)
+        # Headers report the policy closest to its limit
+        assert second.headers["X-RateLimit-Remaining"] == "0"
+        assert second.headers["X-RateLimit-Limit"] == "2"
+
+        burst_denied = client.get("/x", headers=headers)
+        assert burst_denied.status_code == 429
+        assert burst_denied.headers["X-RateLimit-Limit"] == "2"
+
+        # After the burst window only one hourly request is left
+        clock.advance(1.001)
+        assert client.get("/x", headers=headers).status_code == 200
+        clock.advance(1.001)
+        hourly_denied = client.get("/x", headers=headers)
+        assert hourly_denied.status_code == 429
+        assert hourly_denied.headers["X-RateLimit-Limit"] == "3"
+
+        # Without an API key only the burst policy applies
+        assert client.get("/x").status_code == 200
+
+    def test_denial_does_not_charge_later_policies(self, clock, registry):
+        register_policy("first", 1, 60)
+        register_policy("second", 5, 60)
+        with Flask(__name__).test_request_context("/", environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+            check_policies(["first", "second"])
+            assert not check_policies(["first", "second"]).allowed
+            assert get_rate_limiter("second").get_remaining("10.0.0.1") == 4
+
+    def test_unknown_policy(self, registry):
+        with Flask(__name__).test_request_context("/"):
+            with pytest.raises(KeyError, match="Unknown rate limit policy"):
+                check_policies(["missing"])
+
+    def test_unknown_key_kind(self, registry):
+        with pytest.raises(ValueError, match="Unknown rate limit key"):
+            register_policy("bad", 1, 60, key="cookie")
+
+    def test_reregistering_replaces_limiter(self, clock, registry):
+        register_policy("p", 1, 60)
+        first = get_rate_limiter("p")
+        register_policy("p", 2, 60)
+
+        assert get_rate_limiter("p") is not first
+        assert get_rate_limiter("p").max_requests == 2
+
+
+class TestDecorator:
+    """Tests for the Flask rate_limit decorator."""
+
+    def test_headers_and_429(self, clock, registry):
+        app = Flask(__name__)
+
+        @app.route("/limited")
+        @rate_limit(max_requests=2, window_seconds=60)
+        def limited():
+            return jsonify({"ok": True})
+
+        client = app.test_client()
+        first = client.get("/limited")
+        second = client.get("/limited")
+        third = client.get("/limited")
+
+        assert first.headers["X-RateLimit-Remaining"] == "1"
+        assert second.headers["X-RateLimit-Remaining"] == "0"
+        assert third.status_code == 429
+        assert third.headers["Retry-After"] == "60"
+        assert third.headers["X-RateLimit-Limit"] == "2"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
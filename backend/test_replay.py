@@ -0,0 +1,85 @@
+"""
+Tests for the traffic replay harness.
+"""
+
+import json
+
+import pytest
+
+import replay
+
+
+class TestCaptureParsing:
+    """Tests for reading capture lines."""
+
+    def test_bare_generate_body(self):
+        line = json.dumps({"modality": "image", "model": "dalle", "payload": {"subject": "a cat"}})
+        request, timestamp = replay.parse_line(line)
+
+        assert request.method == "POST"
+        assert request.path == "/generate"
+        assert json.loads(request.body)["model"] == "dalle"
+        assert (request.modality, request.model) == ("image", "dalle")
+        assert timestamp is None
+
+    def test_envelope_with_iso_timestamp(self):
+        line = json.dumps({"path": "/models", "timestamp": "2024-06-10T12:00:00Z"})
+        request, timestamp = replay.parse_line(line)
+
+        assert request.method == "GET"
+        assert request.body is None
+        assert request.model == "GET /models"
+        assert timestamp == 1718020800.0
+
+    def test_unrelated_lines_skipped(self, tmp_path):
+        capture = tmp_path / "capture.jsonl"
+        capture.write_text(
+            "\n".join(
+                [
+                    json.dumps({"request_id": "user-001", "title": "t", "body": "b"}),
+                    "not json",
+                    json.dumps({"path": "/health", "timestamp": 10.0}),
+                    json.dumps({"path": "/health", "timestamp": 12.5}),
+                ]
+            )
+        )
+        stats = {"skipped": 0}
+
+        requests = list(replay.read_capture(capture, stats))
+
+        assert stats["skipped"] == 2
+        assert [r.offset for r in requests] == [0.0, 2.5]
+
+
+class TestReplay:
+    """Tests for replaying requests and summarizing outcomes."""
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        assert replay.percentile(values, 50) == 50
+        assert replay.percentile(values, 99) == 99
+        assert replay.percentile([7], 95) == 7
+        assert replay.percentile([], 50) == 0.0
+
+    def test_in_process_replay_groups_errors(self, tmp_path):
+        capture = tmp_path / "capture.jsonl"
+        lines = [
+            {"modality": "text", "model": "gpt-4", "payload": {"modality": "text", "goal": "g", "subject": "s"}},
+            {"modality": "text", "model": "gpt-4", "payload": {"modality": "text", "goal": "g", "subject": "t"}},
+            {"modality": "image", "model": "invalid-model", "payload": {"subject": "x"}},
+            {"path": "/health"},
+        ]
+        capture.write_text("\n".join(json.dumps(line) for line in lines))
+
+        outcomes, wall, _ = replay.replay(replay.read_capture(capture, {"skipped": 0}), concurrency=2)
+        summary = replay.summarize(outcomes, wall)
+
+        assert summary["overall"]["requests"] == 4
+        assert summary["models"]["gpt-4"]["errors"] == 0
+        assert summary["models"]["invalid-model"]["error_breakdown"] == {"HTTP 400": 1}
+        assert summary["modalities"]["text"]["requests"] == 2
+        assert summary["overall"]["p99_ms"] >= summary["overall"]["p50_ms"] > 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,73 @@
+"""
+Tests for request body limits.
+"""
+
+import json
+import random
+
+import pytest
+from flask import Flask, request
+from request_limits import BoundedJSONProvider, json_too_deep
+
+
+def _depth(value):
+    if isinstance(value, dict):
+        return 1 + max(map(_depth, value.values()), default=0)
+    if isinstance(value, list):
+        return 1 + max(map(_depth, value), default=0)
+    return 0
+
+
+def _random_value(rng, depth=0):
+    if depth > 10 or rng.random() < 0.3:
+        # Strings full of brackets, quotes and escapes must not count
+        return rng.choice(["[", "]]", "{", "}", "\\", '"', "a\\\\", 'x"]', "é", 1, None])
+    if rng.random() < 0.5:
+        return [_random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+    return {rng.choice(["k", "[", "}", '"', "\\"]): _random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))}
+
+
+class TestJsonTooDeep:
+    """Tests for the pre-decode nesting check."""
+
+    @pytest.mark.parametrize(
+        "text,expected",
+        [
+            ("{}", False),
+            ('{"a": [1, {"b": 2}]}', False),
+            ("[" * 8 + "]" * 8, False),
+            ("[" * 9 + "]" * 9, True),
+            ("[" * 100000, True),
+            ('{"a": "' + "[" * 50 + '"}', False),
+            ('["\\"", ' + "[" * 8 + "]" * 8 + "]", True),
+            ('["]", ' + "[" * 8 + "]" * 8 + ', "["]', True),
+        ],
+    )
+    def test_depth(self, text, expected):
+        assert json_too_deep(text, 8) is expected
+        assert json_too_deep(text.encode("utf-8"), 8) is expected
+
+    def test_matches_decoded_depth(self):
+        rng = random.Random(42)
+        for _ in range(3000):
+            value = _random_value(rng)
+            text = json.dumps(value, ensure_ascii=rng.random() < 0.5)
+            for max_depth in (1, 3, 8):
+                assert json_too_deep(text, max_depth) is (_depth(value) > max_depth), text
+
+
+class TestBoundedJSONProvider:
+    """Tests for request.get_json with the bounded provider."""
+
+    def test_deep_body_is_bad_request(self):
+        app = Flask(__name__)
+        app.json = BoundedJSONProvider(app)
+
+        with app.test_request_context(method="POST", data="[" * 5000 + "]" * 5000, content_type="application/json"):
+            assert request.get_json(silent=True) is None
+        with app.test_request_context(method="POST", data='{"a": [1]}', content_type="application/json"):
+            assert request.get_json() == {"a": [1]}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,156 @@
+"""
+Tests for the pre-fork server, run as a separate process.
+"""
+
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="The pre-fork server needs os.fork")
+
+
+def _wait_for_file(path, timeout=20):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{path} was not written")
+        time.sleep(0.02)
+    with open(path) as f:
+        return json.load(f)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def _all_exited(pids, timeout=10):
+    """Wait for processes to exit and be reaped by the server."""
+    deadline = time.monotonic() + timeout
+    while any(_alive(pid) for pid in pids):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+@pytest.fixture
+def start_server(tmp_path):
+    """
+    Start server.py with extra arguments and environment variables; returns
+    (process, ready state, ready file, console output file).
+    """
+    processes = []
+
+    def start(*args, **environ):
+        ready_file = tmp_path / "ready.json"
+        log_file = tmp_path / "server.log"
+        env = {**os.environ, "LOG_FILE": "", "RATE_LIMIT": "100000", **environ}
+        with open(log_file, "w") as log:
+            process = subprocess.Popen(
+                [sys.executable, SERVER, "--bind", "127.0.0.1:0", "--ready-file", str(ready_file), *args],
+                env=env,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        processes.append(process)
+        return process, _wait_for_file(ready_file), ready_file, log_file
+
+    yield start
+
+    for process in processes:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _get(address, path="/health"):
+    host, port = address.rsplit(":", 1)
+    connection = http.client.HTTPConnection(host, int(port), timeout=10)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+class TestPreforkServer:
+    """Tests for serving, recycling, reload and shutdown."""
+
+    def test_serves_from_workers_once_ready(self, start_server):
+        process, state, _, _ = start_server("--workers", "2")
+
+        assert state["pid"] == process.pid
+        assert len(state["workers"]) == 2
+        status, body = _get(state["address"])
+        assert status == 200
+        assert json.loads(body)["status"] == "healthy"
+
+        query = "modality=text&model=gpt-4&payload=%7B%22goal%22%3A%22g%22%2C%22modality%22%3A%22text%22%2C%22subject%22%3A%22s%22%7D"
+        status, body = _get(state["address"], "/generate?" + query)
+        assert status == 200
+        assert json.loads(body)["model"] == "gpt-4"
+
+    def test_recycles_workers_after_max_requests(self, start_server):
+        _, state, _, log_file = start_server("--workers", "1", "--max-requests", "3")
+
+        statuses = [_get(state["address"])[0] for _ in range(7)]
+
+        assert statuses == [200] * 7
+        with open(log_file) as f:
+            assert f.read().count("served 3 requests, recycling") >= 2
+        assert _all_exited(state["workers"])
+
+    def test_sighup_replaces_workers_without_refusing_requests(self, start_server):
+        process, state, ready_file, _ = start_server("--workers", "2")
+
+        os.remove(ready_file)
+        process.send_signal(signal.SIGHUP)
+        statuses = []
+        while not os.path.exists(ready_file):
+            statuses.append(_get(state["address"])[0])
+        reloaded = _wait_for_file(ready_file)
+
+        assert statuses and set(statuses) == {200}
+        assert reloaded["pid"] == process.pid
+        assert not set(reloaded["workers"]) & set(state["workers"])
+        assert _all_exited(state["workers"])
+        assert _get(reloaded["address"])[0] == 200
+
+    def test_sigterm_stops_gracefully(self, start_server):
+        process, state, _, _ = start_server("--workers", "2")
+
+        process.send_signal(signal.SIGTERM)
+
+        assert process.wait(timeout=10) == 0
+        assert _all_exited(state["workers"])
+
+
+    def test_processes_share_log_file_without_rotating(self, start_server, tmp_path):
+        log_file = tmp_path / "app.log"
+        process, state, _, _ = start_server("--workers", "2", LOG_FILE=str(log_file), LOG_MAX_BYTES="500")
+
+        statuses = [_get(state["address"])[0] for _ in range(20)]
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+
+        assert statuses == [200] * 20
+        assert not os.path.exists(f"{log_file}.1")
+        entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+        assert sum(1 for entry in entries if entry["logger"] == "access") == 20
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
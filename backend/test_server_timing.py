@@ -0,0 +1,44 @@
+"""
+Unit tests for per-request phase timings.
+"""
+
+import pytest
+from flask import Flask, g
+
+import server_timing
+from server_timing import PhaseTimer, add_phase
+
+
+@pytest.fixture(autouse=True)
+def perf_counter(clock, monkeypatch):
+    """server_timing imports perf_counter by name; point it at the shared clock."""
+    monkeypatch.setattr(server_timing, "perf_counter", clock)
+
+
+class TestPhaseTimer:
+    """Tests for lap timing and the header value."""
+
+    def test_laps_and_total(self, clock):
+        timer = PhaseTimer()
+        clock.now += 0.001
+        timer.lap("parse")
+        clock.now += 0.5
+        timer.mark()
+        clock.now += 0.0025
+        timer.lap("compile")
+        timer.add("ratelimit", 0.00002)
+
+        assert timer.header() == "parse;dur=1.000, compile;dur=2.500, ratelimit;dur=0.020, total;dur=503.500"
+        assert timer.elapsed() == pytest.approx(0.5035)
+
+    def test_add_phase_records_on_request_timer(self, clock):
+        app = Flask(__name__)
+        with app.test_request_context():
+            timer = server_timing.start_timer()
+            add_phase("ratelimit", 0.003)
+            assert g.timer is timer
+            assert timer.header().startswith("ratelimit;dur=3.000, ")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
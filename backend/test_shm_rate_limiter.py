@@ -0,0 +1,145 @@
+"""
+Unit tests for the cross-process shared memory rate limiter.
+"""
+
+import multiprocessing
+import threading
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+import shm_rate_limiter  # noqa: E402
+from shm_rate_limiter import SharedMemoryRateLimiter  # noqa: E402
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    return str(tmp_path / "ratelimit.shm")
+
+
+def count_allowed(path, key, attempts, results):
+    """Worker process: open the table independently and record allowed checks."""
+    limiter = SharedMemoryRateLimiter(path, max_requests=50, window_seconds=3600, max_keys=256)
+    results.put(sum(limiter.check(key).allowed for _ in range(attempts)))
+    limiter.close()
+
+
+class TestSharedMemoryRateLimiter:
+    """Tests for the mmap-backed GCRA limiter."""
+
+    def test_allows_exactly_max_requests(self, table_path, clock):
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=10, window_seconds=10)
+        decisions = [limiter.check("client") for _ in range(13)]
+
+        assert [d.allowed for d in decisions] == [True] * 10 + [False] * 3
+        assert [d.remaining for d in decisions[:10]] == list(range(9, -1, -1))
+
+        clock.advance(decisions[-1].retry_after + 0.001)
+        assert limiter.check("client").allowed
+
+    def test_instances_share_state(self, table_path, clock):
+        first = SharedMemoryRateLimiter(table_path, max_requests=4, window_seconds=60)
+        second = SharedMemoryRateLimiter(table_path, max_requests=4, window_seconds=60)
+        for _ in range(2):
+            first.check("client")
+            second.check("client")
+
+        assert not first.check("client").allowed
+        assert not second.check("client").allowed
+        assert second.get_remaining("other") == 4
+
+    def test_existing_table_keeps_its_size(self, table_path):
+        SharedMemoryRateLimiter(table_path, max_keys=32).close()
+        assert SharedMemoryRateLimiter(table_path, max_keys=1024).capacity == 32
+
+    def test_reads_do_not_create_slots(self, table_path, clock):
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=5, window_seconds=60)
+
+        assert limiter.get_remaining("unseen") == 5
+        assert limiter.get_reset_time("unseen") == 0
+        assert limiter.stats()["live_keys"] == 0
+
+    def test_idle_slots_are_reclaimed(self, table_path, clock):
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=5, window_seconds=10, max_keys=8)
+        for i in range(8):
+            limiter.check(f"old-{i}")
+
+        clock.advance(10)
+        for i in range(8):
+            assert limiter.check(f"new-{i}").allowed
+
+        stats = limiter.stats()
+        assert stats["live_keys"] == 8
+        assert stats["idle_evictions"] == 8
+        assert stats["capacity_evictions"] == 0
+
+    def test_full_table_evicts_least_active(self, table_path, clock):
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=5, window_seconds=10, max_keys=2)
+        limiter.check("a")
+        clock.advance(1)
+        for _ in range(3):
+            limiter.check("b")
+
+        assert limiter.check("c").allowed
+        assert limiter.stats()["capacity_evictions"] == 1
+        assert limiter.get_remaining("a") == 5
+        assert limiter.get_remaining("b") == 2
+
+    def test_new_keys_read_a_bounded_window(self, table_path, clock, monkeypatch):
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=5, window_seconds=3600, max_keys=4096)
+        for i in range(8192):
+            limiter.check(f"active-{i}")
+        stats = limiter.stats()
+        assert stats["live_keys"] > 4000
+        assert stats["capacity_evictions"] > 0
+
+        reads = []
+        locks = []
+        read = limiter._read
+        lock_slot = limiter._lock_slot
+        monkeypatch.setattr(limiter, "_read", lambda index: reads.append(index) or read(index))
+        monkeypatch.setattr(limiter, "_lock_slot", lambda index: locks.append(index) or lock_slot(index))
+
+        assert limiter.check("newcomer").allowed
+        assert limiter.get_remaining("absent") == 5
+        # Two probes and the claim for the new key, one probe for the absent one
+        assert len(reads) <= 3 * shm_rate_limiter._PROBE_LENGTH + 2
+        assert len(locks) == 1
+
+    def test_threads_share_one_limit(self, table_path):
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=50, window_seconds=3600)
+        allowed = []
+
+        def hammer():
+            allowed.append(sum(limiter.check("client").allowed for _ in range(40)))
+
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(allowed) == 50
+
+    def test_processes_share_one_limit(self, table_path):
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        workers = [
+            context.Process(target=count_allowed, args=(table_path, key, 40, results))
+            for key in ["client", "client", "client", "client", "other"]
+        ]
+        for worker in workers:
+            worker.start()
+        counts = sorted(results.get(timeout=60) for _ in workers)
+        for worker in workers:
+            worker.join()
+
+        # Four workers compete for one client's 50 requests; "other" has its own
+        assert sum(counts) == 50 + 40
+        limiter = SharedMemoryRateLimiter(table_path, max_requests=50, window_seconds=3600)
+        assert limiter.get_remaining("client") == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,138 @@
+"""
+Tests for request validation and the fused prepare_request pass.
+"""
+
+import random
+
+import pytest
+from compiler import PromptCompiler
+from rate_limiter import sanitize_input, sanitize_payload
+from validation import (
+    MAX_LIST_ITEMS,
+    MAX_PAYLOAD_LENGTH,
+    MAX_TEXT_LENGTH,
+    clean_text,
+    prepare_request,
+    validate_request_data,
+)
+
+MODELS = {"image": "dalle", "video": "sora", "audio": "elevenlabs", "text": "gpt-4"}
+
+PIECES = [
+    "cat", "a", "Café", "naïve", "日本語", "—", "  ", " ", "\t", "\n", "\r\n", "\x00",
+    "\x0b", "\x0c", "\x1c", "\x1f", "\x7f", "\x85", "\xa0", " ", "　", "\x01", "",
+]
+
+
+def _random_text(rng):
+    if rng.random() < 0.05:
+        return rng.choice(["x", " y ", "\x00"]) * rng.choice([MAX_TEXT_LENGTH, MAX_TEXT_LENGTH + 1])
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+
+
+def _random_value(rng):
+    kind = rng.random()
+    if kind < 0.55:
+        return _random_text(rng)
+    if kind < 0.65:
+        return [_random_text(rng) if rng.random() < 0.8 else rng.randint(0, 9) for _ in range(rng.randint(0, 4))]
+    if kind < 0.75:
+        return rng.choice([0, 5, 61, -1, 2.5, True, "7", "soon"])
+    return rng.choice([None, {"nested": "x"}, ("t",)])
+
+
+def _random_request(rng):
+    modality = rng.choice(list(MODELS))
+    fields = ["modality", "goal", "subject", "style", "constraints", "duration_seconds", "scene",
+              "lighting", "tone", "emotion", "unknown_field"]
+    payload = {}
+    for name in rng.sample(fields, rng.randint(0, len(fields))):
+        payload[name] = _random_value(rng)
+    if rng.random() < 0.7:
+        payload.update(modality=modality, goal=_random_text(rng) or "g", subject=_random_text(rng) or "s")
+    return {"modality": modality, "model": MODELS[modality], "payload": payload}
+
+
+def _previous_path(data):
+    """validate_request_data, sanitize_payload and build_prompt run in sequence."""
+    error = validate_request_data(data)
+    if error:
+        return None, error
+    payload = sanitize_payload(data["payload"], MAX_TEXT_LENGTH)
+    try:
+        return PromptCompiler().build_prompt(data["modality"], payload), None
+    except TypeError as e:
+        return None, (f"Invalid payload: {str(e)}", 400)
+
+
+class TestCleanText:
+    """Tests for the string sanitizer."""
+
+    @pytest.mark.parametrize(
+        "text",
+        ["", " ", "plain words", " lead", "trail ", "two  spaces", "tab\there", "nul\x00byte",
+         "\x1cfile sep", "Café  au lait", "\xa0nbsp\xa0", "a" * (MAX_TEXT_LENGTH + 5), "\x00" * 3],
+    )
+    def test_matches_sanitize_input(self, text):
+        assert clean_text(text) == sanitize_input(text, MAX_TEXT_LENGTH)
+
+    def test_clean_ascii_returned_without_copy(self):
+        text = "a ceramic coffee mug on a walnut table"
+        assert clean_text(text) is text
+
+
+class TestPrepareRequest:
+    """The fused pass must match the previous multi-pass pipeline."""
+
+    def test_builds_prompt(self):
+        prompt, error = prepare_request(
+            {
+                "modality": "image",
+                "model": "dalle",
+                "payload": {"modality": "image", "goal": "g", "subject": " a  cat\x00 ", "constraints": ["x\t y"]},
+            }
+        )
+
+        assert error is None
+        assert prompt.subject == "a cat"
+        assert prompt.constraints == ["x y"]
+
+    def test_dropped_values_do_not_count_as_unknown(self):
+        prompt, error = prepare_request(
+            {"modality": "text", "model": "gpt-4", "payload": {"goal": "g", "subject": "s", "modality": "text", "extra": None}}
+        )
+
+        assert error is None
+        assert prompt.goal == "g"
+
+    def test_reports_unknown_and_missing_fields(self):
+        _, error = prepare_request({"modality": "text", "model": "gpt-4", "payload": {"goal": "g", "colour": "red"}})
+        assert error == ("Invalid payload: Unknown fields for text: colour", 400)
+
+        _, error = prepare_request({"modality": "text", "model": "gpt-4", "payload": {"goal": "g"}})
+        assert error == ("Invalid payload: Missing required fields: modality, subject", 400)
+
+    def test_bounds_lists_and_payload_text(self):
+        base = {"modality": "text", "goal": "g", "subject": "s"}
+
+        for payload, message in [
+            ({**base, "constraints": ["x"] * (MAX_LIST_ITEMS + 1)}, f"Field 'constraints' exceeds maximum of {MAX_LIST_ITEMS} items"),
+            ({**base, "constraints": ["x" * MAX_TEXT_LENGTH] * (MAX_PAYLOAD_LENGTH // MAX_TEXT_LENGTH + 1)},
+             f"Payload text exceeds maximum length of {MAX_PAYLOAD_LENGTH}"),
+        ]:
+            data = {"modality": "text", "model": "gpt-4", "payload": payload}
+            assert prepare_request(data) == (None, (message, 400))
+            assert validate_request_data(data) == (message, 400)
+
+        data = {"modality": "text", "model": "gpt-4", "payload": {**base, "constraints": ["x"] * MAX_LIST_ITEMS}}
+        assert prepare_request(data)[1] is None
+
+    def test_equivalent_to_previous_path(self):
+        rng = random.Random(1234)
+        for _ in range(3000):
+            data = _random_request(rng)
+            assert prepare_request(data) == _previous_path(data), data
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,196 @@
+"""
+Request validation shared by the Flask app and the Vercel entry point.
+"""
+
+from compiler import PROMPT_CLASSES
+from registry import MODALITIES, MODALITY_MODELS, MODELS_BY_MODALITY
+from schema import field_sets
+
+# Input validation limits
+MAX_TEXT_LENGTH = 2000
+MAX_DURATION_SECONDS = 60
+# Items in a list field (e.g. constraints), and characters of text in a
+# whole payload, counting list items
+MAX_LIST_ITEMS = 50
+MAX_PAYLOAD_LENGTH = 20000
+
+_MODALITY_NAMES = ", ".join(MODALITIES)
+
+# Deletes NUL, the only character sanitize_input removes outright. Other
+# control characters are either whitespace (collapsed below) or kept as-is.
+_DELETE_NUL = str.maketrans("", "", "\x00")
+
+
+def _validate_envelope(data):
+    """Check modality, model and payload presence; return an error tuple or None."""
+    if not data:
+        return "Request body is required", 400
+
+    modality = data.get("modality")
+    model = data.get("model")
+    payload = data.get("payload")
+
+    if not modality:
+        return "Missing required field: modality", 400
+
+    models = MODALITY_MODELS.get(modality) if isinstance(modality, str) else None
+    if models is None:
+        return f"Invalid modality: {modality}. Must be one of: {_MODALITY_NAMES}", 400
+
+    if not model:
+        return "Missing required field: model", 400
+
+    if not isinstance(model, str) or model not in models:
+        return (
+            f"Invalid model '{model}' for modality '{modality}'. "
+            f"Available models: {', '.join(MODELS_BY_MODALITY[modality])}",
+            400,
+        )
+
+    if not payload:
+        return "Missing required field: payload", 400
+
+    if not isinstance(payload, dict):
+        return "Payload must be a dictionary", 400
+
+    return None
+
+
+def _validate_duration(payload):
+    duration = payload.get("duration_seconds")
+    try:
+        duration = int(duration)
+        if duration < 1 or duration > MAX_DURATION_SECONDS:
+            return (
+                f"duration_seconds must be between 1 and {MAX_DURATION_SECONDS}",
+                400,
+            )
+    except (ValueError, TypeError):
+        return "duration_seconds must be a valid integer", 400
+    return None
+
+
+def validate_request_data(data):
+    """Validate incoming request data."""
+    envelope_error = _validate_envelope(data)
+    if envelope_error:
+        return envelope_error
+
+    payload = data["payload"]
+
+    # Validate text field lengths, list sizes and the payload's total text
+    total_length = 0
+    for key, value in payload.items():
+        if isinstance(value, str):
+            if len(value) > MAX_TEXT_LENGTH:
+                return f"Field '{key}' exceeds maximum length of {MAX_TEXT_LENGTH}", 400
+            total_length += len(value)
+        elif isinstance(value, list):
+            if len(value) > MAX_LIST_ITEMS:
+                return f"Field '{key}' exceeds maximum of {MAX_LIST_ITEMS} items", 400
+            total_length += sum(len(item) for item in value if isinstance(item, str))
+        if total_length > MAX_PAYLOAD_LENGTH:
+            return f"Payload text exceeds maximum length of {MAX_PAYLOAD_LENGTH}", 400
+
+    # Validate duration for video
+    if data["modality"] == "video" and "duration_seconds" in payload:
+        return _validate_duration(payload)
+
+    return None
+
+
+def clean_text(text, max_length=MAX_TEXT_LENGTH):
+    """
+    Sanitize a string exactly like rate_limiter.sanitize_input.
+
+    Args:
+        text: Input string
+        max_length: Maximum allowed length
+
+    Returns:
+        str: Text truncated to max_length, without NUL characters and with
+        whitespace runs collapsed to single spaces
+    """
+    if len(text) > max_length:
+        text = text[:max_length]
+
+    # ASCII fast path: printable ASCII has no NUL or whitespace other than
+    # space, so without doubled or edge spaces the text is already clean
+    # and is returned without copying
+    if (
+        text.isascii()
+        and text.isprintable()
+        and "  " not in text
+        and text[:1] != " "
+        and text[-1:] != " "
+    ):
+        return text
+
+    if "\x00" in text:
+        text = text.translate(_DELETE_NUL)
+    return " ".join(text.split())
+
+
+def prepare_request(data):
+    """
+    Validate, sanitize and build the prompt for a request in one pass.
+
+    Gives the same result as validate_request_data, sanitize_payload and
+    PromptCompiler.build_prompt run in sequence, but walks the payload once:
+    each value is length-checked, cleaned and sorted into known or unknown
+    fields for the modality's prompt class as it is read.
+
+    Args:
+        data: Request dict with modality, model and payload
+
+    Returns:
+        tuple: (prompt, None) on success, or (None, (error message, status code))
+    """
+    envelope_error = _validate_envelope(data)
+    if envelope_error:
+        return None, envelope_error
+
+    modality = data["modality"]
+    payload = data["payload"]
+    prompt_class = PROMPT_CLASSES[modality]
+    names, required = field_sets(prompt_class)
+
+    fields = {}
+    unknown = []
+    total_length = 0
+    for key, value in payload.items():
+        if isinstance(value, str):
+            if len(value) > MAX_TEXT_LENGTH:
+                return None, (f"Field '{key}' exceeds maximum length of {MAX_TEXT_LENGTH}", 400)
+            total_length += len(value)
+            value = clean_text(value)
+        elif isinstance(value, (int, float)):
+            pass
+        elif isinstance(value, list):
+            if len(value) > MAX_LIST_ITEMS:
+                return None, (f"Field '{key}' exceeds maximum of {MAX_LIST_ITEMS} items", 400)
+            total_length += sum(len(item) for item in value if isinstance(item, str))
+            value = [clean_text(item) if isinstance(item, str) else item for item in value]
+        else:
+            # Unsupported types are dropped, as sanitize_payload does
+            continue
+        if total_length > MAX_PAYLOAD_LENGTH:
+            return None, (f"Payload text exceeds maximum length of {MAX_PAYLOAD_LENGTH}", 400)
+
+        if key in names:
+            fields[key] = value
+        else:
+            unknown.append(key)
+
+    if modality == "video" and "duration_seconds" in payload:
+        duration_error = _validate_duration(payload)
+        if duration_error:
+            return None, duration_error
+
+    if unknown:
+        return None, (f"Invalid payload: Unknown fields for {modality}: {', '.join(unknown)}", 400)
+    if not fields.keys() >= required:
+        missing = ", ".join(sorted(required - fields.keys()))
+        return None, (f"Invalid payload: Missing required fields: {missing}", 400)
+
+    return prompt_class(**fields), None
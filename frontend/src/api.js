@@ -27,9 +27,11 @@ async function apiRequest(endpoint, options = {}) {
   const url = `${API_BASE_URL}${endpoint}`;
 
   try {
+    // Only requests with a body declare one: a GET with a Content-Type of
+    // application/json would need a CORS preflight
     const response = await fetch(url, {
       headers: {
-        "Content-Type": "application/json",
+        ...(options.body ? { "Content-Type": "application/json" } : {}),
         ...options.headers,
       },
       ...options,
@@ -38,10 +40,15 @@ async function apiRequest(endpoint, options = {}) {
     const data = await response.json();
 
     if (!response.ok) {
+      // Request id and phase timings let a failure be matched to server logs
       throw new APIError(
         data.error || "Request failed",
         response.status,
-        data
+        {
+          ...data,
+          requestId: response.headers.get("X-Request-ID"),
+          serverTiming: response.headers.get("Server-Timing"),
+        }
       );
     }
 
@@ -60,12 +67,57 @@ async function apiRequest(endpoint, options = {}) {
   }
 }
 
+// Longest GET /generate URL sent; longer requests are POSTed, since proxies
+// and CDNs commonly reject URLs of more than 8 KB
+const MAX_GET_URL_LENGTH = 4000;
+
+/**
+ * Serialize a value as canonical JSON: object keys sorted, no whitespace,
+ * undefined properties left out. Matches http_cache.canonical_json in the
+ * backend, so equal requests always give the same string.
+ * @param {any} value - JSON-compatible value
+ * @returns {string} Canonical JSON
+ */
+export function canonicalJSON(value) {
+  if (Array.isArray(value)) {
+    return `[${value.map((item) => (item === undefined ? "null" : canonicalJSON(item))).join(",")}]`;
+  }
+  if (value !== null && typeof value === "object") {
+    const entries = Object.keys(value)
+      .sort()
+      .filter((key) => value[key] !== undefined)
+      .map((key) => `${JSON.stringify(key)}:${canonicalJSON(value[key])}`);
+    return `{${entries.join(",")}}`;
+  }
+  return JSON.stringify(value);
+}
+
 /**
- * Generate a prompt for the specified model.
+ * Build the canonical GET /generate path for a request. Identical requests
+ * always give the identical URL, so the CDN serves repeats from its cache.
+ * @param {import('./types').PromptRequest} data - Request data
+ * @returns {string} Endpoint path with its query string
+ */
+export function canonicalGenerateUrl(data) {
+  const params = [
+    ["modality", data.modality],
+    ["model", data.model],
+    ["payload", canonicalJSON(data.payload)],
+  ];
+  return `/generate?${params.map(([name, value]) => `${name}=${encodeURIComponent(value)}`).join("&")}`;
+}
+
+/**
+ * Generate a prompt for the specified model. Uses the cacheable GET form
+ * unless its URL would be too long.
  * @param {import('./types').PromptRequest} data - Request data
  * @returns {Promise<import('./types').PromptResponse>} Generated prompt
  */
 export async function generatePrompt(data) {
+  const endpoint = canonicalGenerateUrl(data);
+  if (API_BASE_URL.length + endpoint.length <= MAX_GET_URL_LENGTH) {
+    return apiRequest(endpoint, { method: "GET" });
+  }
   return apiRequest("/generate", {
     method: "POST",
     body: JSON.stringify(data),
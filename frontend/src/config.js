@@ -37,6 +37,11 @@ export const MODELS = {
     { value: "seamless-m4t", label: "Meta SeamlessM4T", description: "Multilingual translation & speech" },
     { value: "indic-tts", label: "AI4Bharat Indic TTS/STT", description: "Indian language support" },
     { value: "coqui-tts", label: "Coqui TTS", description: "Open-source TTS" },
+    { value: "openai-voice", label: "OpenAI Voice", description: "Natural language voice direction" },
+    { value: "playht", label: "Play.ht", description: "AI voice generation platform" },
+    { value: "azure-voice", label: "Azure Speech", description: "Microsoft's TTS platform" },
+    { value: "murfai", label: "Murf.AI", description: "Professional voiceovers" },
+    { value: "wellsaid", label: "WellSaid Labs", description: "Enterprise voice synthesis" },
   ],
 };
 
@@ -80,6 +85,11 @@ export const REQUIRED_FIELDS = {
       "seamless-m4t": [],
       "indic-tts": [],
       "coqui-tts": [],
+      "openai-voice": [],
+      "playht": [],
+      "azure-voice": [],
+      "murfai": [],
+      "wellsaid": [],
     },
   },
 };